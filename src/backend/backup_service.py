@@ -0,0 +1,240 @@
+import sqlite3
+import os
+import json
+import lzma
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+class BackupService:
+    # Páginas copiadas por paso: entre paso y paso la base queda libre para la aplicación
+    PAGINAS_POR_PASO = 256
+    # Almacén de backups automáticos: objetos comprimidos nombrados por su SHA-256 y un índice JSON
+    CARPETA_OBJETOS = "objetos"
+    ARCHIVO_INDICE = "indice_backups.json"
+    EXTENSION = ".db.xz"
+    BLOQUE = 1024 * 1024
+    # Retención por niveles: se conserva el backup más reciente de cada período, para los últimos N períodos
+    # (None = todos). El nivel "anio" deja una copia por año escolar.
+    RETENCION = {"hora": 24, "dia": 14, "semana": 8, "anio": None}
+    _FORMATO_PERIODO = {"hora": "%Y-%m-%d %H", "dia": "%Y-%m-%d", "semana": "%G-W%V", "anio": "%Y"}
+    # El índice se lee y reescribe completo: un backup a la vez por proceso
+    _lock_indice = threading.Lock()
+
+    @staticmethod
+    def huella(db_path: str) -> str:
+        """
+        Huella barata del contenido: tamaño y fecha de modificación del .db y del -wal.
+        Un WAL vacío no cuenta (se crea al abrir la base aunque no haya cambios).
+        """
+        st = os.stat(db_path)
+        partes = [st.st_size, st.st_mtime_ns]
+        wal = db_path + "-wal"
+        if os.path.exists(wal) and os.path.getsize(wal) > 0:
+            st_wal = os.stat(wal)
+            partes += [st_wal.st_size, st_wal.st_mtime_ns]
+        return ":".join(str(p) for p in partes)
+
+    @staticmethod
+    def copiar(db_path: str, destino: str, progreso: Optional[Callable[[int], None]] = None):
+        """
+        Copia en línea con la API de backup de SQLite: es consistente aunque la aplicación esté escribiendo
+        y no bloquea la base más que un paso a la vez. progreso(porcentaje) se llama después de cada paso.
+        Se escribe en un archivo temporal para no dejar nunca un backup a medias con el nombre final.
+        """
+        temporal = destino + ".tmp"
+        ultimo = [-1]
+
+        def _paso(status, restantes, total):
+            porcentaje = int((total - restantes) * 100 / total) if total else 100
+            if progreso and porcentaje != ultimo[0]:
+                ultimo[0] = porcentaje
+                progreso(porcentaje)
+
+        origen = sqlite3.connect(db_path)
+        try:
+            copia = sqlite3.connect(temporal)
+            try:
+                origen.backup(copia, pages=BackupService.PAGINAS_POR_PASO, progress=_paso)
+            finally:
+                copia.close()
+            os.replace(temporal, destino)
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        finally:
+            origen.close()
+
+    # --- Almacén comprimido y deduplicado ---
+
+    @staticmethod
+    def _leer_indice(carpeta: str) -> Dict:
+        try:
+            with open(os.path.join(carpeta, BackupService.ARCHIVO_INDICE), "r") as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            indice = {}
+        indice.setdefault("backups", [])
+        indice.setdefault("huellas", {})
+        return indice
+
+    @staticmethod
+    def _guardar_indice(carpeta: str, indice: Dict):
+        ruta = os.path.join(carpeta, BackupService.ARCHIVO_INDICE)
+        with open(ruta + ".tmp", "w") as f:
+            json.dump(indice, f, indent=4)
+        os.replace(ruta + ".tmp", ruta)
+
+    @staticmethod
+    def _ruta_objeto(carpeta: str, sha256: str) -> str:
+        return os.path.join(carpeta, BackupService.CARPETA_OBJETOS, sha256 + BackupService.EXTENSION)
+
+    @staticmethod
+    def backup_automatico(db_path: str, carpeta: str, progreso: Optional[Callable[[int], None]] = None,
+                          retencion: Optional[Dict[str, Optional[int]]] = None) -> Optional[str]:
+        """
+        Guarda una instantánea compacta (VACUUM INTO) comprimida con lzma en el almacén de la carpeta.
+        Instantáneas idénticas se guardan una sola vez (mismo SHA-256); luego aplica la retención por niveles.
+        Si la base no cambió desde su último backup no hace nada y retorna None; si no, retorna el SHA-256.
+        """
+        if not os.path.exists(db_path):
+            return None
+        clave = os.path.abspath(db_path)
+        huella = BackupService.huella(db_path)
+        with BackupService._lock_indice:
+            indice = BackupService._leer_indice(carpeta)
+            if indice["huellas"].get(clave) == huella:
+                logging.info(f"Backup automático omitido: {clave} no cambió desde el último")
+                return None
+
+        os.makedirs(os.path.join(carpeta, BackupService.CARPETA_OBJETOS), exist_ok=True)
+        instantanea = os.path.join(carpeta, f"instantanea_{os.getpid()}_{threading.get_ident()}.db")
+        comprimido = instantanea + BackupService.EXTENSION
+        try:
+            # VACUUM INTO lee dentro de una transacción de lectura: en modo WAL la aplicación puede seguir escribiendo
+            if os.path.exists(instantanea):
+                os.remove(instantanea)
+            origen = sqlite3.connect(db_path)
+            try:
+                origen.execute("VACUUM INTO ?", (instantanea,))
+            finally:
+                origen.close()
+
+            # Comprimir y calcular el hash en la misma pasada
+            sha = hashlib.sha256()
+            total = os.path.getsize(instantanea) or 1
+            leidos = 0
+            ultimo = -1
+            with open(instantanea, "rb") as entrada, lzma.open(comprimido, "wb") as salida:
+                while True:
+                    bloque = entrada.read(BackupService.BLOQUE)
+                    if not bloque:
+                        break
+                    sha.update(bloque)
+                    salida.write(bloque)
+                    leidos += len(bloque)
+                    porcentaje = leidos * 100 // total
+                    if progreso and porcentaje != ultimo:
+                        ultimo = porcentaje
+                        progreso(porcentaje)
+            sha256 = sha.hexdigest()
+            tamano = os.path.getsize(instantanea)
+
+            destino = BackupService._ruta_objeto(carpeta, sha256)
+            if os.path.exists(destino):
+                os.remove(comprimido)
+                logging.info(f"Backup idéntico a uno ya guardado ({sha256[:12]}), no se duplica")
+            else:
+                os.replace(comprimido, destino)
+        finally:
+            for temporal in (instantanea, comprimido):
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+
+        with BackupService._lock_indice:
+            indice = BackupService._leer_indice(carpeta)
+            indice["backups"].append({
+                "sha256": sha256,
+                "db": clave,
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "tamano": tamano,
+                "tamano_comprimido": os.path.getsize(destino),
+            })
+            indice["huellas"][clave] = huella
+            BackupService._aplicar_retencion(carpeta, indice, retencion or BackupService.RETENCION)
+            BackupService._guardar_indice(carpeta, indice)
+        return sha256
+
+    @staticmethod
+    def _aplicar_retencion(carpeta: str, indice: Dict, retencion: Dict[str, Optional[int]]):
+        """Quita del índice los backups que ningún nivel conserva y borra los objetos que quedaron sin uso."""
+        conservar = set()
+        por_base = {}
+        for i, entrada in enumerate(indice["backups"]):
+            por_base.setdefault(entrada["db"], []).append(i)
+        for posiciones in por_base.values():
+            # fecha tiene precisión de segundos: a igual fecha, el agregado después al índice es el más reciente
+            posiciones.sort(key=lambda i: (indice["backups"][i]["fecha"], i), reverse=True)
+            for nivel, cantidad in retencion.items():
+                periodos = set()
+                for i in posiciones:
+                    periodo = datetime.fromisoformat(indice["backups"][i]["fecha"]).strftime(BackupService._FORMATO_PERIODO[nivel])
+                    if periodo in periodos:
+                        continue
+                    if cantidad is not None and len(periodos) >= cantidad:
+                        break
+                    periodos.add(periodo)
+                    conservar.add(i)
+
+        indice["backups"] = [e for i, e in enumerate(indice["backups"]) if i in conservar]
+        en_uso = {e["sha256"] for e in indice["backups"]}
+        carpeta_objetos = os.path.join(carpeta, BackupService.CARPETA_OBJETOS)
+        for archivo in os.listdir(carpeta_objetos):
+            if archivo.endswith(BackupService.EXTENSION) and archivo[:-len(BackupService.EXTENSION)] not in en_uso:
+                os.remove(os.path.join(carpeta_objetos, archivo))
+                logging.info(f"Backup antiguo eliminado: {archivo}")
+
+    @staticmethod
+    def listar_backups(carpeta: str, db_path: Optional[str] = None) -> List[Dict]:
+        """Backups del almacén (de una base o de todas), del más reciente al más antiguo."""
+        with BackupService._lock_indice:
+            backups = BackupService._leer_indice(carpeta)["backups"]
+        if db_path:
+            backups = [b for b in backups if b["db"] == os.path.abspath(db_path)]
+        # A igual fecha, el orden del índice (se agregan en orden cronológico)
+        return [b for _, b in sorted(enumerate(backups), key=lambda t: (t[1]["fecha"], t[0]), reverse=True)]
+
+    @staticmethod
+    def restaurar(carpeta: str, sha256: str, destino: str, progreso: Optional[Callable[[int], None]] = None):
+        """
+        Descomprime el backup por bloques directamente en un .db nuevo (sin cargarlo en memoria)
+        y verifica el SHA-256 antes de darle el nombre final.
+        """
+        origen = BackupService._ruta_objeto(carpeta, sha256)
+        if not os.path.exists(origen):
+            raise FileNotFoundError(f"No existe el backup {sha256}")
+        temporal = destino + ".tmp"
+        sha = hashlib.sha256()
+        total = os.path.getsize(origen) or 1
+        ultimo = -1
+        try:
+            with open(origen, "rb") as archivo, lzma.open(archivo, "rb") as entrada, open(temporal, "wb") as salida:
+                while True:
+                    bloque = entrada.read(BackupService.BLOQUE)
+                    if not bloque:
+                        break
+                    sha.update(bloque)
+                    salida.write(bloque)
+                    porcentaje = archivo.tell() * 100 // total
+                    if progreso and porcentaje != ultimo:
+                        ultimo = porcentaje
+                        progreso(porcentaje)
+            if sha.hexdigest() != sha256:
+                raise ValueError("El backup está dañado: su contenido no coincide con el hash registrado")
+            os.replace(temporal, destino)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
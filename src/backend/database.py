@@ -1,11 +1,221 @@
 import sqlite3
 import os
 import sys
+import csv
+import json
+import re
+import threading
+import unicodedata
+import hashlib
+import platform
+import uuid
+import time
+from collections import OrderedDict, deque
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
 import logging
 
+from backend.validaciones import Validador
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+# Nombre de mes normalizado (minúsculas y sin tildes, como SchoolDB._normalizar_texto) -> índice 0-11
+INDICE_MES = {mes.lower(): i for i, mes in enumerate(MESES)}
+# Límite de ATTACH por defecto en SQLite; Connection.getlimit solo existe desde Python 3.11
+LIMITE_ATTACH_POR_DEFECTO = 10
+
+def limite_attach(conn):
+    """Cantidad máxima de bases que se pueden adjuntar a la conexión."""
+    getlimit = getattr(conn, "getlimit", None)
+    limite = getattr(sqlite3, "SQLITE_LIMIT_ATTACHED", None)
+    if getlimit is None or limite is None:
+        return LIMITE_ATTACH_POR_DEFECTO
+    return getlimit(limite)
+
+class InstrumentacionSQL:
+    """
+    Estadísticas por sentencia (llamadas, tiempo total, percentiles, filas) con el SQL normalizado como clave:
+    los literales se reemplazan por ? y las listas (?, ?, ...) se reducen a una. Las sentencias que superan
+    el umbral se escriben, con su EXPLAIN QUERY PLAN, en el registro de consultas lentas.
+    """
+    # Latencias recientes que se guardan por sentencia para calcular los percentiles
+    MUESTRAS = 1000
+    _RE_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    _RE_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+    def __init__(self, umbral_lento_ms=100.0, ruta_log=None):
+        self.umbral_lento_ms = umbral_lento_ms
+        self.ruta_log = ruta_log
+        self._lock = threading.Lock()
+        self._estadisticas = {}
+        self._normalizadas = {}
+
+    def normalizar(self, sql):
+        normalizada = self._normalizadas.get(sql)
+        if normalizada is None:
+            normalizada = " ".join(self._RE_LITERALES.sub("?", sql).split())
+            normalizada = self._RE_LISTAS.sub("(?, ...)", normalizada)
+            self._normalizadas[sql] = normalizada
+        return normalizada
+
+    def registrar(self, cursor, sql, params, segundos, filas):
+        clave = self.normalizar(sql)
+        with self._lock:
+            estadistica = self._estadisticas.get(clave)
+            if estadistica is None:
+                estadistica = self._estadisticas[clave] = {"llamadas": 0, "total": 0.0, "filas": 0, "latencias": deque(maxlen=self.MUESTRAS)}
+            estadistica["llamadas"] += 1
+            estadistica["total"] += segundos
+            estadistica["filas"] += max(filas, 0)
+            estadistica["latencias"].append(segundos)
+        ms = segundos * 1000
+        if ms >= self.umbral_lento_ms:
+            self._registrar_lenta(cursor.connection, sql, params, ms, filas)
+
+    def _registrar_lenta(self, conn, sql, params, ms, filas):
+        try:
+            plan = [fila[-1] for fila in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except (sqlite3.Error, ValueError):
+            plan = []  # PRAGMA, sentencias de esquema o varias sentencias: no tienen plan
+        linea = f"{datetime.now():%Y-%m-%d %H:%M:%S} | {ms:.1f} ms | {filas} filas | {' '.join(sql.split())}\n"
+        if params:
+            linea += f"    parámetros: {params!r}\n"
+        for paso in plan:
+            linea += f"    plan: {paso}\n"
+        logging.warning(f"Consulta lenta ({ms:.1f} ms): {self.normalizar(sql)[:120]}")
+        if self.ruta_log:
+            with self._lock:
+                try:
+                    with open(self.ruta_log, "a", encoding="utf-8") as archivo:
+                        archivo.write(linea)
+                except OSError as e:
+                    logging.error(f"No se pudo escribir el registro de consultas lentas: {e}")
+
+    @staticmethod
+    def _percentil(ordenadas, p):
+        # Rango más cercano: el menor valor que deja al menos p% de las muestras a su izquierda
+        return ordenadas[max(0, -(-len(ordenadas) * p // 100) - 1)]
+
+    def instantanea(self):
+        """[{sql, llamadas, total_ms, promedio_ms, p50_ms, p95_ms, p99_ms, filas}, ...] ordenadas por tiempo total."""
+        with self._lock:
+            copia = [(sql, dict(e, latencias=sorted(e["latencias"]))) for sql, e in self._estadisticas.items()]
+        resultado = []
+        for sql, e in copia:
+            fila = {"sql": sql, "llamadas": e["llamadas"], "total_ms": e["total"] * 1000,
+                    "promedio_ms": e["total"] * 1000 / e["llamadas"], "filas": e["filas"]}
+            for p in (50, 95, 99):
+                fila[f"p{p}_ms"] = self._percentil(e["latencias"], p) * 1000
+            resultado.append(fila)
+        return sorted(resultado, key=lambda fila: fila["total_ms"], reverse=True)
+
+    def reiniciar(self):
+        with self._lock:
+            self._estadisticas.clear()
+
+class _CursorMedido(sqlite3.Cursor):
+    """
+    Cursor que mide cada sentencia. Las lecturas se traen completas en execute() para medir también el tiempo
+    de recorrido y contar las filas; fetchone/fetchmany/fetchall y la iteración las entregan desde memoria.
+    """
+
+    def __init__(self, conn, instrumentacion):
+        super().__init__(conn)
+        self._instrumentacion = instrumentacion
+        self._pendientes = None
+
+    def execute(self, sql, params=()):
+        inicio = time.perf_counter()
+        super().execute(sql, params)
+        if self.description is not None:
+            self._pendientes = deque(super().fetchall())
+            filas = len(self._pendientes)
+        else:
+            self._pendientes = None
+            filas = self.rowcount
+        self._instrumentacion.registrar(self, sql, params, time.perf_counter() - inicio, filas)
+        return self
+
+    def executemany(self, sql, secuencia):
+        secuencia = list(secuencia)
+        inicio = time.perf_counter()
+        super().executemany(sql, secuencia)
+        self._pendientes = None
+        self._instrumentacion.registrar(self, sql, secuencia[0] if secuencia else (), time.perf_counter() - inicio, self.rowcount)
+        return self
+
+    def fetchone(self):
+        if self._pendientes is None:
+            return super().fetchone()
+        return self._pendientes.popleft() if self._pendientes else None
+
+    def fetchmany(self, size=None):
+        if self._pendientes is None:
+            return super().fetchmany(size or self.arraysize)
+        return [self._pendientes.popleft() for _ in range(min(size or self.arraysize, len(self._pendientes)))]
+
+    def fetchall(self):
+        if self._pendientes is None:
+            return super().fetchall()
+        filas = list(self._pendientes)
+        self._pendientes.clear()
+        return filas
+
+    def __next__(self):
+        if self._pendientes is None:
+            return super().__next__()
+        if not self._pendientes:
+            raise StopIteration
+        return self._pendientes.popleft()
+
 class SchoolDB:
-    def __init__(self, db_name="escolares.db"):
+    # Perfil de rendimiento aplicado una sola vez a cada conexión nueva
+    PERFIL_RENDIMIENTO = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -20000,      # Negativo = KiB (~20 MB de caché de páginas)
+        "mmap_size": 268435456,    # 256 MB de lectura mapeada en memoria
+        "busy_timeout": 5000,      # ms de espera si otra conexión tiene el archivo bloqueado
+        "temp_store": "MEMORY",
+    }
+    # Cantidad de sentencias preparadas que sqlite3 mantiene en caché por conexión
+    CACHE_SENTENCIAS = 256
+    # Cantidad de resultados de lectura que se guardan en memoria (se descartan los menos usados)
+    TAMANO_CACHE_LECTURAS = 256
+    # Tablas que los triggers modifican al escribir en otra (FTS, estado de cuenta y resúmenes)
+    TABLAS_DERIVADAS = {
+        "estudiantes": ("estudiantes_fts", "estado_cuenta", "resumen_grados", "resumen_ingresos", "cambios", "sync_bajas"),
+        "apoderados": ("apoderados_fts", "cambios", "sync_bajas"),
+        "mensualidades": ("estado_cuenta", "resumen_ingresos", "cambios", "sync_bajas"),
+    }
+    # Columnas que registra el diario de cambios, por tabla (el id va aparte, en fila_id)
+    COLUMNAS_DIARIO = {
+        "apoderados": ("nombre", "telefono", "email", "fecha_registro"),
+        "estudiantes": ("nombre", "grado", "apoderado_id", "fecha_registro", "estado"),
+        "mensualidades": ("estudiante_id", "monto", "mes", "pagado", "fecha_pago", "anio", "mes_idx"),
+    }
+    # Sincronización entre equipos: tablas en orden de dependencia y claves foráneas que viajan como uid
+    TABLAS_SYNC = ("apoderados", "estudiantes", "mensualidades")
+    REFERENCIAS_SYNC = {
+        "estudiantes": ("apoderado_id", "apoderados", "apoderado_uid"),
+        "mensualidades": ("estudiante_id", "estudiantes", "estudiante_uid"),
+    }
+    # Versión de una fila para "gana la última escritura": (modificado UTC con milisegundos, nodo de origen)
+    _SQL_AHORA_SYNC = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+    _SQL_NODO = "(SELECT valor FROM configuracion WHERE clave = 'nodo_id')"
+    # Archivo anual: columnas que se copian a la base del año cerrado (id incluido, para poder unir con la principal)
+    CARPETA_ARCHIVO = "archivo"
+    COLUMNAS_ARCHIVO = {
+        "mensualidades": ("id", "estudiante_id", "monto", "mes", "pagado", "fecha_pago", "anio", "mes_idx", "uid", "modificado", "origen"),
+        "estudiantes": ("id", "nombre", "grado", "apoderado_id", "fecha_registro", "estado", "uid", "modificado", "origen"),
+    }
+    # El esquema (main., archivo_2024.) se ignora: una tabla archivada se invalida junto con la del mismo nombre
+    _RE_TABLAS_LECTURA = re.compile(r"\b(?:FROM|JOIN)\s+(?:[A-Za-z_]\w*\.)?([A-Za-z_]\w*)", re.IGNORECASE)
+    _RE_TABLA_ESCRITURA = re.compile(
+        r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+([A-Za-z_]\w*)",
+        re.IGNORECASE,
+    )
+
+    def __init__(self, db_name="escolares.db", perfil=None):
         # Detectar si estamos corriendo como ejecutable (PyInstaller)
         if getattr(sys, 'frozen', False):
             # Si es exe, guardar la DB en la misma carpeta del ejecutable
@@ -15,19 +225,167 @@ class SchoolDB:
             # Si es script (desarrollo), guardar en la carpeta raíz del proyecto
             base_dir = os.path.dirname(os.path.abspath(__file__))
             self.db_path = os.path.join(base_dir, "..", "..", db_name)
-            
-            
+
+        self.perfil = dict(self.PERFIL_RENDIMIENTO)
+        if perfil:
+            self.perfil.update(perfil)
+
+        # Una conexión persistente por hilo: {ident_hilo: (hilo, conexión)}
+        self._local = threading.local()
+        self._conexiones = {}
+        self._lock_conexiones = threading.Lock()
+        self._fts_disponible = None
+        self.instrumentacion = None
+
+        # Caché de lecturas: {(query, params): (versión, filas)}. La versión combina una época global
+        # (cambia ante escrituras desconocidas o de otro proceso) con un contador por cada tabla leída.
+        self._cache_lecturas = OrderedDict()
+        self._generaciones = {}
+        self._epoca_cache = 0
+        self._tablas_por_consulta = {}
+        self._lock_cache = threading.Lock()
+
         self.init_db()
 
     def _conectar(self):
-        conn = sqlite3.connect(self.db_path)
+        """Retorna la conexión del hilo actual, creándola (y aplicando el perfil) solo la primera vez."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,  # Autocommit: las transacciones se abren explícitamente con _transaccion()
+            check_same_thread=False,  # Permite que cerrar() libere conexiones de otros hilos
+            cached_statements=self.CACHE_SENTENCIAS,
+        )
         conn.execute("PRAGMA foreign_keys = ON")
+        for pragma, valor in self.perfil.items():
+            try:
+                conn.execute(f"PRAGMA {pragma} = {valor}")
+            except sqlite3.Error as e:
+                logging.warning(f"No se pudo aplicar PRAGMA {pragma}={valor}: {e}")
+
+        hilo = threading.current_thread()
+        with self._lock_conexiones:
+            # Liberar conexiones de hilos que ya terminaron (workers de PDF, WhatsApp, etc.)
+            for ident, (h, c) in list(self._conexiones.items()):
+                if not h.is_alive():
+                    c.close()
+                    del self._conexiones[ident]
+            self._conexiones[hilo.ident] = (hilo, conn)
+
+        self._local.conn = conn
         return conn
 
+    @contextmanager
+    def _transaccion(self, tablas=None):
+        """
+        Agrupa varias sentencias en una sola transacción (commit al salir, rollback si hay error).
+        tablas: las que se escriben, para invalidar solo sus lecturas en caché (None = todas).
+        """
+        conn = self._conectar()
+        cursor = self._cursor(conn)
+        if conn.in_transaction:
+            # Transacción anidada: la externa se encarga del commit
+            yield cursor
+            return
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+            self._invalidar_cache(tablas)
+
+    @staticmethod
+    def _cursor(conn):
+        """Cursor de las sentencias de la aplicación. activar_instrumentacion lo reemplaza por uno que las mide."""
+        return conn.cursor()
+
+    @staticmethod
+    def _ejecutar_script(cursor, script):
+        """Como executescript, pero sin el COMMIT implícito: respeta la transacción en curso."""
+        sentencia = ""
+        for linea in script.splitlines(keepends=True):
+            sentencia += linea
+            if sqlite3.complete_statement(sentencia):
+                cursor.execute(sentencia)
+                sentencia = ""
+        if sentencia.strip():
+            cursor.execute(sentencia)
+
+    def cerrar(self):
+        """Cierra todas las conexiones abiertas (de cualquier hilo). Usar al cambiar de base de datos o salir."""
+        self._invalidar_cache()
+        with self._lock_conexiones:
+            conexiones = [c for _, c in self._conexiones.values()]
+            self._conexiones.clear()
+            self._local = threading.local()
+        for conn in conexiones:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logging.error(f"Error cerrando conexión: {e}")
+
+    def checkpoint(self):
+        """Vuelca el WAL al archivo principal para que una copia directa del .db quede completa."""
+        try:
+            self._conectar().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logging.error(f"Error en checkpoint WAL: {e}")
+
     def init_db(self):
+        """Aplica las migraciones pendientes. Con la base al día solo cuesta leer PRAGMA user_version."""
         conn = self._conectar()
-        cursor = conn.cursor()
-        
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        migraciones = self._migraciones()
+        if version >= len(migraciones):
+            return
+
+        for numero, migracion in enumerate(migraciones, start=1):
+            if numero <= version:
+                continue
+            with self._transaccion() as cursor:
+                # Releer dentro del bloqueo: otra instancia pudo haber migrado mientras esperábamos
+                if cursor.execute("PRAGMA user_version").fetchone()[0] >= numero:
+                    continue
+                migracion(cursor)
+                cursor.execute(f"PRAGMA user_version = {numero}")
+            logging.info(f"Migración {numero} aplicada: {migracion.__doc__.strip()}")
+
+    @classmethod
+    def version_esquema(cls):
+        """PRAGMA user_version de una base con todas las migraciones aplicadas."""
+        return len(cls._migraciones(cls))
+
+    def _migraciones(self):
+        # Orden fijo: nunca reordenar ni eliminar pasos; las nuevas migraciones se agregan al final
+        return [
+            self._migracion_esquema_base,
+            self._migracion_indice_busqueda,
+            self._migracion_indices_pagos,
+            self._migracion_indice_listado_alumnos,
+            self._migracion_calendario_meses,
+            self._migracion_periodo_mensualidades,
+            self._migracion_resumenes,
+            self._migracion_diario_cambios,
+            self._migracion_sincronizacion,
+            self._migracion_archivo_anual,
+            self._migracion_auto_vacuum,
+            self._migracion_resumen_en_pausa,
+            self._migracion_resumen_grados_activos,
+            self._migracion_diario_en_pausa,
+        ]
+
+    @staticmethod
+    def _columnas(cursor, tabla):
+        return {fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})")}
+
+    def _migracion_esquema_base(self, cursor):
+        """Tablas principales, columnas de versiones antiguas e índices de búsqueda."""
         # Tabla Apoderados
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS apoderados (
@@ -71,50 +429,626 @@ class SchoolDB:
                 valor TEXT
             )
         ''')
-        conn.commit()
-        
-        # Migraciones: Agregar columnas a tablas existentes si no existen
-        try:
-            cursor.execute("ALTER TABLE apoderados ADD COLUMN fecha_registro TEXT")
-        except sqlite3.OperationalError: logging.info("Migración: Columna fecha_registro ya existe en apoderados")
-        try:
-            cursor.execute("ALTER TABLE estudiantes ADD COLUMN fecha_registro TEXT")
-        except sqlite3.OperationalError: logging.info("Migración: Columna fecha_registro ya existe en estudiantes")
-        try:
-            cursor.execute("ALTER TABLE mensualidades ADD COLUMN fecha_pago TEXT")
-        except sqlite3.OperationalError: logging.info("Migración: Columna fecha_pago ya existe en mensualidades")
-        
+
+        # Bases creadas por versiones antiguas que no tenían estas columnas
+        for tabla, columna in (("apoderados", "fecha_registro"), ("estudiantes", "fecha_registro"), ("mensualidades", "fecha_pago")):
+            if columna not in self._columnas(cursor, tabla):
+                cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} TEXT")
+
         # Índices para mejorar rendimiento de búsquedas
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_estudiantes_nombre ON estudiantes(nombre)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_mensualidades_fecha ON mensualidades(fecha_pago)")
-        
-        conn.commit()
-        conn.close()
+
+    def _migracion_indice_busqueda(self, cursor):
+        """Índices FTS5 de estudiantes y apoderados (sin tildes, por prefijo) sincronizados por triggers."""
+        tokenizador = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+        try:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS estudiantes_fts USING fts5(nombre, grado, content='estudiantes', content_rowid='id', {tokenizador})")
+        except sqlite3.OperationalError as e:
+            # SQLite sin FTS5: las búsquedas usarán LIKE
+            logging.warning(f"Búsqueda FTS5 no disponible, se usará LIKE: {e}")
+            return
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS apoderados_fts USING fts5(nombre, telefono, email, content='apoderados', content_rowid='id', {tokenizador})")
+        self._ejecutar_script(cursor, '''
+            CREATE TRIGGER IF NOT EXISTS estudiantes_fts_ai AFTER INSERT ON estudiantes BEGIN
+                INSERT INTO estudiantes_fts(rowid, nombre, grado) VALUES (new.id, new.nombre, new.grado);
+            END;
+            CREATE TRIGGER IF NOT EXISTS estudiantes_fts_ad AFTER DELETE ON estudiantes BEGIN
+                INSERT INTO estudiantes_fts(estudiantes_fts, rowid, nombre, grado) VALUES ('delete', old.id, old.nombre, old.grado);
+            END;
+            CREATE TRIGGER IF NOT EXISTS estudiantes_fts_au AFTER UPDATE OF nombre, grado ON estudiantes BEGIN
+                INSERT INTO estudiantes_fts(estudiantes_fts, rowid, nombre, grado) VALUES ('delete', old.id, old.nombre, old.grado);
+                INSERT INTO estudiantes_fts(rowid, nombre, grado) VALUES (new.id, new.nombre, new.grado);
+            END;
+            CREATE TRIGGER IF NOT EXISTS apoderados_fts_ai AFTER INSERT ON apoderados BEGIN
+                INSERT INTO apoderados_fts(rowid, nombre, telefono, email) VALUES (new.id, new.nombre, new.telefono, new.email);
+            END;
+            CREATE TRIGGER IF NOT EXISTS apoderados_fts_ad AFTER DELETE ON apoderados BEGIN
+                INSERT INTO apoderados_fts(apoderados_fts, rowid, nombre, telefono, email) VALUES ('delete', old.id, old.nombre, old.telefono, old.email);
+            END;
+            CREATE TRIGGER IF NOT EXISTS apoderados_fts_au AFTER UPDATE OF nombre, telefono, email ON apoderados BEGIN
+                INSERT INTO apoderados_fts(apoderados_fts, rowid, nombre, telefono, email) VALUES ('delete', old.id, old.nombre, old.telefono, old.email);
+                INSERT INTO apoderados_fts(rowid, nombre, telefono, email) VALUES (new.id, new.nombre, new.telefono, new.email);
+            END;
+        ''')
+        # Poblar el índice con los datos ya existentes
+        cursor.execute("INSERT INTO estudiantes_fts(estudiantes_fts) VALUES ('rebuild')")
+        cursor.execute("INSERT INTO apoderados_fts(apoderados_fts) VALUES ('rebuild')")
+
+    def _migracion_indices_pagos(self, cursor):
+        """Índices compuestos de las consultas frecuentes y pago único por alumno y mes."""
+        # Los pagos repetidos (mismo alumno y mes) se apartan, sin borrarlos, para poder crear el índice único
+        cursor.execute("CREATE TABLE IF NOT EXISTS mensualidades_duplicadas AS SELECT * FROM mensualidades WHERE 0")
+        duplicados = '''
+            SELECT id FROM mensualidades m
+            WHERE EXISTS (SELECT 1 FROM mensualidades o WHERE o.estudiante_id = m.estudiante_id AND o.mes = m.mes AND o.id < m.id)
+        '''
+        cursor.execute(f"INSERT INTO mensualidades_duplicadas SELECT * FROM mensualidades WHERE id IN ({duplicados})")
+        if cursor.rowcount:
+            logging.warning(f"Migración: {cursor.rowcount} pagos duplicados movidos a la tabla mensualidades_duplicadas")
+            cursor.execute("DELETE FROM mensualidades WHERE id IN (SELECT id FROM mensualidades_duplicadas)")
+
+        # verificar_pago_existente, registrar_pago (ON CONFLICT) y obtener_pagos_alumno
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mensualidades_estudiante_mes ON mensualidades(estudiante_id, mes)")
+        # Ingresos del mes en el dashboard: índice cubriente, no lee la tabla
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mensualidades_mes_monto ON mensualidades(mes, monto)")
+        # verificar_dependencia_apoderado
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_estudiantes_apoderado ON estudiantes(apoderado_id)")
+        # verificar_estudiante_existente; también cubre las búsquedas por nombre del índice anterior
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_estudiantes_nombre_grado ON estudiantes(nombre, grado)")
+        cursor.execute("DROP INDEX IF EXISTS idx_estudiantes_nombre")
+
+    def _migracion_indice_listado_alumnos(self, cursor):
+        """Índice para recorrer el listado de alumnos por páginas en orden (grado, nombre)."""
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_estudiantes_grado_nombre ON estudiantes(grado, nombre)")
+
+    def _migracion_calendario_meses(self, cursor):
+        """Tabla calendario de meses (índice 0-11 y nombre) para calcular morosidad en SQL."""
+        cursor.execute("CREATE TABLE IF NOT EXISTS calendario_meses (idx INTEGER PRIMARY KEY, nombre TEXT NOT NULL UNIQUE)")
+        cursor.executemany("INSERT OR REPLACE INTO calendario_meses (idx, nombre) VALUES (?, ?)", list(enumerate(MESES)))
+
+    def _migracion_periodo_mensualidades(self, cursor):
+        """Columnas anio y mes_idx en mensualidades; el pago único pasa a ser por alumno, año y mes."""
+        columnas = self._columnas(cursor, "mensualidades")
+        for columna in ("anio", "mes_idx"):
+            if columna not in columnas:
+                cursor.execute(f"ALTER TABLE mensualidades ADD COLUMN {columna} INTEGER")
+
+        # El texto de los meses puede venir de versiones antiguas o importaciones (minúsculas, sin tildes)
+        periodos = [(self._anio_de_fecha(fecha), self._indice_mes(mes), id_pago)
+                    for id_pago, mes, fecha in cursor.execute("SELECT id, mes, fecha_pago FROM mensualidades").fetchall()]
+        cursor.executemany("UPDATE mensualidades SET anio = ?, mes_idx = ? WHERE id = ?", periodos)
+        sin_mes = sum(1 for p in periodos if p[1] is None)
+        if sin_mes:
+            logging.warning(f"Migración: {sin_mes} pagos tienen un mes no reconocido y quedan sin mes_idx")
+
+        # registrar_pago (ON CONFLICT), verificar_pago_existente y rangos de meses de un alumno en obtener_morosos
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mensualidades_periodo ON mensualidades(estudiante_id, anio, mes_idx)")
+        cursor.execute("DROP INDEX IF EXISTS idx_mensualidades_estudiante_mes")
+        # Ingresos del mes en el dashboard: índice cubriente por período
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mensualidades_anio_mes_monto ON mensualidades(anio, mes_idx, monto)")
+        cursor.execute("DROP INDEX IF EXISTS idx_mensualidades_mes_monto")
+
+        # Inserciones que solo traen el texto del mes (SQL manual, herramientas externas) completan el período
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS mensualidades_periodo_ai AFTER INSERT ON mensualidades
+            WHEN NEW.anio IS NULL OR NEW.mes_idx IS NULL
+            BEGIN
+                UPDATE mensualidades SET
+                    anio = COALESCE(NEW.anio, CASE WHEN NEW.fecha_pago GLOB '[0-9][0-9][0-9][0-9]-*'
+                                                   THEN CAST(substr(NEW.fecha_pago, 1, 4) AS INTEGER)
+                                                   ELSE CAST(strftime('%Y', 'now', 'localtime') AS INTEGER) END),
+                    mes_idx = COALESCE(NEW.mes_idx, (SELECT idx FROM calendario_meses WHERE nombre = NEW.mes))
+                WHERE id = NEW.id;
+            END;
+        ''')
+
+        # El estado de cuenta materializado (si está activo) pasa a leer las columnas nuevas
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estado_cuenta'").fetchone():
+            for trigger in self._TRIGGERS_ESTADO_CUENTA:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            self._crear_estado_cuenta(cursor)
+            self._reconstruir_estado_cuenta(cursor)
+
+    def _migracion_resumenes(self, cursor):
+        """Resúmenes precalculados del dashboard (ingresos por año/mes/grado y alumnos por grado) mantenidos por triggers."""
+        # El grado NULL se guarda como '' porque forma parte de la clave primaria
+        grado_alumno = "COALESCE((SELECT grado FROM estudiantes WHERE id = {r}.estudiante_id), '')"
+        grado_new, grado_old = grado_alumno.format(r="NEW"), grado_alumno.format(r="OLD")
+        # Los pagos con un mes no reconocido (mes_idx NULL) no entran al resumen, igual que en la consulta directa
+        sumar_pago = f'''
+            INSERT INTO resumen_ingresos (anio, mes_idx, grado, total, pagos)
+            SELECT NEW.anio, NEW.mes_idx, {grado_new}, COALESCE(NEW.monto, 0), 1
+            WHERE NEW.anio IS NOT NULL AND NEW.mes_idx IS NOT NULL
+            ON CONFLICT(anio, mes_idx, grado) DO UPDATE SET total = total + excluded.total, pagos = pagos + 1;
+        '''
+        quitar_pago = f'''
+            UPDATE resumen_ingresos SET total = total - COALESCE(OLD.monto, 0), pagos = pagos - 1
+            WHERE anio = OLD.anio AND mes_idx = OLD.mes_idx AND grado = {grado_old};
+            DELETE FROM resumen_ingresos WHERE anio = OLD.anio AND mes_idx = OLD.mes_idx AND grado = {grado_old} AND pagos <= 0;
+        '''
+        self._ejecutar_script(cursor, f'''
+            CREATE TABLE IF NOT EXISTS resumen_ingresos (
+                anio INTEGER NOT NULL,
+                mes_idx INTEGER NOT NULL,
+                grado TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                pagos INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (anio, mes_idx, grado)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS resumen_grados (
+                grado TEXT PRIMARY KEY,
+                alumnos INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS resumen_pago_ai AFTER INSERT ON mensualidades BEGIN
+                {sumar_pago}
+            END;
+            CREATE TRIGGER IF NOT EXISTS resumen_pago_ad AFTER DELETE ON mensualidades BEGIN
+                {quitar_pago}
+            END;
+            CREATE TRIGGER IF NOT EXISTS resumen_pago_au AFTER UPDATE OF estudiante_id, anio, mes_idx, monto ON mensualidades BEGIN
+                {quitar_pago}
+                {sumar_pago}
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS resumen_alumno_ai AFTER INSERT ON estudiantes BEGIN
+                INSERT INTO resumen_grados (grado, alumnos) VALUES (COALESCE(NEW.grado, ''), 1)
+                ON CONFLICT(grado) DO UPDATE SET alumnos = alumnos + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS resumen_alumno_ad AFTER DELETE ON estudiantes BEGIN
+                UPDATE resumen_grados SET alumnos = alumnos - 1 WHERE grado = COALESCE(OLD.grado, '');
+                DELETE FROM resumen_grados WHERE grado = COALESCE(OLD.grado, '') AND alumnos <= 0;
+            END;
+        ''')
+        self._crear_trigger_resumen_alumno(cursor)
+        self._reconstruir_resumenes(cursor)
+
+    # Mientras esta clave existe en configuración (solo dentro de la transacción de una operación masiva), el cambio
+    # de grado no actualiza los resúmenes fila por fila: la operación los reconstruye una sola vez al final
+    CLAVE_RESUMENES_EN_PAUSA = "resumenes_en_pausa"
+
+    def _crear_trigger_resumen_alumno(self, cursor):
+        pagos_alumno = '''
+            SELECT anio, mes_idx, TOTAL(monto) AS total, COUNT(*) AS pagos FROM mensualidades
+            WHERE estudiante_id = NEW.id AND anio IS NOT NULL AND mes_idx IS NOT NULL
+            GROUP BY anio, mes_idx
+        '''
+        self._ejecutar_script(cursor, f'''
+            -- Cambio de grado: los pagos del alumno pasan de un grado al otro (el conteo de alumnos está en resumen_grados_au)
+            CREATE TRIGGER IF NOT EXISTS resumen_alumno_au AFTER UPDATE OF grado ON estudiantes
+            WHEN COALESCE(OLD.grado, '') != COALESCE(NEW.grado, '')
+                AND NOT EXISTS (SELECT 1 FROM configuracion WHERE clave = '{self.CLAVE_RESUMENES_EN_PAUSA}')
+            BEGIN
+                UPDATE resumen_ingresos SET total = resumen_ingresos.total - p.total, pagos = resumen_ingresos.pagos - p.pagos
+                FROM ({pagos_alumno}) AS p
+                WHERE resumen_ingresos.anio = p.anio AND resumen_ingresos.mes_idx = p.mes_idx AND resumen_ingresos.grado = COALESCE(OLD.grado, '');
+                DELETE FROM resumen_ingresos WHERE grado = COALESCE(OLD.grado, '') AND pagos <= 0;
+                INSERT INTO resumen_ingresos (anio, mes_idx, grado, total, pagos)
+                SELECT p.anio, p.mes_idx, COALESCE(NEW.grado, ''), p.total, p.pagos FROM ({pagos_alumno}) AS p WHERE true
+                ON CONFLICT(anio, mes_idx, grado) DO UPDATE SET total = total + excluded.total, pagos = pagos + excluded.pagos;
+            END;
+        ''')
+
+    def _crear_triggers_resumen_grados(self, cursor):
+        """resumen_grados cuenta solo a los alumnos activos: retirar o egresar a un alumno lo descuenta de su grado."""
+        quitar_old = '''
+                UPDATE resumen_grados SET alumnos = alumnos - 1 WHERE grado = COALESCE(OLD.grado, '') AND OLD.estado = 'activo';
+                DELETE FROM resumen_grados WHERE grado = COALESCE(OLD.grado, '') AND alumnos <= 0;
+        '''
+        sumar_new = '''
+                INSERT INTO resumen_grados (grado, alumnos) SELECT COALESCE(NEW.grado, ''), 1 WHERE NEW.estado = 'activo'
+                ON CONFLICT(grado) DO UPDATE SET alumnos = alumnos + 1;
+        '''
+        self._ejecutar_script(cursor, f'''
+            CREATE TRIGGER IF NOT EXISTS resumen_alumno_ai AFTER INSERT ON estudiantes BEGIN
+                {sumar_new}
+            END;
+            CREATE TRIGGER IF NOT EXISTS resumen_alumno_ad AFTER DELETE ON estudiantes BEGIN
+                {quitar_old}
+            END;
+            CREATE TRIGGER IF NOT EXISTS resumen_grados_au AFTER UPDATE OF grado, estado ON estudiantes
+            WHEN (COALESCE(OLD.grado, '') != COALESCE(NEW.grado, '') OR OLD.estado != NEW.estado)
+                AND NOT EXISTS (SELECT 1 FROM configuracion WHERE clave = '{self.CLAVE_RESUMENES_EN_PAUSA}')
+            BEGIN
+                {quitar_old}
+                {sumar_new}
+            END;
+        ''')
+
+    def _reconstruir_resumenes(self, cursor):
+        # Los años archivados ya no tienen pagos en esta base: su resumen se conserva tal como quedó al cerrarlos
+        archivados = "SELECT NULL WHERE 0"
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archivos_anuales'").fetchone():
+            archivados = "SELECT anio FROM archivos_anuales"
+        cursor.execute(f"DELETE FROM resumen_ingresos WHERE anio NOT IN ({archivados})")
+        cursor.execute(f'''
+            INSERT INTO resumen_ingresos (anio, mes_idx, grado, total, pagos)
+            SELECT m.anio, m.mes_idx, COALESCE(e.grado, ''), TOTAL(m.monto), COUNT(*)
+            FROM mensualidades m
+            LEFT JOIN estudiantes e ON e.id = m.estudiante_id
+            WHERE m.anio IS NOT NULL AND m.mes_idx IS NOT NULL AND m.anio NOT IN ({archivados})
+            GROUP BY m.anio, m.mes_idx, COALESCE(e.grado, '')
+        ''')
+        cursor.execute("DELETE FROM resumen_grados")
+        # Antes de la migración archivo_anual no existe el estado: todos los alumnos están activos
+        activos = "WHERE estado = 'activo'" if "estado" in self._columnas(cursor, "estudiantes") else ""
+        cursor.execute(f"INSERT INTO resumen_grados (grado, alumnos) SELECT COALESCE(grado, ''), COUNT(*) FROM estudiantes {activos} GROUP BY COALESCE(grado, '')")
+
+    def reconstruir_resumenes(self):
+        """Recalcula desde cero los resúmenes del dashboard (mantenimiento; los triggers los mantienen al día)."""
+        with self._transaccion(tablas=("resumen_ingresos", "resumen_grados")) as cursor:
+            self._reconstruir_resumenes(cursor)
+
+    def _migracion_diario_cambios(self, cursor):
+        """Diario de cambios (solo se agrega) de apoderados, estudiantes y mensualidades, escrito por triggers."""
+        # AUTOINCREMENT: seq nunca se reutiliza, aunque se purguen las filas más antiguas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cambios (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tabla TEXT NOT NULL,
+                fila_id INTEGER NOT NULL,
+                operacion TEXT NOT NULL CHECK (operacion IN ('I', 'U', 'D')),
+                datos TEXT,
+                fecha TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'))
+            )
+        ''')
+        for tabla in self.COLUMNAS_DIARIO:
+            columnas = self._columnas_diario(cursor, tabla)
+            # Las altas y modificaciones guardan la fila completa en JSON; las bajas solo el id
+            datos = "json_object(" + ", ".join(f"'{c}', NEW.{c}" for c in columnas) + ")"
+            self._ejecutar_script(cursor, f'''
+                CREATE TRIGGER IF NOT EXISTS cambios_{tabla}_ai AFTER INSERT ON {tabla} BEGIN
+                    INSERT INTO cambios (tabla, fila_id, operacion, datos) VALUES ('{tabla}', NEW.id, 'I', {datos});
+                END;
+                CREATE TRIGGER IF NOT EXISTS cambios_{tabla}_au AFTER UPDATE ON {tabla} BEGIN
+                    INSERT INTO cambios (tabla, fila_id, operacion, datos) VALUES ('{tabla}', NEW.id, 'U', {datos});
+                END;
+                CREATE TRIGGER IF NOT EXISTS cambios_{tabla}_ad AFTER DELETE ON {tabla} BEGIN
+                    INSERT INTO cambios (tabla, fila_id, operacion, datos) VALUES ('{tabla}', OLD.id, 'D', NULL);
+                END;
+            ''')
+
+    def _migracion_sincronizacion(self, cursor):
+        """Identidad global (uid) y versión de cada fila, y registro de bajas, para sincronizar entre equipos."""
+        cursor.execute("INSERT OR IGNORE INTO configuracion (clave, valor) VALUES ('nodo_id', ?)", (uuid.uuid4().hex,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_bajas (
+                tabla TEXT NOT NULL,
+                uid TEXT NOT NULL,
+                fila_id INTEGER,
+                modificado TEXT NOT NULL,
+                origen TEXT NOT NULL,
+                PRIMARY KEY (tabla, uid)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_bajas_fila ON sync_bajas(tabla, fila_id)")
+
+        for tabla in self.TABLAS_SYNC:
+            columnas = self._columnas(cursor, tabla)
+            for columna in ("uid", "modificado", "origen"):
+                if columna not in columnas:
+                    cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} TEXT")
+            # Filas existentes: uid derivado del contenido y versión fija, para que dos copias del mismo
+            # archivo (la forma en que hoy se reparten los datos) reconozcan sus filas como las mismas
+            campos = self._columnas_diario(cursor, tabla)
+            filas = cursor.execute(f"SELECT id, {', '.join(campos)} FROM {tabla} WHERE uid IS NULL").fetchall()
+            cursor.executemany(
+                f"UPDATE {tabla} SET uid = ?, modificado = '1970-01-01T00:00:00.000', origen = '' WHERE id = ?",
+                [(hashlib.sha256(json.dumps([tabla, *fila]).encode()).hexdigest()[:32], fila[0]) for fila in filas]
+            )
+            cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{tabla}_uid ON {tabla}(uid)")
+
+            self._ejecutar_script(cursor, f'''
+                CREATE TRIGGER IF NOT EXISTS sync_{tabla}_ai AFTER INSERT ON {tabla}
+                WHEN NEW.uid IS NULL OR NEW.modificado IS NULL
+                BEGIN
+                    UPDATE {tabla} SET uid = COALESCE(NEW.uid, lower(hex(randomblob(16)))),
+                                       modificado = COALESCE(NEW.modificado, {self._SQL_AHORA_SYNC}),
+                                       origen = COALESCE(NEW.origen, {self._SQL_NODO})
+                    WHERE id = NEW.id;
+                END;
+                -- Si la baja llega de otro equipo su registro ya existe con la versión remota (mayor que la de la fila);
+                -- un registro más antiguo que la fila es de una baja anterior que luego se revirtió
+                CREATE TRIGGER IF NOT EXISTS sync_{tabla}_ad AFTER DELETE ON {tabla} WHEN OLD.uid IS NOT NULL BEGIN
+                    INSERT INTO sync_bajas (tabla, uid, fila_id, modificado, origen)
+                    VALUES ('{tabla}', OLD.uid, OLD.id, {self._SQL_AHORA_SYNC}, {self._SQL_NODO})
+                    ON CONFLICT(tabla, uid) DO UPDATE SET
+                        fila_id = excluded.fila_id,
+                        modificado = CASE WHEN (sync_bajas.modificado, sync_bajas.origen) < (OLD.modificado, COALESCE(OLD.origen, '')) THEN excluded.modificado ELSE sync_bajas.modificado END,
+                        origen = CASE WHEN (sync_bajas.modificado, sync_bajas.origen) < (OLD.modificado, COALESCE(OLD.origen, '')) THEN excluded.origen ELSE sync_bajas.origen END;
+                END;
+            ''')
+            self._crear_triggers_datos(cursor, tabla, campos)
+            # Las filas anteriores al diario entran a él una vez, para que un equipo nuevo las reciba
+            cursor.execute(f'''
+                INSERT INTO cambios (tabla, fila_id, operacion, datos)
+                SELECT '{tabla}', id, 'I', json_object({", ".join(f"'{c}', {c}" for c in campos)}) FROM {tabla}
+                WHERE id NOT IN (SELECT fila_id FROM cambios WHERE tabla = '{tabla}')
+                ORDER BY id
+            ''')
+
+    @classmethod
+    def _columnas_diario(cls, cursor, tabla):
+        """Columnas del diario que ya existen en la tabla (una migración antigua no ve las que se agregan después)."""
+        existentes = cls._columnas(cursor, tabla)
+        return tuple(c for c in cls.COLUMNAS_DIARIO[tabla] if c in existentes)
+
+    def _crear_triggers_datos(self, cursor, tabla, campos):
+        """(Re)crea los triggers que dependen de la lista de columnas de datos: diario de altas y modificaciones, y versión local."""
+        lista = ", ".join(campos)
+        datos = "json_object(" + ", ".join(f"'{c}', NEW.{c}" for c in campos) + ")"
+        self._ejecutar_script(cursor, f'''
+            DROP TRIGGER IF EXISTS cambios_{tabla}_ai;
+            CREATE TRIGGER cambios_{tabla}_ai AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO cambios (tabla, fila_id, operacion, datos) VALUES ('{tabla}', NEW.id, 'I', {datos});
+            END;
+            -- El diario solo registra cambios de datos, no los de uid/versión
+            DROP TRIGGER IF EXISTS cambios_{tabla}_au;
+            CREATE TRIGGER cambios_{tabla}_au AFTER UPDATE OF {lista} ON {tabla} BEGIN
+                INSERT INTO cambios (tabla, fila_id, operacion, datos) VALUES ('{tabla}', NEW.id, 'U', {datos});
+            END;
+            -- Edición local (no trae versión propia): nueva versión de este equipo
+            DROP TRIGGER IF EXISTS sync_{tabla}_au;
+            CREATE TRIGGER sync_{tabla}_au AFTER UPDATE OF {lista} ON {tabla}
+            WHEN NEW.modificado IS OLD.modificado
+            BEGIN
+                UPDATE {tabla} SET modificado = {self._SQL_AHORA_SYNC}, origen = {self._SQL_NODO} WHERE id = NEW.id;
+            END;
+        ''')
+
+    def _migracion_archivo_anual(self, cursor):
+        """Estado del alumno (activo/retirado/egresado) y registro de años cerrados y archivados."""
+        if "estado" not in self._columnas(cursor, "estudiantes"):
+            cursor.execute("ALTER TABLE estudiantes ADD COLUMN estado TEXT NOT NULL DEFAULT 'activo'")
+        self._crear_triggers_datos(cursor, "estudiantes", self._columnas_diario(cursor, "estudiantes"))
+        # archivo: nombre del .db dentro de la carpeta de archivos, junto a la base principal
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archivos_anuales (
+                anio INTEGER PRIMARY KEY,
+                archivo TEXT NOT NULL,
+                pagos INTEGER NOT NULL,
+                total REAL NOT NULL,
+                alumnos INTEGER NOT NULL,
+                fecha TEXT NOT NULL
+            )
+        ''')
+
+    def _migracion_auto_vacuum(self, cursor):
+        """Vaciado incremental: las páginas liberadas por borrados masivos se pueden devolver al disco."""
+        # En una base con tablas solo queda registrado: lo aplica el primer VACUUM completo del mantenimiento
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    def _migracion_resumen_en_pausa(self, cursor):
+        """El trigger de cambio de grado se puede pausar durante una operación masiva (ver promover_grados)."""
+        cursor.execute("DROP TRIGGER IF EXISTS resumen_alumno_au")
+        self._crear_trigger_resumen_alumno(cursor)
+
+    # Mientras esta clave existe en configuración (solo dentro de la transacción que archiva un año), las bajas no se
+    # anotan en el diario ni en sync_bajas: pasar filas al archivo no es borrarlas, y los otros equipos no deben recibirlas
+    CLAVE_DIARIO_EN_PAUSA = "diario_en_pausa"
+
+    def _crear_triggers_bajas(self, cursor, tabla):
+        """(Re)crea los triggers de baja de una tabla: diario de cambios y registro de bajas para sincronizar."""
+        activo = f"NOT EXISTS (SELECT 1 FROM configuracion WHERE clave = '{self.CLAVE_DIARIO_EN_PAUSA}')"
+        self._ejecutar_script(cursor, f'''
+            DROP TRIGGER IF EXISTS cambios_{tabla}_ad;
+            CREATE TRIGGER cambios_{tabla}_ad AFTER DELETE ON {tabla} WHEN {activo} BEGIN
+                INSERT INTO cambios (tabla, fila_id, operacion, datos) VALUES ('{tabla}', OLD.id, 'D', NULL);
+            END;
+            DROP TRIGGER IF EXISTS sync_{tabla}_ad;
+            CREATE TRIGGER sync_{tabla}_ad AFTER DELETE ON {tabla} WHEN OLD.uid IS NOT NULL AND {activo} BEGIN
+                INSERT INTO sync_bajas (tabla, uid, fila_id, modificado, origen)
+                VALUES ('{tabla}', OLD.uid, OLD.id, {self._SQL_AHORA_SYNC}, {self._SQL_NODO})
+                ON CONFLICT(tabla, uid) DO UPDATE SET
+                    fila_id = excluded.fila_id,
+                    modificado = CASE WHEN (sync_bajas.modificado, sync_bajas.origen) < (OLD.modificado, COALESCE(OLD.origen, '')) THEN excluded.modificado ELSE sync_bajas.modificado END,
+                    origen = CASE WHEN (sync_bajas.modificado, sync_bajas.origen) < (OLD.modificado, COALESCE(OLD.origen, '')) THEN excluded.origen ELSE sync_bajas.origen END;
+            END;
+        ''')
+
+    def _migracion_diario_en_pausa(self, cursor):
+        """Archivar un año ya no borra filas del diario: sus bajas no se registran (ver CLAVE_DIARIO_EN_PAUSA)."""
+        for tabla in self.TABLAS_SYNC:
+            self._crear_triggers_bajas(cursor, tabla)
+
+    def _migracion_resumen_grados_activos(self, cursor):
+        """El dashboard cuenta solo a los alumnos activos (los retirados y egresados dejan de sumar en su grado)."""
+        for trigger in ("resumen_alumno_ai", "resumen_alumno_ad", "resumen_alumno_au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        self._crear_trigger_resumen_alumno(cursor)
+        self._crear_triggers_resumen_grados(cursor)
+        self._reconstruir_resumenes(cursor)
+
+    def verificar_nodo(self):
+        """
+        El nodo_id identifica al equipo en la sincronización. Si la base fue copiada a otro equipo o carpeta,
+        se le asigna uno nuevo y sus cambios propios se reenvían desde el inicio del diario.
+        La aplicación lo llama al abrir la base para trabajar en ella (no al solo leerla, como en el reporte consolidado).
+        """
+        equipo = f"{platform.node()}|{os.path.abspath(self.db_path)}"
+        if self.obtener_configuracion("nodo_equipo") == equipo:
+            return
+        with self._transaccion() as cursor:
+            anterior = cursor.execute("SELECT valor FROM configuracion WHERE clave = 'nodo_id'").fetchone()
+            nuevo = uuid.uuid4().hex
+            if anterior is not None and cursor.execute("SELECT valor FROM configuracion WHERE clave = 'nodo_equipo'").fetchone():
+                for tabla in self.TABLAS_SYNC:
+                    cursor.execute(f"UPDATE {tabla} SET origen = ? WHERE origen = ?", (nuevo, anterior[0]))
+                cursor.execute("DELETE FROM configuracion WHERE clave LIKE 'sync_enviado_hasta|%'")
+            else:
+                # Primera apertura después de la migración: se conserva el id que ya tienen las filas
+                nuevo = anterior[0] if anterior else nuevo
+            cursor.executemany("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, ?)",
+                               [("nodo_id", nuevo), ("nodo_equipo", equipo)])
+
+    @property
+    def nodo_id(self):
+        return self.obtener_configuracion("nodo_id")
+
+    @staticmethod
+    def _indice_mes(mes):
+        """Índice 0-11 de un nombre de mes, sin distinguir mayúsculas ni tildes; None si no es un mes."""
+        return INDICE_MES.get(SchoolDB._normalizar_texto(mes))
+
+    @staticmethod
+    def _indice_mes_requerido(mes):
+        """Como _indice_mes, pero un mes desconocido es un error: con mes_idx NULL el índice único no detecta duplicados."""
+        mes_idx = SchoolDB._indice_mes(mes)
+        if mes_idx is None:
+            raise ValueError(f"Mes desconocido: {mes}")
+        return mes_idx
+
+    @staticmethod
+    def _anio_de_fecha(fecha):
+        """
+        Año de una fecha de pago guardada ('2025-03-10 ...' o '10/03/2025'); el año actual si no se puede leer.
+        Solo para filas antiguas (migración): las fechas nuevas se validan con _normalizar_fecha.
+        """
+        coincidencia = re.search(r"\b(\d{4})\b", fecha or "")
+        if coincidencia:
+            return int(coincidencia.group(1))
+        logging.warning(f"Migración: fecha de pago ilegible ({fecha!r}); se asigna al año actual")
+        return datetime.now().year
+
+    # Formatos de fecha de pago aceptados al importar; se guardan siempre como FORMATO_FECHA
+    FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+    FORMATOS_FECHA_ENTRADA = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d",
+                              "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y", "%d-%m-%Y")
+
+    @classmethod
+    def _normalizar_fecha(cls, texto):
+        """Fecha en uno de los formatos aceptados convertida a FORMATO_FECHA (ordenable como texto); None si no se puede leer."""
+        for formato in cls.FORMATOS_FECHA_ENTRADA:
+            try:
+                return datetime.strptime(texto.strip(), formato).strftime(cls.FORMATO_FECHA)
+            except ValueError:
+                continue
+        return None
+
+    @property
+    def fts_disponible(self):
+        """True si la base tiene el índice FTS5 (se consulta una sola vez, en la primera búsqueda)."""
+        if self._fts_disponible is None:
+            self._fts_disponible = bool(self.obtener_datos("SELECT 1 FROM sqlite_master WHERE name = 'estudiantes_fts'"))
+        return self._fts_disponible
+
+    # --- Instrumentación de Consultas ---
+
+    def activar_instrumentacion(self, umbral_lento_ms=100.0, ruta_log=None):
+        """
+        Mide las sentencias que pasan por ejecutar_query, obtener_datos y _transaccion (las lecturas servidas
+        desde la caché no llegan a la base y no se cuentan). Las que tarden umbral_lento_ms o más se escriben en
+        ruta_log (por defecto consultas_lentas.log junto a la base). Desactivada no agrega ningún costo: el
+        cursor normal se reemplaza en la instancia solo mientras está activa.
+        """
+        if ruta_log is None:
+            ruta_log = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), "consultas_lentas.log")
+        if self.instrumentacion is None:
+            self.instrumentacion = InstrumentacionSQL(umbral_lento_ms, ruta_log)
+        else:
+            self.instrumentacion.umbral_lento_ms = umbral_lento_ms
+            self.instrumentacion.ruta_log = ruta_log
+        fabrica = lambda conn: _CursorMedido(conn, self.instrumentacion)
+        self._cursor = lambda conn: conn.cursor(fabrica)
+
+    def desactivar_instrumentacion(self):
+        """Vuelve al cursor normal. Las estadísticas tomadas se conservan hasta reiniciarlas."""
+        self.__dict__.pop("_cursor", None)
+
+    @property
+    def instrumentacion_activa(self):
+        return "_cursor" in self.__dict__
+
+    def estadisticas_consultas(self):
+        """Instantánea de la instrumentación (ver InstrumentacionSQL.instantanea); vacía si nunca se activó."""
+        return self.instrumentacion.instantanea() if self.instrumentacion else []
+
+    def reiniciar_estadisticas_consultas(self):
+        if self.instrumentacion:
+            self.instrumentacion.reiniciar()
+
+    # --- Caché de Lecturas ---
+
+    def _tablas_lectura(self, query):
+        """Tablas que lee una consulta SELECT; None si la consulta no se debe guardar en caché."""
+        tablas = self._tablas_por_consulta.get(query, False)
+        if tablas is False:
+            texto = query.lstrip().upper()
+            if not texto.startswith(("SELECT", "WITH")) or "'NOW'" in texto or "RANDOM(" in texto:
+                tablas = None
+            else:
+                tablas = tuple(sorted({t.lower() for t in self._RE_TABLAS_LECTURA.findall(query)}))
+            self._tablas_por_consulta[query] = tablas
+        return tablas
+
+    def _version_cache(self, tablas):
+        return (self._epoca_cache,) + tuple(self._generaciones.get(t, 0) for t in tablas)
+
+    def _invalidar_cache(self, tablas=None):
+        """Marca como vencidas las lecturas de las tablas indicadas (y sus derivadas). None = todas."""
+        with self._lock_cache:
+            if tablas is None:
+                self._epoca_cache += 1
+                self._cache_lecturas.clear()
+                return
+            for tabla in tablas:
+                tabla = tabla.lower()
+                for t in (tabla,) + self.TABLAS_DERIVADAS.get(tabla, ()):
+                    self._generaciones[t] = self._generaciones.get(t, 0) + 1
+
+    def _revisar_cambios_externos(self, conn):
+        """PRAGMA data_version cambia cuando otra conexión (otro hilo u otro proceso) confirmó cambios."""
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        anterior = getattr(self._local, "data_version", None)
+        self._local.data_version = version
+        # En una conexión nueva no se sabe qué cambió mientras no existía: se invalida todo
+        if version != anterior:
+            self._invalidar_cache()
 
     def ejecutar_query(self, query, params=()):
         conn = self._conectar()
         try:
-            cursor = conn.cursor()
+            cursor = self._cursor(conn)
             cursor.execute(query, params)
-            conn.commit()
+            return cursor.rowcount
         except sqlite3.Error as e:
             logging.error(f"Error SQL ejecutando '{query}': {e}")
             raise
         finally:
-            conn.close()
+            coincidencia = self._RE_TABLA_ESCRITURA.match(query)
+            self._invalidar_cache((coincidencia.group(1),) if coincidencia else None)
 
     def obtener_datos(self, query, params=()):
+        """Lecturas con caché: repetir una consulta sin escrituras de por medio no vuelve a la base."""
         conn = self._conectar()
+        clave = version = None
+        tablas = self._tablas_lectura(query)
+        # Dentro de una transacción se podrían ver cambios sin confirmar: no se usa la caché
+        if tablas is not None and not conn.in_transaction and not isinstance(params, dict):
+            self._revisar_cambios_externos(conn)
+            clave = (query, tuple(params))
+            with self._lock_cache:
+                version = self._version_cache(tablas)
+                entrada = self._cache_lecturas.get(clave)
+                if entrada is not None and entrada[0] == version:
+                    self._cache_lecturas.move_to_end(clave)
+                    return list(entrada[1])
         try:
-            cursor = conn.cursor()
+            cursor = self._cursor(conn)
             cursor.execute(query, params)
             rows = cursor.fetchall()
-            return rows
         except sqlite3.Error as e:
             logging.error(f"Error SQL obteniendo datos '{query}': {e}")
             return []
-        finally:
-            conn.close()
+        if clave is not None:
+            # Se guarda con la versión previa a la lectura: si hubo una escritura en medio, la entrada ya nace vencida
+            with self._lock_cache:
+                self._cache_lecturas[clave] = (version, rows)
+                self._cache_lecturas.move_to_end(clave)
+                while len(self._cache_lecturas) > self.TAMANO_CACHE_LECTURAS:
+                    self._cache_lecturas.popitem(last=False)
+        return list(rows)
 
     # --- Métodos Específicos ---
     
@@ -149,17 +1083,13 @@ class SchoolDB:
         self.ejecutar_query("INSERT INTO estudiantes (nombre, grado, apoderado_id, fecha_registro) VALUES (?, ?, ?, ?)", (nombre, grado, apoderado_id, fecha))
 
     def eliminar_estudiante(self, estudiante_id):
-        conn = self._conectar()
         try:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM mensualidades WHERE estudiante_id = ?", (estudiante_id,))
-            cursor.execute("DELETE FROM estudiantes WHERE id = ?", (estudiante_id,))
-            conn.commit()
+            with self._transaccion(tablas=("mensualidades", "estudiantes")) as cursor:
+                cursor.execute("DELETE FROM mensualidades WHERE estudiante_id = ?", (estudiante_id,))
+                cursor.execute("DELETE FROM estudiantes WHERE id = ?", (estudiante_id,))
         except sqlite3.Error as e:
             logging.error(f"Error eliminando estudiante {estudiante_id}: {e}")
             raise
-        finally:
-            conn.close()
 
     def actualizar_estudiante(self, id, nombre, grado, apoderado_id):
         self.ejecutar_query("UPDATE estudiantes SET nombre=?, grado=?, apoderado_id=? WHERE id=?", (nombre, grado, apoderado_id, id))
@@ -176,6 +1106,32 @@ class SchoolDB:
         '''
         return self.obtener_datos(query)
 
+    def obtener_estudiantes_pagina(self, limite=200, despues_de=None):
+        """
+        Página del listado de alumnos en orden (grado, nombre, id), paginada por clave (keyset).
+        despues_de = (grado, nombre, id) de la última fila recibida; None para la primera página.
+        """
+        condicion = ""
+        params = []
+        if despues_de is not None:
+            grado, nombre, id_est = despues_de
+            if grado is None:
+                # Los grados NULL van primero en orden ascendente
+                condicion = "WHERE (e.grado IS NULL AND (e.nombre, e.id) > (?, ?)) OR e.grado IS NOT NULL"
+                params = [nombre, id_est]
+            else:
+                condicion = "WHERE (e.grado, e.nombre, e.id) > (?, ?, ?)"
+                params = [grado, nombre, id_est]
+        query = f'''
+            SELECT e.id, e.nombre, e.grado, e.fecha_registro, a.nombre, a.telefono, a.email 
+            FROM estudiantes e 
+            LEFT JOIN apoderados a ON e.apoderado_id = a.id
+            {condicion}
+            ORDER BY e.grado, e.nombre, e.id
+            LIMIT ?
+        '''
+        return self.obtener_datos(query, (*params, limite))
+
     def buscar_estudiantes(self, termino):
         query = '''
             SELECT e.id, e.nombre, e.grado, e.fecha_registro, a.nombre, a.telefono, a.email 
@@ -186,46 +1142,185 @@ class SchoolDB:
         '''
         return self.obtener_datos(query, ('%' + termino + '%',))
 
-    def registrar_pago(self, estudiante_id, monto, mes):
-        fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.ejecutar_query("INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago) VALUES (?, ?, ?, 1, ?)", (estudiante_id, monto, mes, fecha))
+    @staticmethod
+    def _consulta_fts(termino):
+        """Convierte el texto del usuario en una consulta FTS5 de prefijos: 'jose per' -> '"jose"* "per"*'."""
+        tokens = re.findall(r"\w+", termino or "")
+        return " ".join(f'"{t}"*' for t in tokens)
+
+    def buscar_estudiantes_texto(self, termino):
+        """Búsqueda por nombre/grado usando el índice FTS5 (insensible a tildes y mayúsculas, por prefijo)."""
+        consulta = self._consulta_fts(termino)
+        if not self.fts_disponible:
+            return self.buscar_estudiantes(termino)
+        if not consulta:
+            return []
+        query = '''
+            SELECT e.id, e.nombre, e.grado, e.fecha_registro, a.nombre, a.telefono, a.email 
+            FROM estudiantes_fts f
+            JOIN estudiantes e ON e.id = f.rowid
+            LEFT JOIN apoderados a ON e.apoderado_id = a.id
+            WHERE estudiantes_fts MATCH ?
+            ORDER BY e.nombre
+        '''
+        return self.obtener_datos(query, (consulta,))
+
+    def buscar_apoderados_texto(self, termino):
+        consulta = self._consulta_fts(termino)
+        if not self.fts_disponible:
+            like = '%' + termino + '%'
+            return self.obtener_datos("SELECT id, nombre, telefono, email FROM apoderados WHERE nombre LIKE ? OR telefono LIKE ? OR email LIKE ? ORDER BY nombre", (like, like, like))
+        if not consulta:
+            return []
+        query = '''
+            SELECT a.id, a.nombre, a.telefono, a.email
+            FROM apoderados_fts f
+            JOIN apoderados a ON a.id = f.rowid
+            WHERE apoderados_fts MATCH ?
+            ORDER BY a.nombre
+        '''
+        return self.obtener_datos(query, (consulta,))
+
+    def buscar_pagos_texto(self, termino):
+        consulta = self._consulta_fts(termino)
+        if not self.fts_disponible:
+            return self.buscar_pagos(termino)
+        if not consulta:
+            return []
+        query = '''
+            SELECT m.id, e.nombre, e.grado, m.monto, m.mes, m.pagado, m.fecha_pago 
+            FROM estudiantes_fts f
+            JOIN estudiantes e ON e.id = f.rowid
+            JOIN mensualidades m ON m.estudiante_id = e.id
+            WHERE estudiantes_fts MATCH ?
+            ORDER BY m.fecha_pago DESC
+        '''
+        return self.obtener_datos(query, (consulta,))
+
+    def registrar_pago(self, estudiante_id, monto, mes, anio=None):
+        """Registra el pago del mes (del año actual si no se indica) en un solo viaje a la base. Retorna False si ya estaba pagado."""
+        ahora = datetime.now()
+        query = '''
+            INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago, anio, mes_idx) VALUES (?, ?, ?, 1, ?, ?, ?)
+            ON CONFLICT(estudiante_id, anio, mes_idx) DO NOTHING
+        '''
+        anio = anio or ahora.year
+        self._verificar_anio_abierto(anio)
+        params = (estudiante_id, monto, mes, ahora.strftime("%Y-%m-%d %H:%M:%S"), anio, self._indice_mes_requerido(mes))
+        return self.ejecutar_query(query, params) > 0
+
+    def registrar_pagos_lote(self, pagos, anio=None):
+        """
+        Registra muchos pagos [(estudiante_id, monto, mes), ...] del año indicado (el actual por defecto) en una sola transacción.
+        Los duplicados (ya registrados o repetidos dentro del lote) se detectan con una única consulta y se omiten.
+        Retorna (cantidad_registrada, [(estudiante_id, mes) omitidos]).
+        """
+        if not pagos:
+            return 0, []
+        ahora = datetime.now()
+        fecha = ahora.strftime("%Y-%m-%d %H:%M:%S")
+        anio = anio or ahora.year
+        self._verificar_anio_abierto(anio)
+        indices = {mes: self._indice_mes_requerido(mes) for _, _, mes in pagos}
+        ids = sorted({p[0] for p in pagos})
+
+        with self._transaccion(tablas=("mensualidades",)) as cursor:
+            cursor.execute(
+                "SELECT estudiante_id, mes_idx FROM mensualidades WHERE estudiante_id IN (SELECT value FROM json_each(?)) AND anio = ?",
+                (json.dumps(ids), anio)
+            )
+            registrados = set(cursor.fetchall())
+            nuevos = []
+            duplicados = []
+            for estudiante_id, monto, mes in pagos:
+                mes_idx = indices[mes]
+                if (estudiante_id, mes_idx) in registrados:
+                    duplicados.append((estudiante_id, mes))
+                    continue
+                registrados.add((estudiante_id, mes_idx))
+                nuevos.append((estudiante_id, monto, mes, fecha, anio, mes_idx))
+            cursor.executemany('''
+                INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago, anio, mes_idx) VALUES (?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT(estudiante_id, anio, mes_idx) DO NOTHING
+            ''', nuevos)
+
+        return len(nuevos), duplicados
 
     def eliminar_pago(self, id_pago):
         self.ejecutar_query("DELETE FROM mensualidades WHERE id = ?", (id_pago,))
 
     def actualizar_pago(self, id_pago, monto, mes):
-        self.ejecutar_query("UPDATE mensualidades SET monto=?, mes=? WHERE id=?", (monto, mes, id_pago))
+        """Cambia monto y mes (el año del pago se mantiene). Retorna False si el alumno ya tiene otro pago registrado para ese mes."""
+        try:
+            self.ejecutar_query("UPDATE mensualidades SET monto=?, mes=?, mes_idx=? WHERE id=?", (monto, mes, self._indice_mes(mes), id_pago))
+        except sqlite3.IntegrityError:
+            return False
+        return True
 
     def obtener_estudiantes_simple(self):
-        return self.obtener_datos("SELECT id, nombre FROM estudiantes")
+        """(id, nombre) de los alumnos activos (los que pueden registrar pagos)."""
+        return self.obtener_datos("SELECT id, nombre FROM estudiantes WHERE estado = 'activo' ORDER BY nombre")
+
+    def obtener_historial_pagos(self, desde_anio=None):
+        """Historial completo de la base principal; con desde_anio incluye también los años archivados desde ese año."""
+        with self._archivos_adjuntos(desde_anio) as esquemas:
+            query = f'''
+                SELECT m.id, e.nombre, e.grado, m.monto, m.mes, m.pagado, m.fecha_pago 
+                FROM {self._sql_con_archivos("mensualidades", esquemas)} m
+                JOIN {self._sql_con_archivos("estudiantes", esquemas)} e ON m.estudiante_id = e.id
+                ORDER BY m.fecha_pago DESC, m.id DESC
+            '''
+            return self.obtener_datos(query)
 
-    def obtener_historial_pagos(self):
+    def obtener_historial_pagos_pagina(self, limite=200, despues_de=None):
+        """
+        Página del historial en orden (fecha_pago DESC, id DESC), paginada por clave (keyset) sobre idx_mensualidades_fecha.
+        despues_de = (fecha_pago, id) de la última fila recibida; None para la primera página.
+        """
         query = '''
             SELECT m.id, e.nombre, e.grado, m.monto, m.mes, m.pagado, m.fecha_pago 
             FROM mensualidades m
             JOIN estudiantes e ON m.estudiante_id = e.id
+            {condicion}
             ORDER BY m.fecha_pago DESC, m.id DESC
+            LIMIT ?
         '''
-        return self.obtener_datos(query)
+        fecha, id_pago = despues_de if despues_de is not None else (None, None)
+        filas = []
+        if despues_de is None:
+            filas = self.obtener_datos(query.format(condicion="WHERE m.fecha_pago IS NOT NULL"), (limite,))
+        elif fecha is not None:
+            filas = self.obtener_datos(query.format(condicion="WHERE (m.fecha_pago, m.id) < (?, ?)"), (fecha, id_pago, limite))
 
-    def obtener_pagos_alumno(self, estudiante_id):
-        query = '''
-            SELECT mes, monto, fecha_pago 
-            FROM mensualidades 
-            WHERE estudiante_id = ? 
-            ORDER BY id DESC
-        '''
-        return self.obtener_datos(query, (estudiante_id,))
+        # Registros antiguos sin fecha: van al final en orden descendente (consulta aparte para no perder el rango indexado)
+        if len(filas) < limite:
+            if fecha is None and despues_de is not None:
+                condicion, params = "WHERE m.fecha_pago IS NULL AND m.id < ?", (id_pago,)
+            else:
+                condicion, params = "WHERE m.fecha_pago IS NULL", ()
+            filas += self.obtener_datos(query.format(condicion=condicion), (*params, limite - len(filas)))
+        return filas
 
-    def buscar_pagos(self, termino):
-        query = '''
-            SELECT m.id, e.nombre, e.grado, m.monto, m.mes, m.pagado, m.fecha_pago 
-            FROM mensualidades m
-            JOIN estudiantes e ON m.estudiante_id = e.id
-            WHERE e.nombre LIKE ?
-            ORDER BY m.fecha_pago DESC
-        '''
-        return self.obtener_datos(query, ('%' + termino + '%',))
+    def obtener_pagos_alumno(self, estudiante_id, desde_anio=None):
+        with self._archivos_adjuntos(desde_anio) as esquemas:
+            query = f'''
+                SELECT mes, monto, fecha_pago 
+                FROM {self._sql_con_archivos("mensualidades", esquemas)} m
+                WHERE estudiante_id = ? 
+                ORDER BY id DESC
+            '''
+            return self.obtener_datos(query, (estudiante_id,))
+
+    def buscar_pagos(self, termino, desde_anio=None):
+        with self._archivos_adjuntos(desde_anio) as esquemas:
+            query = f'''
+                SELECT m.id, e.nombre, e.grado, m.monto, m.mes, m.pagado, m.fecha_pago 
+                FROM {self._sql_con_archivos("mensualidades", esquemas)} m
+                JOIN {self._sql_con_archivos("estudiantes", esquemas)} e ON m.estudiante_id = e.id
+                WHERE e.nombre LIKE ?
+                ORDER BY m.fecha_pago DESC
+            '''
+            return self.obtener_datos(query, ('%' + termino + '%',))
 
     def obtener_pago_detalle(self, id_pago):
         query = '''
@@ -236,14 +1331,508 @@ class SchoolDB:
         '''
         return self.obtener_datos(query, (id_pago,))
 
-    def verificar_pago_existente(self, estudiante_id, mes):
-        query = "SELECT COUNT(*) FROM mensualidades WHERE estudiante_id = ? AND mes = ?"
-        result = self.obtener_datos(query, (estudiante_id, mes))
+    def verificar_pago_existente(self, estudiante_id, mes, anio=None):
+        query = "SELECT COUNT(*) FROM mensualidades WHERE estudiante_id = ? AND anio = ? AND mes_idx = ?"
+        result = self.obtener_datos(query, (estudiante_id, anio or datetime.now().year, self._indice_mes(mes)))
         return result[0][0] > 0
 
     def obtener_pagos_todos(self):
         return self.obtener_datos("SELECT estudiante_id, mes FROM mensualidades")
 
+    def obtener_morosos(self, mes_inicio_idx, mes_corte_idx, estudiante_id=None, anio=None):
+        """
+        Motor de morosidad: meses impagos de cada alumno entre mes_inicio_idx y mes_corte_idx (0-11) del año indicado
+        (el actual por defecto), calculado en una sola consulta contra calendario_meses. Los meses pagados de cada alumno
+        se leen con un rango sobre idx_mensualidades_periodo, o de estado_cuenta si está activado.
+        Retorna [(id, nombre, grado, apoderado, telefono, "Marzo, Abril"), ...] solo para alumnos con deuda.
+        """
+        if mes_corte_idx < mes_inicio_idx:
+            return []
+        anio = anio or datetime.now().year
+        if anio in self.anios_archivados():
+            return self._obtener_morosos_archivados(mes_inicio_idx, mes_corte_idx, estudiante_id, anio)
+        if self.estado_cuenta_activo:
+            impago = "((COALESCE((SELECT ec.meses_pagados FROM estado_cuenta ec WHERE ec.estudiante_id = e.id AND ec.anio = ?), 0) >> c.idx) & 1) = 0"
+            params_impago = (anio,)
+        else:
+            impago = "c.idx NOT IN (SELECT m.mes_idx FROM mensualidades m WHERE m.estudiante_id = e.id AND m.anio = ? AND m.mes_idx BETWEEN ? AND ?)"
+            params_impago = (anio, mes_inicio_idx, mes_corte_idx)
+        # Los retirados y egresados no están en la cobranza
+        filtro = "WHERE e.estado = 'activo'" + (" AND e.id = ?" if estudiante_id is not None else "")
+        query = f'''
+            SELECT * FROM (
+                SELECT e.id, e.nombre, e.grado, a.nombre, a.telefono,
+                    (SELECT group_concat(nombre, ', ') FROM (
+                        SELECT c.nombre FROM calendario_meses c
+                        WHERE c.idx BETWEEN ? AND ?
+                          AND {impago}
+                        ORDER BY c.idx
+                    )) AS deuda
+                FROM estudiantes e
+                LEFT JOIN apoderados a ON e.apoderado_id = a.id
+                {filtro}
+                ORDER BY e.grado, e.nombre
+            )
+            WHERE deuda IS NOT NULL
+        '''
+        params = (mes_inicio_idx, mes_corte_idx) + params_impago + ((estudiante_id,) if estudiante_id is not None else ())
+        return self.obtener_datos(query, params)
+
+    def _obtener_morosos_archivados(self, mes_inicio_idx, mes_corte_idx, estudiante_id, anio):
+        """Morosidad de un año cerrado: pagos del archivo del año y alumnos actuales más los archivados ese año."""
+        with self._archivos_adjuntos(anio, anio) as esquemas:
+            filtro = "WHERE e.estado = 'activo'" + (" AND e.id = ?" if estudiante_id is not None else "")
+            query = f'''
+                SELECT * FROM (
+                    SELECT e.id, e.nombre, e.grado, a.nombre, a.telefono,
+                        (SELECT group_concat(nombre, ', ') FROM (
+                            SELECT c.nombre FROM calendario_meses c
+                            WHERE c.idx BETWEEN ? AND ?
+                              AND c.idx NOT IN (SELECT m.mes_idx FROM {esquemas[0]}.mensualidades m WHERE m.estudiante_id = e.id AND m.anio = ?)
+                            ORDER BY c.idx
+                        )) AS deuda
+                    FROM {self._sql_con_archivos("estudiantes", esquemas)} e
+                    LEFT JOIN apoderados a ON e.apoderado_id = a.id
+                    {filtro}
+                    ORDER BY e.grado, e.nombre
+                )
+                WHERE deuda IS NOT NULL
+            '''
+            params = (mes_inicio_idx, mes_corte_idx, anio) + ((estudiante_id,) if estudiante_id is not None else ())
+            return self.obtener_datos(query, params)
+
+    # --- Archivo de Años Cerrados ---
+
+    def ruta_archivo(self, anio):
+        base = os.path.splitext(os.path.basename(self.db_path))[0]
+        return os.path.join(os.path.dirname(os.path.abspath(self.db_path)), self.CARPETA_ARCHIVO, f"{base}_{anio}.db")
+
+    def anios_archivados(self):
+        return [anio for (anio,) in self.obtener_datos("SELECT anio FROM archivos_anuales ORDER BY anio")]
+
+    def obtener_archivos_anuales(self):
+        """[(anio, pagos, total, alumnos, fecha_cierre), ...] de los años cerrados."""
+        return self.obtener_datos("SELECT anio, pagos, total, alumnos, fecha FROM archivos_anuales ORDER BY anio DESC")
+
+    def _verificar_anio_abierto(self, anio, archivados=None):
+        # archivados: anios_archivados() ya leído, para validar muchas filas con una sola consulta
+        if anio in (self.anios_archivados() if archivados is None else archivados):
+            raise ValueError(f"El año {anio} está cerrado y archivado: no se pueden registrar pagos en él")
+
+    @contextmanager
+    def _archivos_adjuntos(self, desde_anio=None, hasta_anio=None):
+        """
+        Adjunta a la conexión del hilo las bases de los años archivados en [desde_anio, hasta_anio] y entrega
+        sus nombres de esquema (archivo_2024, ...). Sin desde_anio no adjunta nada: solo la base principal.
+        """
+        if desde_anio is None:
+            yield []
+            return
+        conn = self._conectar()
+        anios = [a for a in self.anios_archivados() if desde_anio <= a <= (hasta_anio or a)]
+        limite = limite_attach(conn)
+        if len(anios) > limite:
+            logging.warning(f"Solo se pueden adjuntar {limite} archivos a la vez; se omiten los años {anios[:-limite]}")
+            anios = anios[-limite:]
+        esquemas = []
+        try:
+            for anio in anios:
+                ruta = self.ruta_archivo(anio)
+                if not os.path.exists(ruta):
+                    logging.error(f"No se encuentra el archivo del año {anio}: {ruta}")
+                    continue
+                conn.execute(f"ATTACH DATABASE ? AS archivo_{anio}", (ruta,))
+                esquemas.append(f"archivo_{anio}")
+            yield esquemas
+        finally:
+            for esquema in esquemas:
+                conn.execute(f"DETACH DATABASE {esquema}")
+
+    def _sql_con_archivos(self, tabla, esquemas):
+        """La tabla principal, o su unión con las mismas tablas de los archivos adjuntos."""
+        if not esquemas:
+            return tabla
+        columnas = ", ".join(self.COLUMNAS_ARCHIVO[tabla])
+        partes = [f"SELECT {columnas} FROM {tabla}"] + [f"SELECT {columnas} FROM {esquema}.{tabla}" for esquema in esquemas]
+        return "(" + " UNION ALL ".join(partes) + ")"
+
+    def cerrar_anio(self, anio):
+        """
+        Cierra un año escolar anterior al actual: mueve sus pagos, y los alumnos retirados o egresados que ya no
+        tienen otros pagos, a la base de archivo del año. Se copia primero y se borra de la base principal solo
+        después de verificar la copia por cantidad de filas y suma de montos. Los resúmenes del dashboard del año se conservan
+        y el movimiento no se registra como bajas (ni en el diario de cambios ni para la sincronización).
+        Se puede repetir (p. ej. si llegaron pagos atrasados por sincronización). Retorna un dict con el resultado.
+        """
+        with self._archivo_adjunto(anio) as ruta:
+            return self._archivar_anio(anio, ruta)
+
+    @contextmanager
+    def _archivo_adjunto(self, anio):
+        """Adjunta como 'archivo' la base del año (creándola si no existe). ATTACH no se permite dentro de una transacción."""
+        if anio >= datetime.now().year:
+            raise ValueError("Solo se pueden cerrar años anteriores al actual")
+        ruta = self.ruta_archivo(anio)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        conn = self._conectar()
+        if conn.in_transaction:
+            raise RuntimeError("El cierre de año no puede ejecutarse dentro de otra transacción")
+        conn.execute("ATTACH DATABASE ? AS archivo", (ruta,))
+        try:
+            yield ruta
+        finally:
+            conn.execute("DETACH DATABASE archivo")
+
+    def _archivar_anio(self, anio, ruta):
+        """
+        Cuerpo de cerrar_anio, con la base del año adjunta como 'archivo' y fuera de toda transacción. En modo WAL
+        SQLite no confirma de forma atómica una transacción que escribe en dos bases: primero se copia al archivo
+        (transacción que solo escribe en él) y recién después, verificada la copia, se borra de la base principal.
+        Si algo se interrumpe entre las dos, la copia queda de más en el archivo y repetir el cierre la reemplaza.
+        """
+        col_pagos = ", ".join(self.COLUMNAS_ARCHIVO["mensualidades"])
+        col_alumnos = ", ".join(self.COLUMNAS_ARCHIVO["estudiantes"])
+        # Alumnos que se fueron y cuyos pagos en esta base son todos de este año
+        sql_alumnos = '''
+            SELECT e.id FROM estudiantes e
+            WHERE e.estado != 'activo'
+              AND NOT EXISTS (SELECT 1 FROM mensualidades m WHERE m.estudiante_id = e.id AND m.anio IS NOT ?)
+            ORDER BY e.id
+        '''
+
+        # 1. Copia: solo escribe en el archivo
+        with self._transaccion(tablas=()) as cursor:
+            for tabla, columnas in self.COLUMNAS_ARCHIVO.items():
+                definicion = ", ".join(("id INTEGER PRIMARY KEY" if c == "id" else c) for c in columnas)
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS archivo.{tabla} ({definicion})")
+            cursor.execute("CREATE INDEX IF NOT EXISTS archivo.idx_mensualidades_estudiante ON mensualidades(estudiante_id, anio, mes_idx)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS archivo.idx_mensualidades_fecha ON mensualidades(fecha_pago)")
+            lista_ids = json.dumps([fila[0] for fila in cursor.execute(sql_alumnos, (anio,))])
+            cursor.execute(f"INSERT OR REPLACE INTO archivo.mensualidades ({col_pagos}) SELECT {col_pagos} FROM mensualidades WHERE anio = ?", (anio,))
+            cursor.execute(f"INSERT OR REPLACE INTO archivo.estudiantes ({col_alumnos}) SELECT {col_alumnos} FROM estudiantes WHERE id IN (SELECT value FROM json_each(?))", (lista_ids,))
+
+        # 2. Borrado: solo escribe en la base principal
+        with self._transaccion() as cursor:
+            # Verificación antes de borrar, ya con la base bloqueada: el archivo confirmado tiene exactamente lo que se
+            # va a quitar (un pago o un retiro que llegó entre las dos transacciones hace fallar el cierre, que se repite)
+            pagos, total = cursor.execute("SELECT COUNT(*), TOTAL(monto) FROM mensualidades WHERE anio = ?", (anio,)).fetchone()
+            copiados = cursor.execute(f'''
+                SELECT COUNT(*), TOTAL(m.monto) FROM mensualidades m
+                JOIN archivo.mensualidades a ON a.id = m.id AND ({", ".join("a." + c for c in self.COLUMNAS_ARCHIVO["mensualidades"])})
+                                                            IS ({", ".join("m." + c for c in self.COLUMNAS_ARCHIVO["mensualidades"])})
+                WHERE m.anio = ?
+            ''', (anio,)).fetchone()
+            ids_alumnos = [fila[0] for fila in cursor.execute(sql_alumnos, (anio,))]
+            if copiados != (pagos, total) or json.dumps(ids_alumnos) != lista_ids:
+                raise RuntimeError(f"Verificación del archivo {anio} fallida: {copiados} != {(pagos, total)} o cambiaron los alumnos a archivar; repita el cierre")
+            pagos_previos, total_previo = cursor.execute("SELECT COUNT(*), TOTAL(monto) FROM archivo.mensualidades WHERE id NOT IN (SELECT id FROM mensualidades)").fetchone()
+            resumen = cursor.execute("SELECT anio, mes_idx, grado, total, pagos FROM resumen_ingresos WHERE anio = ?", (anio,)).fetchall()
+
+            # El diario es solo de agregado: en vez de borrar después las bajas que anotarían los triggers, no se anotan
+            cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, '1')", (self.CLAVE_DIARIO_EN_PAUSA,))
+            cursor.execute("DELETE FROM mensualidades WHERE anio = ?", (anio,))
+            cursor.execute("DELETE FROM estudiantes WHERE id IN (SELECT value FROM json_each(?))", (lista_ids,))
+            cursor.execute("DELETE FROM configuracion WHERE clave = ?", (self.CLAVE_DIARIO_EN_PAUSA,))
+
+            # Los triggers descontaron el año de los derivados: se restaura el resumen
+            cursor.executemany("INSERT OR REPLACE INTO resumen_ingresos (anio, mes_idx, grado, total, pagos) VALUES (?, ?, ?, ?, ?)", resumen)
+            if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estado_cuenta'").fetchone():
+                cursor.execute("DELETE FROM estado_cuenta WHERE anio = ?", (anio,))
+
+            pagos_archivo, total_archivo = cursor.execute("SELECT COUNT(*), TOTAL(monto) FROM archivo.mensualidades").fetchone()
+            if (pagos_archivo, total_archivo) != (pagos_previos + pagos, total_previo + total):
+                raise RuntimeError(f"Verificación del archivo {anio} fallida: el archivo suma {pagos_archivo} pagos / {total_archivo}")
+            alumnos_archivo = cursor.execute("SELECT COUNT(*) FROM archivo.estudiantes").fetchone()[0]
+            cursor.execute('''
+                INSERT OR REPLACE INTO archivos_anuales (anio, archivo, pagos, total, alumnos, fecha) VALUES (?, ?, ?, ?, ?, ?)
+            ''', (anio, os.path.basename(ruta), pagos_archivo, total_archivo, alumnos_archivo, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        logging.info(f"Año {anio} archivado en {ruta}: {pagos} pagos (${total:,.0f}) y {len(ids_alumnos)} alumnos movidos")
+        return {"anio": anio, "ruta": ruta, "pagos": pagos, "total": total, "alumnos": len(ids_alumnos)}
+
+    def cambiar_estado_estudiante(self, estudiante_id, estado):
+        """estado: 'activo', 'retirado' o 'egresado'. Los retirados y egresados se archivan al cerrar el año."""
+        if estado not in ("activo", "retirado", "egresado"):
+            raise ValueError(f"Estado de alumno desconocido: {estado}")
+        self.ejecutar_query("UPDATE estudiantes SET estado = ? WHERE id = ?", (estado, estudiante_id))
+
+    # --- Promoción de Fin de Año ---
+
+    # Orden de los niveles para sugerir la progresión de grados (el resto va primero, en orden alfabético)
+    NIVELES_GRADO = ("sala cuna", "medio menor", "medio mayor", "pre-kinder", "prekinder", "kinder", "basico", "medio")
+
+    @classmethod
+    def _orden_grado(cls, grado):
+        texto = cls._normalizar_texto(grado)
+        nivel = max((i + 1 for i, n in enumerate(cls.NIVELES_GRADO) if n in texto), default=0)
+        numero = re.search(r"\d+", texto)
+        return (nivel, int(numero.group()) if numero else 0, texto)
+
+    def obtener_grados_activos(self):
+        """[(grado, alumnos_activos), ...] en orden de nivel y número."""
+        filas = self.obtener_datos("SELECT grado, COUNT(*) FROM estudiantes WHERE estado = 'activo' AND grado IS NOT NULL GROUP BY grado")
+        return sorted(filas, key=lambda fila: self._orden_grado(fila[0]))
+
+    def obtener_progresion_grados(self):
+        """
+        Mapa {grado: grado siguiente, o None si egresa} guardado en configuración. Los grados actuales que no
+        figuran en él se sugieren: el mismo texto con el número siguiente si ese grado existe ("1A" -> "2A"),
+        o egreso para el último grado; si no hay sugerencia quedan con "" (sin cambio) para que se completen.
+        """
+        guardada = json.loads(self.obtener_configuracion("progresion_grados") or "{}")
+        grados = [grado for grado, _ in self.obtener_grados_activos()]
+        existentes = set(grados)
+        progresion = {}
+        for grado in grados:
+            if grado in guardada:
+                progresion[grado] = guardada[grado]
+                continue
+            siguiente = re.sub(r"\d+", lambda m: str(int(m.group()) + 1), grado, count=1)
+            if siguiente != grado and siguiente in existentes:
+                progresion[grado] = siguiente
+            else:
+                progresion[grado] = None if grado == grados[-1] else ""
+        return progresion
+
+    def guardar_progresion_grados(self, progresion):
+        self.guardar_configuracion("progresion_grados", json.dumps(progresion, ensure_ascii=False))
+
+    @staticmethod
+    def _progresion_json(progresion):
+        # "" = sin cambio: no participa de la promoción
+        return json.dumps({g: s for g, s in progresion.items() if s != ""}, ensure_ascii=False)
+
+    def vista_previa_promocion(self, progresion):
+        """
+        Lo que haría promover_grados con este mapa, sin modificar nada:
+        {"promovidos", "egresados", "sin_cambio", "por_grado": [(grado, siguiente o None, alumnos), ...]}.
+        """
+        por_grado = self.obtener_datos('''
+            SELECT e.grado, p.value, COUNT(*)
+            FROM estudiantes e
+            JOIN json_each(?) p ON p.key = e.grado
+            WHERE e.estado = 'activo'
+            GROUP BY e.grado, p.value
+        ''', (self._progresion_json(progresion),))
+        activos = self.obtener_datos("SELECT COUNT(*) FROM estudiantes WHERE estado = 'activo'")[0][0]
+        promovidos = sum(n for _, siguiente, n in por_grado if siguiente is not None)
+        egresados = sum(n for _, siguiente, n in por_grado if siguiente is None)
+        return {"promovidos": promovidos, "egresados": egresados, "sin_cambio": activos - promovidos - egresados,
+                "por_grado": sorted(por_grado, key=lambda fila: self._orden_grado(fila[0]))}
+
+    def promover_grados(self, progresion, anio_archivo=None, esperados=None):
+        """
+        Paso de año: en un único UPDATE sobre los alumnos activos, cada grado del mapa pasa al siguiente y los del
+        último grado (siguiente None) quedan como egresados. Con anio_archivo, después de la promoción se cierra y
+        archiva ese año (ver cerrar_anio), incluidos los egresados que ya no tienen otros pagos; si el archivo falla
+        la promoción queda hecha y el año se puede cerrar más tarde. esperados es el resultado de
+        vista_previa_promocion: si los alumnos cambiaron desde entonces (p. ej. por sincronización), no se aplica nada.
+        Retorna {"promovidos", "egresados", "archivo": resultado de cerrar_anio o None, "error_archivo": texto o None}.
+        """
+        mapa = self._progresion_json(progresion)
+        with ExitStack() as pila:
+            ruta = pila.enter_context(self._archivo_adjunto(anio_archivo)) if anio_archivo else None
+            with self._transaccion() as cursor:
+                promovidos, egresados = map(int, cursor.execute('''
+                    SELECT TOTAL(p.value IS NOT NULL), TOTAL(p.value IS NULL)
+                    FROM estudiantes e JOIN json_each(?) p ON p.key = e.grado
+                    WHERE e.estado = 'activo'
+                ''', (mapa,)).fetchone())
+                if esperados is not None and (promovidos, egresados) != (esperados["promovidos"], esperados["egresados"]):
+                    raise RuntimeError("Los alumnos cambiaron desde la vista previa: revise la promoción nuevamente")
+                # Mover los pagos de cada alumno en el resumen uno por uno cuesta más que recalcularlo una vez al final
+                cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, '1')", (self.CLAVE_RESUMENES_EN_PAUSA,))
+                # SET se evalúa con los valores previos de la fila: un alumno avanza un solo grado aunque el siguiente
+                # también esté en el mapa. Subconsultas y CASE en vez de UPDATE ... FROM / iif (SQLite 3.33 / 3.32)
+                cursor.execute('''
+                    UPDATE estudiantes
+                    SET grado = COALESCE((SELECT value FROM json_each(?1) WHERE key = estudiantes.grado), grado),
+                        estado = CASE WHEN (SELECT value FROM json_each(?1) WHERE key = estudiantes.grado) IS NULL
+                                      THEN 'egresado' ELSE estado END
+                    WHERE estado = 'activo' AND grado IN (SELECT key FROM json_each(?1))
+                ''', (mapa,))
+                cursor.execute("DELETE FROM configuracion WHERE clave = ?", (self.CLAVE_RESUMENES_EN_PAUSA,))
+                # El año a archivar conserva su resumen con los grados que tenían los alumnos ese año
+                resumen_anio = cursor.execute("SELECT anio, mes_idx, grado, total, pagos FROM resumen_ingresos WHERE anio = ?", (anio_archivo,)).fetchall()
+                self._reconstruir_resumenes(cursor)
+                if anio_archivo:
+                    cursor.execute("DELETE FROM resumen_ingresos WHERE anio = ?", (anio_archivo,))
+                    cursor.executemany("INSERT INTO resumen_ingresos (anio, mes_idx, grado, total, pagos) VALUES (?, ?, ?, ?, ?)", resumen_anio)
+            logging.info(f"Promoción de fin de año: {promovidos} alumnos promovidos y {egresados} egresados")
+            archivo = error_archivo = None
+            if anio_archivo:
+                try:
+                    archivo = self._archivar_anio(anio_archivo, ruta)
+                except Exception as e:
+                    logging.error(f"La promoción se aplicó pero no se pudo archivar el año {anio_archivo}: {e}")
+                    error_archivo = str(e)
+        return {"promovidos": promovidos, "egresados": egresados, "archivo": archivo, "error_archivo": error_archivo}
+
+    # --- Mantenimiento ---
+
+    TAREAS_MANTENIMIENTO = ("optimize", "analyze", "incremental_vacuum", "quick_check")
+
+    def ejecutar_mantenimiento(self, tarea, paginas=None):
+        """
+        Ejecuta una tarea de mantenimiento en la conexión del hilo que llama y registra la hora en configuración.
+        - optimize / analyze: estadísticas del planificador de consultas (ANALYZE solo donde hace falta / completo).
+        - incremental_vacuum: devuelve al disco hasta `paginas` páginas libres (todas si es None). Si la base aún no
+          tiene auto_vacuum=INCREMENTAL (bases anteriores a la migración) hace una única vez un VACUUM completo.
+          Retorna las páginas libres que quedan.
+        - quick_check: retorna la lista de problemas encontrados (vacía si la base está sana).
+        """
+        if tarea not in self.TAREAS_MANTENIMIENTO:
+            raise ValueError(f"Tarea de mantenimiento desconocida: {tarea}")
+        conn = self._conectar()
+        if conn.in_transaction:
+            raise RuntimeError("El mantenimiento no puede ejecutarse dentro de una transacción")
+        resultado = None
+        if tarea == "optimize":
+            conn.execute("PRAGMA optimize")
+        elif tarea == "analyze":
+            conn.execute("ANALYZE")
+        elif tarea == "incremental_vacuum":
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                self._invalidar_cache()
+                logging.info("Base convertida a auto_vacuum=INCREMENTAL")
+            else:
+                # Cada paso del PRAGMA libera una página y execute() da un solo paso en sentencias sin columnas:
+                # executescript la corre completa (en autocommit, fuera de _transaccion, no confirma nada ajeno)
+                conn.executescript(f"PRAGMA incremental_vacuum({int(paginas or 0)})")
+            resultado = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        elif tarea == "quick_check":
+            filas = [fila[0] for fila in conn.execute("PRAGMA quick_check")]
+            resultado = [] if filas == ["ok"] else filas
+            if resultado:
+                logging.warning(f"quick_check encontró problemas en {self.db_path}: {resultado}")
+        if tarea != "incremental_vacuum" or not resultado:
+            self.guardar_configuracion(f"mantenimiento_{tarea}", datetime.now().isoformat(timespec="seconds"))
+        return resultado
+
+    def ultimo_mantenimiento(self):
+        """{tarea: fecha ISO de la última ejecución completa} de las tareas que ya corrieron alguna vez."""
+        filas = self.obtener_datos("SELECT clave, valor FROM configuracion WHERE clave LIKE 'mantenimiento_%'")
+        return {clave[len("mantenimiento_"):]: valor for clave, valor in filas if clave[len("mantenimiento_"):] in self.TAREAS_MANTENIMIENTO}
+
+    # --- Estado de Cuenta Materializado (opcional) ---
+
+    # Año escolar y bit del mes de un pago, como expresiones SQL sobre NEW/OLD dentro de los triggers
+    _SQL_ANIO_PAGO = "COALESCE({r}.anio, CAST(strftime('%Y', 'now', 'localtime') AS INTEGER))"
+    _SQL_BIT_MES = "COALESCE(1 << {r}.mes_idx, 0)"
+    _TRIGGERS_ESTADO_CUENTA = ("estado_cuenta_pago_ai", "estado_cuenta_pago_ad", "estado_cuenta_pago_au",
+                               "estado_cuenta_alumno_ai", "estado_cuenta_alumno_ad")
+
+    @property
+    def estado_cuenta_activo(self):
+        return bool(self.obtener_datos("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estado_cuenta'"))
+
+    def activar_estado_cuenta(self):
+        """
+        Crea la tabla estado_cuenta (una fila por alumno y año con la máscara de bits de meses pagados,
+        bit 0 = Enero) y los triggers que la mantienen al día; luego la llena desde los datos actuales.
+        """
+        with self._transaccion() as cursor:
+            self._crear_estado_cuenta(cursor)
+            self._reconstruir_estado_cuenta(cursor)
+
+    def desactivar_estado_cuenta(self):
+        with self._transaccion() as cursor:
+            for trigger in self._TRIGGERS_ESTADO_CUENTA:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute("DROP TABLE IF EXISTS estado_cuenta")
+
+    def _crear_estado_cuenta(self, cursor):
+        anio_new, anio_old = self._SQL_ANIO_PAGO.format(r="NEW"), self._SQL_ANIO_PAGO.format(r="OLD")
+        bit_new, bit_old = self._SQL_BIT_MES.format(r="NEW"), self._SQL_BIT_MES.format(r="OLD")
+        anio_actual = "CAST(strftime('%Y', 'now', 'localtime') AS INTEGER)"
+        sumar_pago = f'''
+            INSERT INTO estado_cuenta (estudiante_id, anio, meses_pagados) VALUES (NEW.estudiante_id, {anio_new}, {bit_new})
+            ON CONFLICT(estudiante_id, anio) DO UPDATE SET meses_pagados = meses_pagados | excluded.meses_pagados;
+        '''
+        # Hay a lo sumo un pago por alumno, año y mes, así que borrar un pago apaga su bit
+        quitar_pago = f'''
+            UPDATE estado_cuenta SET meses_pagados = meses_pagados & ~({bit_old})
+            WHERE estudiante_id = OLD.estudiante_id AND anio = {anio_old};
+        '''
+        self._ejecutar_script(cursor, f'''
+            CREATE TABLE IF NOT EXISTS estado_cuenta (
+                estudiante_id INTEGER NOT NULL,
+                anio INTEGER NOT NULL,
+                meses_pagados INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (estudiante_id, anio)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_estado_cuenta_anio ON estado_cuenta(anio, meses_pagados);
+
+            CREATE TRIGGER IF NOT EXISTS estado_cuenta_pago_ai AFTER INSERT ON mensualidades BEGIN
+                {sumar_pago}
+            END;
+            CREATE TRIGGER IF NOT EXISTS estado_cuenta_pago_ad AFTER DELETE ON mensualidades BEGIN
+                {quitar_pago}
+            END;
+            CREATE TRIGGER IF NOT EXISTS estado_cuenta_pago_au AFTER UPDATE OF estudiante_id, anio, mes_idx ON mensualidades BEGIN
+                {quitar_pago}
+                {sumar_pago}
+            END;
+            CREATE TRIGGER IF NOT EXISTS estado_cuenta_alumno_ai AFTER INSERT ON estudiantes BEGIN
+                INSERT OR IGNORE INTO estado_cuenta (estudiante_id, anio, meses_pagados) VALUES (NEW.id, {anio_actual}, 0);
+            END;
+            CREATE TRIGGER IF NOT EXISTS estado_cuenta_alumno_ad AFTER DELETE ON estudiantes BEGIN
+                DELETE FROM estado_cuenta WHERE estudiante_id = OLD.id;
+            END;
+        ''')
+
+    def _sql_estado_cuenta_esperado(self):
+        """Estado de cuenta calculado desde cero a partir de mensualidades (OR de bits = SUM DISTINCT de potencias de 2)."""
+        return '''
+            SELECT estudiante_id, anio, SUM(DISTINCT 1 << mes_idx) AS meses_pagados
+            FROM mensualidades
+            WHERE anio IS NOT NULL AND mes_idx IS NOT NULL
+            GROUP BY estudiante_id, anio
+        '''
+
+    def _reconstruir_estado_cuenta(self, cursor):
+        cursor.execute("DELETE FROM estado_cuenta")
+        cursor.execute(f"INSERT INTO estado_cuenta (estudiante_id, anio, meses_pagados) {self._sql_estado_cuenta_esperado()}")
+        cursor.execute('''
+            INSERT OR IGNORE INTO estado_cuenta (estudiante_id, anio, meses_pagados)
+            SELECT id, CAST(strftime('%Y', 'now', 'localtime') AS INTEGER), 0 FROM estudiantes
+        ''')
+
+    def reconstruir_estado_cuenta(self):
+        """
+        Compara estado_cuenta con los pagos reales y la recalcula desde cero.
+        Retorna la cantidad de filas (alumno, año) que no coincidían antes de reconstruir.
+        """
+        if not self.estado_cuenta_activo:
+            raise RuntimeError("El estado de cuenta materializado no está activado")
+        with self._transaccion(tablas=("estado_cuenta",)) as cursor:
+            # Filas sin pagos (máscara 0) equivalen a no tener fila, por eso se excluyen de la comparación
+            actual = "SELECT estudiante_id, anio, meses_pagados FROM estado_cuenta WHERE meses_pagados != 0"
+            esperado = f"SELECT * FROM ({self._sql_estado_cuenta_esperado()}) WHERE meses_pagados != 0"
+            cursor.execute(f"SELECT COUNT(*) FROM (SELECT estudiante_id, anio FROM ({actual} EXCEPT {esperado}) UNION SELECT estudiante_id, anio FROM ({esperado} EXCEPT {actual}))")
+            discrepancias = cursor.fetchone()[0]
+            self._reconstruir_estado_cuenta(cursor)
+        if discrepancias:
+            logging.warning(f"Estado de cuenta reconstruido: {discrepancias} filas no coincidían con los pagos")
+        return discrepancias
+
+    def obtener_deudores_estado_cuenta(self, anio, mes_inicio_idx, mes_corte_idx):
+        """
+        Consulta indexada sobre estado_cuenta: [(estudiante_id, máscara_de_meses_adeudados), ...]
+        para los alumnos activos a los que les falta algún mes entre mes_inicio_idx y mes_corte_idx del año indicado.
+        """
+        if mes_corte_idx < mes_inicio_idx:
+            return []
+        requeridos = sum(1 << i for i in range(mes_inicio_idx, mes_corte_idx + 1))
+        query = '''
+            SELECT e.id, ? & ~COALESCE(ec.meses_pagados, 0) AS adeudados
+            FROM estudiantes e
+            LEFT JOIN estado_cuenta ec ON ec.estudiante_id = e.id AND ec.anio = ?
+            WHERE e.estado = 'activo' AND adeudados != 0
+        '''
+        return self.obtener_datos(query, (requeridos, anio))
+
     def obtener_estudiante_detalle(self, id_estudiante):
         query = '''
             SELECT e.nombre, e.grado, e.fecha_registro, a.nombre, a.telefono, a.email
@@ -271,28 +1860,194 @@ class SchoolDB:
         res = self.obtener_datos("SELECT valor FROM configuracion WHERE clave = ?", (clave,))
         return res[0][0] if res else None
 
+    def obtener_configuraciones(self, claves):
+        """{clave: valor} de las claves pedidas que existen, en una sola consulta."""
+        marcadores = ", ".join("?" * len(claves))
+        return dict(self.obtener_datos(f"SELECT clave, valor FROM configuracion WHERE clave IN ({marcadores})", tuple(claves)))
+
     def guardar_configuracion(self, clave, valor):
         self.ejecutar_query("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, ?)", (clave, valor))
 
-    def obtener_estadisticas_dashboard(self, mes_nombre):
-        conn = self._conectar()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM estudiantes")
-        total_alumnos = cursor.fetchone()[0]
+    def guardar_configuraciones(self, valores):
+        """Guarda {clave: valor} en una sola transacción."""
+        with self._transaccion(tablas=("configuracion",)) as cursor:
+            cursor.executemany("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, ?)", list(valores.items()))
+
+    def obtener_estadisticas_dashboard(self, mes_nombre, anio=None):
+        # Lecturas sobre los resúmenes precalculados: no dependen de la cantidad de alumnos ni de pagos históricos
+        total_alumnos = self.obtener_datos("SELECT COALESCE(SUM(alumnos), 0) FROM resumen_grados")[0][0]
         
-        cursor.execute("SELECT SUM(monto) FROM mensualidades WHERE mes = ?", (mes_nombre,))
-        res_ingresos = cursor.fetchone()[0]
+        res_ingresos = self.obtener_datos("SELECT SUM(total) FROM resumen_ingresos WHERE anio = ? AND mes_idx = ?", (anio or datetime.now().year, self._indice_mes(mes_nombre)))[0][0]
         ingresos = res_ingresos if res_ingresos else 0.0
-
-        conn.close()
         
         return total_alumnos, ingresos
 
     def obtener_alumnos_por_grado(self):
-        query = "SELECT grado, COUNT(*) FROM estudiantes GROUP BY grado ORDER BY grado"
+        query = "SELECT NULLIF(grado, ''), alumnos FROM resumen_grados ORDER BY grado"
         return self.obtener_datos(query)
 
+    def obtener_ingresos_por_mes(self, anio=None):
+        """Tendencia del año: [(mes_idx, total, cantidad_de_pagos), ...] solo para los meses con pagos."""
+        query = "SELECT mes_idx, SUM(total), SUM(pagos) FROM resumen_ingresos WHERE anio = ? GROUP BY mes_idx ORDER BY mes_idx"
+        return self.obtener_datos(query, (anio or datetime.now().year,))
+
+    # --- Diario de Cambios ---
+
+    def obtener_cambios(self, desde=0, limite=1000):
+        """
+        Cambios con seq > desde, en orden: [(seq, tabla, fila_id, operacion, datos, fecha), ...].
+        operacion es 'I', 'U' o 'D'; datos es un dict con la fila (None en las bajas).
+        Para leer todo por tramos, pasar como desde el seq del último cambio recibido.
+        """
+        query = "SELECT seq, tabla, fila_id, operacion, datos, fecha FROM cambios WHERE seq > ? ORDER BY seq LIMIT ?"
+        return [(seq, tabla, fila_id, operacion, json.loads(datos) if datos else None, fecha)
+                for seq, tabla, fila_id, operacion, datos, fecha in self.obtener_datos(query, (desde, limite))]
+
+    def ultimo_cambio(self):
+        """seq del último cambio registrado (0 si no hay): cursor inicial de un consumidor que parte de una copia completa."""
+        return self.obtener_datos("SELECT COALESCE(MAX(seq), 0) FROM cambios")[0][0]
+
+    def purgar_cambios(self, hasta):
+        """Borra del diario los cambios con seq <= hasta (ya consumidos). Retorna la cantidad borrada."""
+        return self.ejecutar_query("DELETE FROM cambios WHERE seq <= ?", (hasta,))
+
+    # --- Sincronización entre Equipos ---
+
+    def obtener_cambios_sync(self, desde=0, limite=500, excluir_origen=None, solo_locales=False):
+        """
+        Filas modificadas en el tramo del diario (desde, desde+limite], en el formato que viaja entre equipos:
+        {"tabla", "uid", "operacion" ('U' o 'D'), "modificado", "origen", "datos"} con las claves foráneas como uid.
+        Cada fila viaja una vez por tramo, con su estado actual. solo_locales deja las versiones de este equipo
+        (y las anteriores a la sincronización); excluir_origen omite las que ya vinieron de ese equipo.
+        Retorna (cambios, seq_hasta, hay_mas).
+        """
+        entradas = self.obtener_datos("SELECT seq, tabla, fila_id, operacion FROM cambios WHERE seq > ? ORDER BY seq LIMIT ?", (desde, limite))
+        if not entradas:
+            return [], desde, False
+        ultimas = {}
+        for _, tabla, fila_id, operacion in entradas:
+            ultimas.pop((tabla, fila_id), None)
+            ultimas[(tabla, fila_id)] = operacion
+
+        versiones = {}
+        for tabla in self.TABLAS_SYNC:
+            ids = json.dumps([fila_id for (t, fila_id), op in ultimas.items() if t == tabla and op != "D"])
+            campos = ", ".join(f"t.{c}" for c in self.COLUMNAS_DIARIO[tabla])
+            unir = ""
+            if tabla in self.REFERENCIAS_SYNC:
+                columna, tabla_padre, _ = self.REFERENCIAS_SYNC[tabla]
+                campos += ", p.uid"
+                unir = f"LEFT JOIN {tabla_padre} p ON p.id = t.{columna}"
+            query = f"SELECT t.id, t.uid, t.modificado, t.origen, {campos} FROM {tabla} t {unir} WHERE t.id IN (SELECT value FROM json_each(?))"
+            for fila_id, uid, modificado, origen, *valores in self.obtener_datos(query, (ids,)):
+                nombres = list(self.COLUMNAS_DIARIO[tabla])
+                if tabla in self.REFERENCIAS_SYNC:
+                    columna, _, clave = self.REFERENCIAS_SYNC[tabla]
+                    nombres[nombres.index(columna)] = clave
+                    valores[nombres.index(clave)] = valores.pop()
+                versiones[(tabla, fila_id)] = ("U", uid, modificado, origen, dict(zip(nombres, valores)))
+            ids_bajas = json.dumps([fila_id for (t, fila_id), op in ultimas.items() if t == tabla and op == "D"])
+            for fila_id, uid, modificado, origen in self.obtener_datos(
+                    "SELECT fila_id, uid, modificado, origen FROM sync_bajas WHERE tabla = ? AND fila_id IN (SELECT value FROM json_each(?))",
+                    (tabla, ids_bajas)):
+                versiones[(tabla, fila_id)] = ("D", uid, modificado, origen, None)
+
+        locales = (self.nodo_id, "")
+        cambios = []
+        for clave in ultimas:
+            # Filas borradas más adelante en el diario no están: su baja llega en un tramo posterior
+            if clave not in versiones:
+                continue
+            operacion, uid, modificado, origen, datos = versiones[clave]
+            if (solo_locales and origen not in locales) or (excluir_origen is not None and origen == excluir_origen):
+                continue
+            cambios.append({"tabla": clave[0], "uid": uid, "operacion": operacion, "modificado": modificado, "origen": origen, "datos": datos})
+        return cambios, entradas[-1][0], len(entradas) == limite
+
+    def aplicar_cambios_sync(self, cambios):
+        """
+        Aplica cambios de otro equipo en una transacción: gana la versión (modificado, origen) mayor,
+        comparada contra la fila local y contra su registro de baja. Las altas se aplican en orden de
+        dependencia y las bajas al final, en orden inverso. Retorna (aplicados, omitidos).
+        """
+        orden = {tabla: i for i, tabla in enumerate(self.TABLAS_SYNC)}
+        for cambio in cambios:
+            if cambio["tabla"] not in orden:
+                raise ValueError(f"Tabla no sincronizable: {cambio['tabla']}")
+        altas = sorted((c for c in cambios if c["operacion"] != "D"), key=lambda c: orden[c["tabla"]])
+        bajas = sorted((c for c in cambios if c["operacion"] == "D"), key=lambda c: -orden[c["tabla"]])
+
+        aplicados = omitidos = 0
+        with self._transaccion(tablas=self.TABLAS_SYNC) as cursor:
+            for cambio in altas + bajas:
+                tabla, uid = cambio["tabla"], cambio["uid"]
+                version = (cambio["modificado"], cambio["origen"])
+                baja = cursor.execute("SELECT modificado, origen FROM sync_bajas WHERE tabla = ? AND uid = ?", (tabla, uid)).fetchone()
+                local = cursor.execute(f"SELECT id, modificado, COALESCE(origen, '') FROM {tabla} WHERE uid = ?", (uid,)).fetchone()
+                if (baja and tuple(baja) >= version) or (local and tuple(local[1:]) >= version):
+                    omitidos += 1
+                    continue
+                if cambio["operacion"] == "D":
+                    aplicado = self._aplicar_baja_sync(cursor, tabla, uid, version, local)
+                else:
+                    aplicado = self._aplicar_alta_sync(cursor, cambio, version, local)
+                if aplicado:
+                    aplicados += 1
+                else:
+                    omitidos += 1
+        return aplicados, omitidos
+
+    def _aplicar_alta_sync(self, cursor, cambio, version, local):
+        tabla = cambio["tabla"]
+        datos = dict(cambio["datos"])
+        if tabla in self.REFERENCIAS_SYNC:
+            columna, tabla_padre, clave = self.REFERENCIAS_SYNC[tabla]
+            uid_padre = datos.pop(clave, None)
+            datos[columna] = None
+            if uid_padre is not None:
+                padre = cursor.execute(f"SELECT id FROM {tabla_padre} WHERE uid = ?", (uid_padre,)).fetchone()
+                if padre is None:
+                    logging.warning(f"Sincronización: {tabla} {cambio['uid']} omitido, no existe {tabla_padre} {uid_padre}")
+                    return False
+                datos[columna] = padre[0]
+        if tabla == "mensualidades":
+            # Pago único por alumno y período: dos equipos pudieron registrar el mismo mes; queda la versión mayor
+            otro = cursor.execute(
+                "SELECT id, modificado, COALESCE(origen, '') FROM mensualidades WHERE estudiante_id = ? AND anio = ? AND mes_idx = ? AND uid != ?",
+                (datos.get("estudiante_id"), datos.get("anio"), datos.get("mes_idx"), cambio["uid"])
+            ).fetchone()
+            if otro:
+                if tuple(otro[1:]) >= version:
+                    return False
+                cursor.execute("DELETE FROM mensualidades WHERE id = ?", (otro[0],))
+
+        # Solo las columnas que trae el cambio: un equipo con una versión anterior no envía las columnas nuevas
+        # (p. ej. estado) y en ese caso quedan con su valor actual o su valor por defecto
+        columnas = [c for c in self.COLUMNAS_DIARIO[tabla] if c in datos]
+        valores = [datos[c] for c in columnas]
+        if local:
+            asignaciones = "".join(f"{c} = ?, " for c in columnas)
+            cursor.execute(f"UPDATE {tabla} SET {asignaciones}modificado = ?, origen = ? WHERE id = ?", (*valores, *version, local[0]))
+        else:
+            cursor.execute(f"INSERT INTO {tabla} ({''.join(c + ', ' for c in columnas)}uid, modificado, origen) VALUES ({'?, ' * len(columnas)}?, ?, ?)",
+                           (*valores, cambio["uid"], *version))
+        return True
+
+    def _aplicar_baja_sync(self, cursor, tabla, uid, version, local):
+        if local and tabla == "apoderados" and cursor.execute("SELECT 1 FROM estudiantes WHERE apoderado_id = ? LIMIT 1", (local[0],)).fetchone():
+            # Mismo criterio que en la aplicación: un apoderado con alumnos (asignados aquí) no se borra
+            logging.warning(f"Sincronización: baja de apoderado {uid} omitida, tiene alumnos asignados en este equipo")
+            return False
+        cursor.execute('''
+            INSERT INTO sync_bajas (tabla, uid, fila_id, modificado, origen) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(tabla, uid) DO UPDATE SET modificado = excluded.modificado, origen = excluded.origen
+        ''', (tabla, uid, local[0] if local else None, *version))
+        if local:
+            if tabla == "estudiantes":
+                cursor.execute("DELETE FROM mensualidades WHERE estudiante_id = ?", (local[0],))
+            cursor.execute(f"DELETE FROM {tabla} WHERE id = ?", (local[0],))
+        return True
+
     # --- Métodos de Borrado Masivo ---
 
     def eliminar_todos_pagos(self):
@@ -300,12 +2055,241 @@ class SchoolDB:
 
     def eliminar_todos_estudiantes(self):
         # Eliminar pagos primero para mantener integridad referencial
-        self.ejecutar_query("DELETE FROM mensualidades")
-        self.ejecutar_query("DELETE FROM estudiantes")
+        with self._transaccion(tablas=("mensualidades", "estudiantes")) as cursor:
+            cursor.execute("DELETE FROM mensualidades")
+            cursor.execute("DELETE FROM estudiantes")
 
     def eliminar_todos_apoderados(self):
         # Verificar si hay estudiantes registrados antes de borrar apoderados
         count = self.obtener_datos("SELECT COUNT(*) FROM estudiantes")[0][0]
         if count > 0:
             raise Exception("No se pueden eliminar los apoderados porque existen alumnos registrados. Elimine los alumnos primero.")
-        self.ejecutar_query("DELETE FROM apoderados")
\ No newline at end of file
+        self.ejecutar_query("DELETE FROM apoderados")
+
+    # --- Importación Masiva (CSV) ---
+
+    # Columnas aceptadas por tipo de importación: {columna_canónica: (alias aceptados en el encabezado)}
+    COLUMNAS_IMPORTACION = {
+        "apoderados": {
+            "nombre": ("nombre", "apoderado", "nombre_apoderado"),
+            "telefono": ("telefono", "fono", "celular"),
+            "email": ("email", "correo"),
+        },
+        "estudiantes": {
+            "nombre": ("nombre", "alumno", "nombre_alumno", "estudiante"),
+            "grado": ("grado", "curso"),
+            "apoderado": ("apoderado", "nombre_apoderado"),
+            "telefono_apoderado": ("telefono_apoderado", "telefono", "fono_apoderado"),
+        },
+        "mensualidades": {
+            "alumno": ("alumno", "nombre_alumno", "estudiante", "nombre"),
+            "grado": ("grado", "curso"),
+            "mes": ("mes",),
+            "monto": ("monto", "valor"),
+            "fecha_pago": ("fecha_pago", "fecha"),
+        },
+    }
+
+    def importar_csv(self, file_path, tipo, tamano_lote=1000):
+        """
+        Importa apoderados, estudiantes o mensualidades desde un CSV.
+        Lee el archivo por bloques, valida cada fila y escribe todo con executemany en una sola transacción.
+        Las filas rechazadas se guardan junto al archivo original como '<nombre>_rechazados.csv'.
+        Retorna (importados, rechazados, ruta_rechazados o None).
+        """
+        if tipo not in self.COLUMNAS_IMPORTACION:
+            raise ValueError(f"Tipo de importación desconocido: {tipo}")
+
+        preparar, insertar = {
+            "apoderados": (self._preparar_importacion_apoderados, self._insertar_apoderados_lote),
+            "estudiantes": (self._preparar_importacion_estudiantes, self._insertar_estudiantes_lote),
+            "mensualidades": (self._preparar_importacion_mensualidades, self._insertar_mensualidades_lote),
+        }[tipo]
+
+        ruta_rechazados = os.path.splitext(file_path)[0] + "_rechazados.csv"
+        importados = 0
+        rechazados = 0
+        archivo_rechazados = None
+        writer_rechazados = None
+
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            muestra = f.read(4096)
+            f.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+            except csv.Error:
+                dialecto = csv.excel
+            reader = csv.reader(f, dialecto)
+            encabezado = next(reader, None)
+            if not encabezado:
+                raise ValueError("El archivo CSV está vacío")
+            columnas = self._mapear_columnas_importacion(encabezado, tipo)
+
+            try:
+                # Los índices de búsqueda se construyen una sola vez en memoria
+                validar = preparar()
+                lote = []
+                with self._transaccion(tablas=(tipo,)) as cursor:
+                    for num_linea, fila in enumerate(reader, start=2):
+                        if not any(c.strip() for c in fila):
+                            continue
+                        registro = {col: (fila[i].strip() if i < len(fila) else "") for col, i in columnas.items()}
+                        valores, motivo = validar(registro)
+                        if motivo:
+                            if writer_rechazados is None:
+                                archivo_rechazados = open(ruta_rechazados, "w", newline="", encoding="utf-8-sig")
+                                writer_rechazados = csv.writer(archivo_rechazados)
+                                writer_rechazados.writerow(["linea"] + encabezado + ["motivo"])
+                            writer_rechazados.writerow([num_linea] + fila + [motivo])
+                            rechazados += 1
+                            continue
+                        lote.append(valores)
+                        if len(lote) >= tamano_lote:
+                            insertar(cursor, lote)
+                            importados += len(lote)
+                            lote = []
+                    if lote:
+                        insertar(cursor, lote)
+                        importados += len(lote)
+            finally:
+                if archivo_rechazados:
+                    archivo_rechazados.close()
+
+        logging.info(f"Importación de {tipo} desde {file_path}: {importados} importados, {rechazados} rechazados")
+        return importados, rechazados, (ruta_rechazados if rechazados else None)
+
+    @staticmethod
+    def _normalizar_texto(texto):
+        """Minúsculas y sin tildes, para comparar encabezados y nombres."""
+        texto = unicodedata.normalize("NFKD", texto or "")
+        return "".join(c for c in texto if not unicodedata.combining(c)).strip().lower()
+
+    @staticmethod
+    def _clave_telefono(telefono):
+        return "".join(c for c in (telefono or "") if c.isdigit() or c == "+")
+
+    def _mapear_columnas_importacion(self, encabezado, tipo):
+        normalizado = [self._normalizar_texto(h).replace(" ", "_") for h in encabezado]
+        columnas = {}
+        for col, alias in self.COLUMNAS_IMPORTACION[tipo].items():
+            for a in alias:
+                if a in normalizado and normalizado.index(a) not in columnas.values():
+                    columnas[col] = normalizado.index(a)
+                    break
+        obligatorias = {"apoderados": ("nombre",), "estudiantes": ("nombre",), "mensualidades": ("alumno", "mes", "monto")}[tipo]
+        faltantes = [c for c in obligatorias if c not in columnas]
+        if faltantes:
+            raise ValueError(f"Faltan columnas obligatorias en el CSV: {', '.join(faltantes)}")
+        return columnas
+
+    def _preparar_importacion_apoderados(self):
+        existentes = {(self._normalizar_texto(n), self._clave_telefono(t)) for n, t in self.obtener_datos("SELECT nombre, telefono FROM apoderados")}
+        fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def validar(r):
+            datos, error, _ = Validador.validar_apoderado(r.get("nombre"), r.get("telefono"), r.get("email"))
+            if error:
+                return None, error
+            nombre, tel, email = datos
+            clave = (self._normalizar_texto(nombre), self._clave_telefono(tel))
+            if clave in existentes:
+                return None, "Apoderado duplicado"
+            existentes.add(clave)
+            return (nombre, tel, email, fecha), None
+        return validar
+
+    def _insertar_apoderados_lote(self, cursor, lote):
+        cursor.executemany("INSERT INTO apoderados (nombre, telefono, email, fecha_registro) VALUES (?, ?, ?, ?)", lote)
+
+    def _preparar_importacion_estudiantes(self):
+        por_telefono = {}
+        por_nombre = {}
+        for id_apo, nombre, tel in self.obtener_datos("SELECT id, nombre, telefono FROM apoderados"):
+            if tel:
+                por_telefono[self._clave_telefono(tel)] = id_apo
+            por_nombre.setdefault(self._normalizar_texto(nombre), []).append(id_apo)
+        existentes = {(self._normalizar_texto(n), self._normalizar_texto(g)) for n, g in self.obtener_datos("SELECT nombre, grado FROM estudiantes")}
+        fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def validar(r):
+            nombre, grado = r.get("nombre", ""), r.get("grado", "")
+            if not nombre:
+                return None, "El nombre del alumno es obligatorio"
+
+            # Resolver apoderado: primero por teléfono (único), luego por nombre
+            apo_id = None
+            tel = self._clave_telefono(r.get("telefono_apoderado"))
+            if tel:
+                apo_id = por_telefono.get(tel)
+            if apo_id is None and r.get("apoderado"):
+                candidatos = por_nombre.get(self._normalizar_texto(r["apoderado"]), [])
+                if len(candidatos) > 1:
+                    return None, "Apoderado ambiguo (hay varios con ese nombre, indique el teléfono)"
+                apo_id = candidatos[0] if candidatos else None
+            if apo_id is None:
+                return None, "Apoderado no encontrado"
+
+            clave = (self._normalizar_texto(nombre), self._normalizar_texto(grado))
+            if clave in existentes:
+                return None, f"El alumno ya está inscrito en el grado '{grado}'"
+            existentes.add(clave)
+            return (nombre, grado, apo_id, fecha), None
+        return validar
+
+    def _insertar_estudiantes_lote(self, cursor, lote):
+        cursor.executemany("INSERT INTO estudiantes (nombre, grado, apoderado_id, fecha_registro) VALUES (?, ?, ?, ?)", lote)
+
+    def _preparar_importacion_mensualidades(self):
+        por_nombre_grado = {}
+        por_nombre = {}
+        for id_est, nombre, grado in self.obtener_datos("SELECT id, nombre, grado FROM estudiantes"):
+            clave_nombre = self._normalizar_texto(nombre)
+            por_nombre_grado[(clave_nombre, self._normalizar_texto(grado))] = id_est
+            por_nombre.setdefault(clave_nombre, []).append(id_est)
+        pagados = set(self.obtener_datos("SELECT estudiante_id, anio, mes_idx FROM mensualidades"))
+        archivados = set(self.anios_archivados())
+        fecha_hoy = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def validar(r):
+            clave_nombre = self._normalizar_texto(r.get("alumno"))
+            if r.get("grado"):
+                est_id = por_nombre_grado.get((clave_nombre, self._normalizar_texto(r["grado"])))
+            else:
+                candidatos = por_nombre.get(clave_nombre, [])
+                if len(candidatos) > 1:
+                    return None, "Alumno ambiguo (hay varios con ese nombre, indique el grado)"
+                est_id = candidatos[0] if candidatos else None
+            if est_id is None:
+                return None, "Alumno no encontrado"
+
+            mes_idx = self._indice_mes(r.get("mes"))
+            if mes_idx is None:
+                return None, "Mes inválido"
+            mes = MESES[mes_idx]
+            try:
+                monto = float(r.get("monto", "").replace("$", "").replace(" ", ""))
+            except ValueError:
+                return None, "El monto debe ser un número válido"
+            if monto <= 0:
+                return None, "El monto debe ser un número positivo mayor a 0"
+
+            # fecha_pago ordena el historial y su paginación: todas con el mismo formato
+            fecha = self._normalizar_fecha(r["fecha_pago"]) if r.get("fecha_pago") else fecha_hoy
+            if fecha is None:
+                return None, "Fecha de pago inválida (use AAAA-MM-DD o DD/MM/AAAA)"
+            periodo = (est_id, int(fecha[:4]), mes_idx)
+            try:
+                self._verificar_anio_abierto(periodo[1], archivados)
+            except ValueError as e:
+                return None, str(e)
+            if periodo in pagados:
+                return None, f"El pago de {mes} {periodo[1]} ya está registrado para este alumno"
+            pagados.add(periodo)
+            return (est_id, monto, mes, fecha, periodo[1], mes_idx), None
+        return validar
+
+    def _insertar_mensualidades_lote(self, cursor, lote):
+        cursor.executemany('''
+            INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago, anio, mes_idx) VALUES (?, ?, ?, 1, ?, ?, ?)
+            ON CONFLICT(estudiante_id, anio, mes_idx) DO NOTHING
+        ''', lote)
\ No newline at end of file
@@ -0,0 +1,32 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+class EjecutorDB:
+    """
+    Hilo único dueño del acceso a la base de datos. Las operaciones se encolan en orden de llegada
+    y retornan un Future: la interfaz nunca espera al disco y una escritura siempre se completa
+    antes que las lecturas encoladas después de ella.
+    """
+
+    def __init__(self):
+        self._hilo = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="EjecutorDB", initializer=self._registrar_hilo)
+
+    def _registrar_hilo(self):
+        self._hilo = threading.current_thread()
+
+    def enviar(self, funcion: Callable, *args, **kwargs) -> Future:
+        """Encola funcion(*args, **kwargs) y retorna su Future sin esperar."""
+        return self._executor.submit(funcion, *args, **kwargs)
+
+    def ejecutar(self, funcion: Callable, *args, **kwargs) -> Any:
+        """Para hilos de trabajo (PDF, importación): encola y espera el resultado. Nunca usar desde la UI."""
+        if threading.current_thread() is self._hilo:
+            # Llamada anidada desde una operación ya encolada: esperar aquí bloquearía el único hilo
+            return funcion(*args, **kwargs)
+        return self.enviar(funcion, *args, **kwargs).result()
+
+    def cerrar(self):
+        """Termina las operaciones pendientes y detiene el hilo."""
+        self._executor.shutdown(wait=True)
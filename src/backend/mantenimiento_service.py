@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+class ProgramadorMantenimiento:
+    """
+    Mantenimiento de la base en segundo plano: PRAGMA optimize, ANALYZE, vaciado incremental y quick_check,
+    cada uno con su frecuencia. Corre en un hilo propio (con su propia conexión) y solo cuando la interfaz
+    lleva un rato sin consultar la base. La hora de la última ejecución de cada tarea queda en configuración,
+    así la frecuencia se respeta entre sesiones.
+    """
+    FRECUENCIAS = {
+        "optimize": timedelta(hours=6),
+        "quick_check": timedelta(days=1),
+        "incremental_vacuum": timedelta(days=1),
+        "analyze": timedelta(days=7),
+    }
+    INTERVALO_REVISION = 60  # s entre revisiones de tareas pendientes
+    INACTIVIDAD = 120        # s sin actividad de la interfaz para considerar que el equipo está libre
+    # El vaciado se hace por tramos para soltar el bloqueo de escritura entre uno y otro
+    PAGINAS_POR_PASO = 1000
+
+    def __init__(self, obtener_db: Callable, al_advertir: Optional[Callable[[str], None]] = None,
+                 intervalo_revision: float = INTERVALO_REVISION, inactividad: float = INACTIVIDAD):
+        # obtener_db() retorna la base actual (puede cambiar si se abre otra escuela);
+        # al_advertir(mensaje) se llama desde el hilo de mantenimiento si quick_check encuentra problemas
+        self.obtener_db = obtener_db
+        self.al_advertir = al_advertir
+        self.intervalo_revision = intervalo_revision
+        self.inactividad = inactividad
+        self._ultima_actividad = time.monotonic()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def registrar_actividad(self):
+        """La interfaz avisa que usó la base: el mantenimiento espera otro período de inactividad."""
+        self._ultima_actividad = time.monotonic()
+
+    def inactivo(self) -> bool:
+        return time.monotonic() - self._ultima_actividad >= self.inactividad
+
+    def iniciar(self):
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True, name="Mantenimiento")
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    def tareas_pendientes(self, db, ahora: Optional[datetime] = None) -> List[str]:
+        """Tareas cuya última ejecución es más antigua que su frecuencia (o que nunca corrieron)."""
+        ahora = ahora or datetime.now()
+        ultimas = db.ultimo_mantenimiento()
+        pendientes = []
+        for tarea, frecuencia in self.FRECUENCIAS.items():
+            try:
+                ultima = datetime.fromisoformat(ultimas[tarea])
+            except (KeyError, ValueError):
+                ultima = None
+            if ultima is None or ahora - ultima >= frecuencia:
+                pendientes.append(tarea)
+        return pendientes
+
+    def ejecutar_pendientes(self, forzar: bool = False) -> Dict[str, object]:
+        """
+        Ejecuta en este hilo las tareas vencidas mientras el equipo siga libre (forzar=True ignora la inactividad).
+        Retorna {tarea: resultado} de las que se completaron.
+        """
+        db = self.obtener_db()
+        resultados = {}
+        for tarea in self.tareas_pendientes(db):
+            if not (forzar or self.inactivo()) or self._detener.is_set():
+                break
+            if tarea == "incremental_vacuum":
+                resultado = self._vaciar(db, forzar)
+                if resultado is None:
+                    break
+            else:
+                resultado = db.ejecutar_mantenimiento(tarea)
+            resultados[tarea] = resultado
+            logging.info(f"Mantenimiento '{tarea}' completado en {db.db_path}")
+            if tarea == "quick_check" and resultado and self.al_advertir:
+                self.al_advertir(f"⚠ La revisión de integridad encontró {len(resultado)} problema(s): {resultado[0]}")
+        return resultados
+
+    def _vaciar(self, db, forzar: bool) -> Optional[int]:
+        """Vaciado por tramos. Retorna las páginas libres que quedan, o None si se interrumpió por actividad."""
+        while True:
+            restantes = db.ejecutar_mantenimiento("incremental_vacuum", self.PAGINAS_POR_PASO)
+            if not restantes:
+                return restantes
+            if not (forzar or self.inactivo()) or self._detener.is_set():
+                return None
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo_revision):
+            if not self.inactivo():
+                continue
+            try:
+                self.ejecutar_pendientes()
+            except Exception as e:
+                # Por ejemplo, la base quedó bloqueada por una escritura larga: se reintenta en la próxima revisión
+                logging.error(f"Error en el mantenimiento de la base: {e}")
@@ -0,0 +1,45 @@
+import logging
+import sys
+import time
+from typing import List, Optional, Tuple
+
+class PerfilArranque:
+    """
+    Tiempo de arranque de la aplicación por fase (opción --profile-startup). Cada fase dura desde la marca
+    anterior (o desde `inicio`) hasta la suya. Desactivado, marcar() no hace nada.
+    """
+    def __init__(self, activo: bool = False, inicio: Optional[float] = None):
+        # inicio: time.perf_counter() tomado lo antes posible, antes de importar la interfaz y los servicios
+        self.activo = activo
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self._ultima = self.inicio
+        self.fases: List[Tuple[str, float]] = []
+
+    def marcar(self, fase: str):
+        if not self.activo:
+            return
+        ahora = time.perf_counter()
+        self.fases.append((fase, ahora - self._ultima))
+        self._ultima = ahora
+
+    def total(self) -> float:
+        return self._ultima - self.inicio
+
+    def reporte(self) -> str:
+        total = self.total()
+        ancho = max((len(fase) for fase, _ in self.fases), default=0)
+        lineas = [f"Arranque: {total * 1000:.0f} ms"]
+        for fase, segundos in self.fases:
+            porcentaje = segundos / total * 100 if total else 0
+            lineas.append(f"  {fase:<{ancho}}  {segundos * 1000:8.1f} ms  {porcentaje:5.1f}%")
+        return "\n".join(lineas)
+
+    def emitir(self):
+        """Escribe el reporte en el log de la aplicación y, si hay consola, en la salida estándar."""
+        if not self.activo:
+            return
+        reporte = self.reporte()
+        logging.info(reporte)
+        # El ejecutable --windowed no tiene consola (sys.stdout es None)
+        if sys.stdout:
+            print(reporte, flush=True)
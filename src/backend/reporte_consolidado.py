@@ -0,0 +1,107 @@
+import sqlite3
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from backend.database import SchoolDB, limite_attach
+
+# Métricas por escuela, en el orden de las columnas de la consulta
+METRICAS = ("alumnos", "ingresos_mes", "ingresos_anio", "morosos", "meses_adeudados")
+
+def _limite_attach() -> int:
+    """Cantidad máxima de bases que SQLite permite adjuntar a una conexión (10 por defecto)."""
+    conn = sqlite3.connect(":memory:")
+    try:
+        return limite_attach(conn)
+    finally:
+        conn.close()
+
+def _consolidar_lote(rutas: List[str], anio: int, mes_idx: int, mes_corte_idx: int) -> Tuple[List[Dict], List[str]]:
+    """
+    Adjunta un lote de bases (no más que el límite de ATTACH) a una conexión en memoria y calcula
+    las métricas de todas en una sola consulta UNION ALL. Función de módulo para poder usarla en otro proceso.
+    Retorna ([métricas por escuela], [rutas de las bases que no están en la versión actual del esquema]).
+    """
+    version = SchoolDB.version_esquema()
+    # Las bases se adjuntan de solo lectura: el reporte no migra ni modifica las de otras escuelas
+    conn = sqlite3.connect(":memory:", uri=True)
+    try:
+        partes = []
+        params = []
+        desactualizadas = []
+        for i, ruta in enumerate(rutas):
+            esquema = f"e{i}"
+            conn.execute(f"ATTACH DATABASE ? AS {esquema}", (Path(ruta).as_uri() + "?mode=ro",))
+            # Una base sin migrar no tiene las columnas que usa la consulta: se informa para abrirla con el sistema
+            if conn.execute(f"PRAGMA {esquema}.user_version").fetchone()[0] != version:
+                desactualizadas.append(ruta)
+                continue
+            # Cada escuela usa su propio mes de inicio de clases (configuración), Marzo por defecto
+            inicio = f"COALESCE((SELECT CAST(valor AS INTEGER) FROM {esquema}.configuracion WHERE clave = 'inicio_clases_idx'), 2)"
+            adeudados = f'''
+                SELECT e.id, COUNT(*) AS meses
+                FROM {esquema}.estudiantes e
+                JOIN {esquema}.calendario_meses c ON c.idx BETWEEN {inicio} AND ?
+                WHERE e.estado = 'activo'
+                  AND NOT EXISTS (SELECT 1 FROM {esquema}.mensualidades m WHERE m.estudiante_id = e.id AND m.anio = ? AND m.mes_idx = c.idx)
+                GROUP BY e.id
+            '''
+            partes.append(f'''
+                SELECT ? AS orden,
+                    (SELECT valor FROM {esquema}.configuracion WHERE clave = 'nombre_escuela'),
+                    (SELECT COUNT(*) FROM {esquema}.estudiantes WHERE estado = 'activo'),
+                    (SELECT COALESCE(SUM(monto), 0) FROM {esquema}.mensualidades WHERE anio = ? AND mes_idx = ?),
+                    (SELECT COALESCE(SUM(monto), 0) FROM {esquema}.mensualidades WHERE anio = ?),
+                    d.morosos, d.meses
+                FROM (SELECT COUNT(*) AS morosos, COALESCE(SUM(meses), 0) AS meses FROM ({adeudados})) d
+            ''')
+            params += [i, anio, mes_idx, anio, mes_corte_idx, anio]
+
+        if not partes:
+            return [], desactualizadas
+        filas = conn.execute(" UNION ALL ".join(partes) + " ORDER BY orden", params).fetchall()
+        resultado = []
+        for orden, nombre, *valores in filas:
+            ruta = rutas[orden]
+            fila = {"ruta": ruta, "escuela": nombre or os.path.splitext(os.path.basename(ruta))[0]}
+            fila.update(zip(METRICAS, valores))
+            resultado.append(fila)
+        return resultado, desactualizadas
+    finally:
+        conn.close()
+
+class ReporteConsolidado:
+    @staticmethod
+    def generar(rutas: List[str], anio: int, mes_idx: int, mes_corte_idx: int) -> Tuple[List[Dict], Dict, List[str]]:
+        """
+        Dashboard, ingresos y morosidad de varias escuelas (una .db por escuela) en una pasada, sin modificar
+        las bases. Hasta el límite de ATTACH de SQLite se usa una sola conexión; por encima, los lotes se reparten
+        en un pool de procesos. Las bases de una versión anterior del sistema quedan fuera del reporte.
+        Retorna ([métricas por escuela], totales, [rutas de las bases desactualizadas]).
+        """
+        rutas = list(dict.fromkeys(os.path.abspath(r) for r in rutas))
+        if not rutas:
+            return [], dict.fromkeys(METRICAS, 0), []
+        # Se informan todas juntas, antes de adjuntar ninguna
+        faltantes = [r for r in rutas if not os.path.exists(r)]
+        if faltantes:
+            raise FileNotFoundError(f"No existen las bases: {', '.join(faltantes)}")
+
+        limite = _limite_attach()
+        lotes = [rutas[i:i + limite] for i in range(0, len(rutas), limite)]
+        if len(lotes) == 1:
+            resultados = [_consolidar_lote(lotes[0], anio, mes_idx, mes_corte_idx)]
+        else:
+            logging.info(f"Reporte consolidado: {len(rutas)} escuelas en {len(lotes)} lotes paralelos")
+            with ProcessPoolExecutor(max_workers=min(len(lotes), os.cpu_count() or 1)) as pool:
+                futuros = [pool.submit(_consolidar_lote, lote, anio, mes_idx, mes_corte_idx) for lote in lotes]
+                resultados = [futuro.result() for futuro in futuros]
+        por_escuela = [fila for filas, _ in resultados for fila in filas]
+        desactualizadas = [ruta for _, rutas_lote in resultados for ruta in rutas_lote]
+        if desactualizadas:
+            logging.warning(f"Reporte consolidado: bases sin actualizar omitidas: {', '.join(desactualizadas)}")
+
+        totales = {m: sum(fila[m] for fila in por_escuela) for m in METRICAS}
+        return por_escuela, totales, desactualizadas
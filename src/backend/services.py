@@ -1,13 +1,16 @@
 import csv
+import importlib.util
 from typing import List, Any
 
-# Intentar importar reportlab, manejar error si no existe
-try:
+# reportlab se importa recién al generar el primer PDF: cargarla al abrir la aplicación retrasa el arranque.
+# Aquí solo se verifica que esté instalada, sin importarla.
+HAS_REPORTLAB = importlib.util.find_spec("reportlab") is not None
+
+def _reportlab():
+    """(canvas, letter) de reportlab, importados en el primer uso."""
     from reportlab.pdfgen import canvas
     from reportlab.lib.pagesizes import letter
-    HAS_REPORTLAB = True
-except ImportError:
-    HAS_REPORTLAB = False
+    return canvas, letter
 
 class ReportService:
     @staticmethod
@@ -26,6 +29,7 @@ class ReportService:
         """Genera el PDF de la ficha del alumno."""
         if not HAS_REPORTLAB:
             raise ImportError("La librería 'reportlab' no está instalada.")
+        canvas, letter = _reportlab()
 
         nombre_alu, grado, fecha_reg, nombre_apo, tel_apo, email_apo = datos_alumno
         
@@ -88,6 +92,7 @@ class ReportService:
     def generar_recibo_pago_pdf(file_path: str, datos_pago: tuple, nombre_escuela: str):
         """Genera un recibo de pago individual."""
         if not HAS_REPORTLAB: return
+        canvas, letter = _reportlab()
 
         # datos_pago: (id, nombre_alu, grado, monto, mes, fecha)
         id_pago, nombre_alu, grado, monto, mes, fecha = datos_pago
@@ -0,0 +1,163 @@
+import gzip
+import hmac
+import json
+import logging
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+class ServidorSync:
+    """
+    Servicio HTTP local de sincronización (en el equipo principal de la escuela). Recibe los cambios de cada
+    equipo y le entrega los de los demás, leídos del diario de cambios de su propia base.
+    Los cuerpos viajan en JSON comprimido con gzip; cada pedido debe traer la clave compartida en X-Clave-Sync.
+    """
+    RUTA_ENVIAR = "/sync/enviar"
+    RUTA_RECIBIR = "/sync/recibir"
+    PUERTO = 8765
+    LIMITE_MAXIMO = 5000
+
+    def __init__(self, obtener_db: Callable, host: str = "0.0.0.0", puerto: int = PUERTO,
+                 clave: Optional[str] = None, ejecutar: Optional[Callable] = None):
+        # Escucha en toda la red local y acepta cambios de datos: sin clave cualquiera podría escribir en la base
+        if not clave:
+            raise ValueError("El servidor de sincronización necesita una clave compartida")
+        # obtener_db() retorna la base actual (puede cambiar si se abre otra escuela);
+        # ejecutar(funcion, *args) permite pasar cada operación por el hilo dueño de la base
+        self.obtener_db = obtener_db
+        self.host = host
+        self.puerto = puerto
+        self.clave = clave
+        self.ejecutar = ejecutar or (lambda funcion, *args, **kwargs: funcion(*args, **kwargs))
+        self._servidor = None
+
+    def iniciar(self) -> Tuple[str, int]:
+        """Atiende pedidos en un hilo aparte. Retorna (host, puerto) reales (puerto=0 elige uno libre)."""
+        self._servidor = ThreadingHTTPServer((self.host, self.puerto), self._crear_manejador())
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, daemon=True, name="ServidorSync").start()
+        host, puerto = self._servidor.server_address[:2]
+        logging.info(f"Servidor de sincronización escuchando en {host}:{puerto}")
+        return host, puerto
+
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def _enviar(self, pedido: Dict) -> Dict:
+        aplicados, omitidos = self.ejecutar(lambda: self.obtener_db().aplicar_cambios_sync(pedido["cambios"]))
+        return {"aplicados": aplicados, "omitidos": omitidos}
+
+    def _recibir(self, pedido: Dict) -> Dict:
+        limite = min(int(pedido.get("limite", 500)), self.LIMITE_MAXIMO)
+        # Los cambios que vinieron del mismo equipo que pregunta no se le devuelven
+        cambios, hasta, hay_mas = self.ejecutar(
+            lambda: self.obtener_db().obtener_cambios_sync(int(pedido.get("desde", 0)), limite, excluir_origen=pedido.get("nodo"))
+        )
+        return {"cambios": cambios, "hasta": hasta, "hay_mas": hay_mas}
+
+    def _crear_manejador(self):
+        servidor = self
+        rutas = {self.RUTA_ENVIAR: self._enviar, self.RUTA_RECIBIR: self._recibir}
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                atender = rutas.get(self.path)
+                if atender is None:
+                    self._responder(404, {"error": "Ruta desconocida"})
+                    return
+                if not hmac.compare_digest(self.headers.get("X-Clave-Sync", ""), servidor.clave):
+                    self._responder(403, {"error": "Clave de sincronización incorrecta"})
+                    return
+                try:
+                    cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                    if self.headers.get("Content-Encoding") == "gzip":
+                        cuerpo = gzip.decompress(cuerpo)
+                    self._responder(200, atender(json.loads(cuerpo)))
+                except Exception as e:
+                    logging.error(f"Error atendiendo {self.path}: {e}")
+                    self._responder(500, {"error": str(e)})
+
+            def _responder(self, estado, datos):
+                cuerpo = gzip.compress(json.dumps(datos).encode("utf-8"))
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                logging.debug("ServidorSync: " + formato % args)
+
+        return Manejador
+
+class ClienteSync:
+    """
+    Sincroniza una base con un ServidorSync: envía los cambios propios y aplica los de los demás equipos,
+    por lotes del diario. Los cursores de cada sentido se guardan en configuración después de cada lote,
+    así una sincronización interrumpida continúa donde quedó (reenviar un lote es inofensivo).
+    """
+    TAMANO_LOTE = 500
+
+    def __init__(self, db, url: str, clave: Optional[str] = None, ejecutar: Optional[Callable] = None, timeout: int = 30):
+        self.db = db
+        self.url = url.rstrip("/")
+        self.clave = clave or None
+        self.ejecutar = ejecutar or (lambda funcion, *args, **kwargs: funcion(*args, **kwargs))
+        self.timeout = timeout
+
+    def _post(self, ruta: str, datos: Dict) -> Dict:
+        pedido = urllib.request.Request(self.url + ruta, data=gzip.compress(json.dumps(datos).encode("utf-8")), method="POST")
+        pedido.add_header("Content-Type", "application/json")
+        pedido.add_header("Content-Encoding", "gzip")
+        if self.clave:
+            pedido.add_header("X-Clave-Sync", self.clave)
+        with urllib.request.urlopen(pedido, timeout=self.timeout) as respuesta:
+            cuerpo = respuesta.read()
+            if respuesta.headers.get("Content-Encoding") == "gzip":
+                cuerpo = gzip.decompress(cuerpo)
+        return json.loads(cuerpo)
+
+    def _cursor(self, sentido: str) -> int:
+        return int(self.ejecutar(self.db.obtener_configuracion, f"sync_{sentido}_hasta|{self.url}") or 0)
+
+    def _guardar_cursor(self, sentido: str, valor: int):
+        self.ejecutar(self.db.guardar_configuracion, f"sync_{sentido}_hasta|{self.url}", str(valor))
+
+    def enviar(self) -> int:
+        """Envía al servidor los cambios propios registrados desde el último envío. Retorna cuántas filas viajaron."""
+        enviados = 0
+        desde = self._cursor("enviado")
+        while True:
+            cambios, hasta, hay_mas = self.ejecutar(self.db.obtener_cambios_sync, desde, self.TAMANO_LOTE, solo_locales=True)
+            if cambios:
+                self._post(ServidorSync.RUTA_ENVIAR, {"nodo": self.ejecutar(lambda: self.db.nodo_id), "cambios": cambios})
+                enviados += len(cambios)
+            if hasta != desde:
+                self._guardar_cursor("enviado", hasta)
+                desde = hasta
+            if not hay_mas:
+                return enviados
+
+    def recibir(self) -> int:
+        """Trae y aplica los cambios de los demás equipos. Retorna cuántas filas se aplicaron."""
+        aplicados = 0
+        desde = self._cursor("recibido")
+        nodo = self.ejecutar(lambda: self.db.nodo_id)
+        while True:
+            respuesta = self._post(ServidorSync.RUTA_RECIBIR, {"nodo": nodo, "desde": desde, "limite": self.TAMANO_LOTE})
+            if respuesta["cambios"]:
+                aplicados += self.ejecutar(self.db.aplicar_cambios_sync, respuesta["cambios"])[0]
+            if respuesta["hasta"] != desde:
+                self._guardar_cursor("recibido", respuesta["hasta"])
+                desde = respuesta["hasta"]
+            if not respuesta["hay_mas"]:
+                return aplicados
+
+    def sincronizar(self) -> Tuple[int, int]:
+        """Primero envía y luego recibe. Retorna (enviados, recibidos)."""
+        return self.enviar(), self.recibir()
@@ -0,0 +1,48 @@
+import re
+from typing import Optional, Tuple
+
+class Validador:
+    """Reglas de validación sin dependencias de la interfaz (usadas por el controlador y la importación masiva)."""
+
+    @staticmethod
+    def limpiar_telefono(telefono: str) -> Optional[str]:
+        """Limpia el formato del teléfono y valida que empiece con +."""
+        if not telefono:
+            return None
+        # Quitar espacios, guiones, paréntesis
+        limpio = telefono.replace(" ", "").replace("-", "").replace("(", "").replace(")", "").strip()
+        if limpio.startswith("+"):
+            return limpio
+        return None
+
+    @staticmethod
+    def validar_email(email: str) -> bool:
+        # Si el email es opcional y está vacío, se considera válido.
+        if not email:
+            return True
+        return re.match(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$", email) is not None
+
+    @staticmethod
+    def validar_apoderado(nombre: str, tel: str, email: str) -> Tuple[Optional[tuple], Optional[str], Optional[str]]:
+        """Retorna (datos_limpios, error, aviso). Si hay error, datos_limpios es None."""
+        nombre = nombre.strip() if nombre else ""
+        tel = tel.strip() if tel else ""
+        email = email.strip() if email else ""
+        aviso = None
+
+        if not nombre:
+            return None, "El nombre es obligatorio", None
+
+        if tel:
+            # 1. Validar caracteres permitidos (dígitos, espacios, guiones, paréntesis)
+            if not re.match(r"^\+?[\d\s\(\)-]+$", tel):
+                return None, "El teléfono contiene caracteres inválidos", None
+
+            # 2. Advertencia de formato internacional
+            if not re.match(r"^\+[\d\s\(\)-]+$", tel):
+                aviso = "Se recomienda usar el formato internacional (+52...) para las funciones de WhatsApp."
+
+        if not Validador.validar_email(email):
+            return None, "El formato del email es inválido (ej: correo@dominio.com)", None
+
+        return (nombre, tel, email), None, aviso
@@ -1,10 +1,10 @@
-try:
-    import pywhatkit
-    HAS_PYWHATKIT = True
-except ImportError:
-    HAS_PYWHATKIT = False
+import importlib.util
 import socket
 
+# pywhatkit (y con ella pyautogui y sus dependencias web) se importa recién al enviar el primer mensaje:
+# es lo más lento de cargar y la mayoría de las sesiones no envía ninguno
+HAS_PYWHATKIT = importlib.util.find_spec("pywhatkit") is not None
+
 class WhatsAppService:
     @staticmethod
     def hay_internet():
@@ -23,6 +23,7 @@ class WhatsAppService:
             return False
 
         try:
+            import pywhatkit
             # wait_time: tiempo para cargar la página (20s)
             # tab_close: cerrar pestaña al terminar
             pywhatkit.sendwhatmsg_instantly(
@@ -0,0 +1,336 @@
+"""
+Micro-benchmark de SchoolDB y de los caminos de reportes del controlador sobre escuelas sintéticas.
+
+Uso (desde la carpeta src):
+    python -m bench.benchmark --escalas 1000 10000 --salida resultados.json
+    python -m bench.benchmark --escalas 1000 10000 --guardar-base bench/linea_base.json
+    python -m bench.benchmark --escalas 1000 10000 --base bench/linea_base.json   # sale con código 1 si hay regresiones
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.database import SchoolDB, MESES
+from backend.services import ReportService, HAS_REPORTLAB
+from backend.reporte_consolidado import ReporteConsolidado
+from bench.generador import crear_escuela, VERSION_GENERADOR, ANIO_FINAL, GRADOS
+
+ESCALAS = (1000, 10000)
+REPETICIONES = 5
+# Una medición es regresión si supera a la línea base en más de la tolerancia y en más de MINIMO_MS
+TOLERANCIA = 0.25
+MINIMO_MS = 1.0
+CARPETA_BASES = os.path.join(tempfile.gettempdir(), "escolares_bench")
+# Tope absoluto de la mediana en ms por alumno, además de la comparación con la línea base:
+# la promoción de fin de año de una escuela de 2.000 alumnos debe tomar menos de un segundo
+PRESUPUESTOS_MS_POR_ALUMNO = {"promover_grados": 0.5}
+
+# Métodos públicos que no se miden, con el motivo (el resto sin caso se informa como "sin medir")
+EXCLUIDOS = {
+    "cerrar": "cierra las conexiones",
+    "init_db": "solo lee user_version con la base al día",
+    "eliminar_todos_pagos": "destructivo",
+    "eliminar_todos_estudiantes": "destructivo",
+    "eliminar_todos_apoderados": "destructivo",
+    "cerrar_anio": "operación única por año",
+    "verificar_nodo": "se ejecuta una vez al abrir la base",
+    "ejecutar_query": "genérico: se mide a través de los demás métodos",
+    "obtener_datos": "genérico: se mide a través de los demás métodos",
+    "activar_instrumentacion": "configuración",
+    "desactivar_instrumentacion": "configuración",
+    "estadisticas_consultas": "en memoria",
+    "reiniciar_estadisticas_consultas": "en memoria",
+    "ruta_archivo": "no consulta la base",
+    "version_esquema": "no consulta la base",
+    "purgar_cambios": "destructivo",
+}
+
+def _contexto(db: SchoolDB, carpeta: str) -> Dict:
+    """Ids y parámetros de ejemplo tomados de la base generada, para que todos los casos sean repetibles."""
+    id_alumno = db.obtener_datos("SELECT estudiante_id FROM mensualidades GROUP BY estudiante_id ORDER BY COUNT(*) DESC, estudiante_id LIMIT 1")[0][0]
+    id_apoderado = db.obtener_datos("SELECT apoderado_id FROM estudiantes WHERE id = ?", (id_alumno,))[0][0]
+    nombre, grado = db.obtener_datos("SELECT nombre, grado FROM estudiantes WHERE id = ?", (id_alumno,))[0]
+    id_pago, monto, mes = db.obtener_datos("SELECT id, monto, mes FROM mensualidades WHERE estudiante_id = ? ORDER BY id LIMIT 1", (id_alumno,))[0]
+    apoderado = db.obtener_datos("SELECT nombre, telefono, email FROM apoderados WHERE id = ?", (id_apoderado,))[0]
+    mitad = db.obtener_datos("SELECT id FROM estudiantes ORDER BY id LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM estudiantes)")[0][0]
+    return {
+        # Progresión en círculo: cada repetición promueve a todos los alumnos activos, sin que se agoten
+        "progresion": {grado: GRADOS[(i + 1) % len(GRADOS)] for i, grado in enumerate(GRADOS)},
+        "carpeta": carpeta, "anio": ANIO_FINAL, "mes": "Octubre", "inicio": 2, "corte": 9,
+        "id_alumno": id_alumno, "id_apoderado": id_apoderado, "alumno": (nombre, grado), "apoderado": apoderado,
+        "pago": (id_pago, monto, mes), "termino": nombre.split()[-1][:4].lower(), "mitad": mitad,
+        "contador": itertools.count(1),
+    }
+
+def _csv_apoderados(db, ctx):
+    ruta = os.path.join(ctx["carpeta"], "importar_apoderados.csv")
+    with open(ruta, "w", newline="", encoding="utf-8") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(["nombre", "telefono", "email"])
+        for _ in range(1000):
+            n = next(ctx["contador"])
+            escritor.writerow([f"Importado Núñez {n}", f"+5697{n:07d}", ""])
+    return ruta
+
+def _nuevo_pago(db, ctx):
+    anio = 1900 + next(ctx["contador"])
+    db.registrar_pago(ctx["id_alumno"], 1000, "Marzo", anio=anio)
+    return db.obtener_datos("SELECT MAX(id) FROM mensualidades")[0][0]
+
+def _nuevo_alumno(db, ctx):
+    db.agregar_estudiante(f"Temporal {next(ctx['contador'])}", "1° Básico", ctx["id_apoderado"])
+    return db.obtener_datos("SELECT MAX(id) FROM estudiantes")[0][0]
+
+def _nuevo_apoderado(db, ctx):
+    db.agregar_apoderado(f"Temporal {next(ctx['contador'])}", "+56900000000", "")
+    return db.obtener_datos("SELECT MAX(id) FROM apoderados")[0][0]
+
+def _exportar(ctx, nombre, headers, datos):
+    ReportService.exportar_csv(os.path.join(ctx["carpeta"], nombre), headers, datos)
+
+def _ficha_pdf(db, ctx):
+    # Mismo camino que SchoolController.generar_ficha_alumno_pdf
+    detalle = db.obtener_estudiante_detalle(ctx["id_alumno"])[0]
+    ReportService.generar_ficha_alumno_pdf(os.path.join(ctx["carpeta"], "ficha.pdf"), detalle,
+                                           db.obtener_pagos_alumno(ctx["id_alumno"]), "Escuela")
+
+# (nombre, ejecutar(db, ctx, preparado), preparar(db, ctx) o None). preparar no se mide.
+# El orden importa: el estado de cuenta se activa a mitad de la lista y se desactiva al final.
+CASOS: List[Tuple[str, Callable, Optional[Callable]]] = [
+    # Lecturas
+    ("obtener_apoderados", lambda db, ctx, _: db.obtener_apoderados(), None),
+    ("obtener_apoderados_completo", lambda db, ctx, _: db.obtener_apoderados_completo(), None),
+    ("obtener_estudiantes_simple", lambda db, ctx, _: db.obtener_estudiantes_simple(), None),
+    ("obtener_estudiantes_completo", lambda db, ctx, _: db.obtener_estudiantes_completo(), None),
+    ("obtener_estudiantes_pagina", lambda db, ctx, _: db.obtener_estudiantes_pagina(200, None), None),
+    ("obtener_estudiante_por_id", lambda db, ctx, _: db.obtener_estudiante_por_id(ctx["id_alumno"]), None),
+    ("obtener_estudiante_detalle", lambda db, ctx, _: db.obtener_estudiante_detalle(ctx["id_alumno"]), None),
+    ("obtener_datos_cobranza", lambda db, ctx, _: db.obtener_datos_cobranza(ctx["id_alumno"]), None),
+    ("obtener_telefonos_apoderados", lambda db, ctx, _: db.obtener_telefonos_apoderados(), None),
+    ("buscar_estudiantes", lambda db, ctx, _: db.buscar_estudiantes(ctx["termino"]), None),
+    ("buscar_estudiantes_texto", lambda db, ctx, _: db.buscar_estudiantes_texto(ctx["termino"]), None),
+    ("buscar_apoderados_texto", lambda db, ctx, _: db.buscar_apoderados_texto(ctx["termino"]), None),
+    ("buscar_pagos", lambda db, ctx, _: db.buscar_pagos(ctx["termino"]), None),
+    ("buscar_pagos_texto", lambda db, ctx, _: db.buscar_pagos_texto(ctx["termino"]), None),
+    ("obtener_historial_pagos", lambda db, ctx, _: db.obtener_historial_pagos(), None),
+    ("obtener_historial_pagos_pagina", lambda db, ctx, _: db.obtener_historial_pagos_pagina(200, None), None),
+    ("obtener_pagos_todos", lambda db, ctx, _: db.obtener_pagos_todos(), None),
+    ("obtener_pagos_alumno", lambda db, ctx, _: db.obtener_pagos_alumno(ctx["id_alumno"]), None),
+    ("obtener_pago_detalle", lambda db, ctx, _: db.obtener_pago_detalle(ctx["pago"][0]), None),
+    ("obtener_morosos", lambda db, ctx, _: db.obtener_morosos(ctx["inicio"], ctx["corte"], anio=ctx["anio"]), None),
+    ("obtener_morosos_alumno", lambda db, ctx, _: db.obtener_morosos(ctx["inicio"], ctx["corte"], ctx["id_alumno"], ctx["anio"]), None),
+    ("obtener_estadisticas_dashboard", lambda db, ctx, _: db.obtener_estadisticas_dashboard(ctx["mes"], ctx["anio"]), None),
+    ("obtener_alumnos_por_grado", lambda db, ctx, _: db.obtener_alumnos_por_grado(), None),
+    ("obtener_ingresos_por_mes", lambda db, ctx, _: db.obtener_ingresos_por_mes(ctx["anio"]), None),
+    ("obtener_configuracion", lambda db, ctx, _: db.obtener_configuracion("nombre_escuela"), None),
+    ("obtener_configuraciones", lambda db, ctx, _: db.obtener_configuraciones(("nombre_escuela", "inicio_clases_idx", "dia_cobranza")), None),
+    ("obtener_cambios", lambda db, ctx, _: db.obtener_cambios(0, 1000), None),
+    ("obtener_cambios_sync", lambda db, ctx, _: db.obtener_cambios_sync(0, 500), None),
+    ("ultimo_cambio", lambda db, ctx, _: db.ultimo_cambio(), None),
+    ("anios_archivados", lambda db, ctx, _: db.anios_archivados(), None),
+    ("obtener_archivos_anuales", lambda db, ctx, _: db.obtener_archivos_anuales(), None),
+    ("ultimo_mantenimiento", lambda db, ctx, _: db.ultimo_mantenimiento(), None),
+    ("verificar_estudiante_existente", lambda db, ctx, _: db.verificar_estudiante_existente(*ctx["alumno"]), None),
+    ("verificar_pago_existente", lambda db, ctx, _: db.verificar_pago_existente(ctx["id_alumno"], "Marzo", ctx["anio"]), None),
+    ("verificar_dependencia_apoderado", lambda db, ctx, _: db.verificar_dependencia_apoderado(ctx["id_apoderado"]), None),
+    ("obtener_grados_activos", lambda db, ctx, _: db.obtener_grados_activos(), None),
+    ("obtener_progresion_grados", lambda db, ctx, _: db.obtener_progresion_grados(), None),
+    ("vista_previa_promocion", lambda db, ctx, _: db.vista_previa_promocion(ctx["progresion"]), None),
+    # Escrituras
+    ("agregar_apoderado", lambda db, ctx, _: db.agregar_apoderado(f"Bench Ñuñoa {next(ctx['contador'])}", "+56911111111", ""), None),
+    ("agregar_estudiante", lambda db, ctx, _: db.agregar_estudiante(f"Bench Peña {next(ctx['contador'])}", "1° Básico", ctx["id_apoderado"]), None),
+    ("actualizar_apoderado", lambda db, ctx, _: db.actualizar_apoderado(ctx["id_apoderado"], *ctx["apoderado"]), None),
+    ("actualizar_estudiante", lambda db, ctx, _: db.actualizar_estudiante(ctx["id_alumno"], *ctx["alumno"], ctx["id_apoderado"]), None),
+    ("cambiar_estado_estudiante", lambda db, ctx, _: db.cambiar_estado_estudiante(ctx["id_alumno"], "activo"), None),
+    ("registrar_pago", lambda db, ctx, _: db.registrar_pago(ctx["id_alumno"], 1000, "Marzo", anio=1900 + next(ctx["contador"])), None),
+    ("registrar_pagos_lote", lambda db, ctx, _: db.registrar_pagos_lote(
+        [(ctx["mitad"] + i, 1000, mes) for i in range(10) for mes in MESES[2:7]], anio=1900 + next(ctx["contador"])), None),
+    ("actualizar_pago", lambda db, ctx, _: db.actualizar_pago(*ctx["pago"]), None),
+    ("eliminar_pago", lambda db, ctx, id_pago: db.eliminar_pago(id_pago), _nuevo_pago),
+    ("eliminar_estudiante", lambda db, ctx, id_alu: db.eliminar_estudiante(id_alu), _nuevo_alumno),
+    ("eliminar_apoderado", lambda db, ctx, id_apo: db.eliminar_apoderado(id_apo), _nuevo_apoderado),
+    ("guardar_configuracion", lambda db, ctx, _: db.guardar_configuracion("bench", str(next(ctx["contador"]))), None),
+    ("guardar_configuraciones", lambda db, ctx, _: db.guardar_configuraciones({"bench": str(next(ctx["contador"])), "bench_2": "1"}), None),
+    ("guardar_progresion_grados", lambda db, ctx, _: db.guardar_progresion_grados(ctx["progresion"]), None),
+    ("promover_grados", lambda db, ctx, previa: db.promover_grados(ctx["progresion"], esperados=previa),
+     lambda db, ctx: db.vista_previa_promocion(ctx["progresion"])),
+    ("importar_csv", lambda db, ctx, ruta: db.importar_csv(ruta, "apoderados"), _csv_apoderados),
+    ("aplicar_cambios_sync", lambda db, ctx, cambios: db.aplicar_cambios_sync(cambios), lambda db, ctx: db.obtener_cambios_sync(0, 500)[0]),
+    ("reconstruir_resumenes", lambda db, ctx, _: db.reconstruir_resumenes(), None),
+    ("checkpoint", lambda db, ctx, _: db.checkpoint(), None),
+    ("ejecutar_mantenimiento", lambda db, ctx, _: db.ejecutar_mantenimiento("quick_check"), None),
+    # Caminos de reportes del controlador (consulta + archivo, sin la interfaz)
+    ("reporte_dashboard", lambda db, ctx, _: (db.obtener_estadisticas_dashboard(ctx["mes"], ctx["anio"]),
+                                              db.obtener_alumnos_por_grado(), db.obtener_ingresos_por_mes(ctx["anio"])), None),
+    ("reporte_morosos_csv", lambda db, ctx, _: _exportar(ctx, "morosos.csv", ["ID", "Nombre", "Grado", "Apoderado", "Teléfono", "Meses"],
+                                                         db.obtener_morosos(ctx["inicio"], ctx["corte"], anio=ctx["anio"])), None),
+    ("reporte_historial_csv", lambda db, ctx, _: _exportar(ctx, "historial.csv", ["ID", "Alumno", "Grado", "Monto", "Mes", "Pagado", "Fecha"],
+                                                           db.obtener_historial_pagos()), None),
+    ("reporte_alumnos_csv", lambda db, ctx, _: _exportar(ctx, "alumnos.csv", ["ID", "Nombre", "Grado", "Fecha", "Apoderado", "Teléfono", "Email"],
+                                                         db.obtener_estudiantes_completo()), None),
+    ("reporte_consolidado", lambda db, ctx, _: ReporteConsolidado.generar([db.db_path], ctx["anio"], 9, ctx["corte"]), None),
+] + ([("reporte_ficha_pdf", lambda db, ctx, _: _ficha_pdf(db, ctx), None)] if HAS_REPORTLAB else []) + [
+    # Estado de cuenta materializado
+    ("activar_estado_cuenta", lambda db, ctx, _: db.activar_estado_cuenta(), lambda db, ctx: db.desactivar_estado_cuenta()),
+    ("obtener_morosos_estado_cuenta", lambda db, ctx, _: db.obtener_morosos(ctx["inicio"], ctx["corte"], anio=ctx["anio"]), None),
+    ("obtener_deudores_estado_cuenta", lambda db, ctx, _: db.obtener_deudores_estado_cuenta(ctx["anio"], ctx["inicio"], ctx["corte"]), None),
+    ("reconstruir_estado_cuenta", lambda db, ctx, _: db.reconstruir_estado_cuenta(), None),
+    ("desactivar_estado_cuenta", lambda db, ctx, _: db.desactivar_estado_cuenta(), lambda db, ctx: db.activar_estado_cuenta()),
+]
+
+def metodos_sin_medir() -> List[str]:
+    """Métodos públicos de SchoolDB que no tienen caso ni están excluidos (p. ej. métodos nuevos)."""
+    medidos = {nombre for nombre, _, _ in CASOS} | set(EXCLUIDOS)
+    return sorted(n for n in dir(SchoolDB) if not n.startswith("_") and callable(getattr(SchoolDB, n)) and n not in medidos)
+
+def _base_generada(alumnos: int, anios: int, semilla: int, carpeta: str) -> str:
+    """Ruta de la escuela sintética de esa escala, generándola solo si no está guardada de una corrida anterior."""
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"escuela_{alumnos}_{anios}_{semilla}_v{VERSION_GENERADOR}.db")
+    if not os.path.exists(ruta):
+        inicio = time.perf_counter()
+        conteo = crear_escuela(ruta + ".tmp", alumnos, anios, semilla)
+        os.replace(ruta + ".tmp", ruta)
+        logging.info(f"Escuela sintética generada en {time.perf_counter() - inicio:.1f} s: {conteo}")
+    return ruta
+
+def medir_escala(alumnos: int, anios: int = 3, semilla: int = 42, repeticiones: int = REPETICIONES,
+                 carpeta_bases: str = CARPETA_BASES, casos: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Mide cada caso sobre una copia de la escuela sintética (las escrituras no alteran la base guardada).
+    La caché de lecturas se desactiva: cada repetición va a la base, como la primera consulta después de un cambio.
+    Retorna {caso: {"min_ms", "mediana_ms", "max_ms"}}.
+    """
+    origen = _base_generada(alumnos, anios, semilla, carpeta_bases)
+    carpeta = tempfile.mkdtemp(prefix="bench_")
+    try:
+        ruta = os.path.join(carpeta, "escuela.db")
+        shutil.copyfile(origen, ruta)
+        db = SchoolDB(ruta)
+        db.TAMANO_CACHE_LECTURAS = 0
+        try:
+            ctx = _contexto(db, carpeta)
+            resultados = {}
+            for nombre, ejecutar, preparar in CASOS:
+                if casos and nombre not in casos:
+                    continue
+                tiempos = []
+                for _ in range(repeticiones):
+                    preparado = preparar(db, ctx) if preparar else None
+                    inicio = time.perf_counter()
+                    ejecutar(db, ctx, preparado)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                resultados[nombre] = {"min_ms": min(tiempos), "mediana_ms": statistics.median(tiempos), "max_ms": max(tiempos)}
+            return resultados
+        finally:
+            db.cerrar()
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+def ejecutar(escalas=ESCALAS, anios: int = 3, semilla: int = 42, repeticiones: int = REPETICIONES,
+             carpeta_bases: str = CARPETA_BASES, casos: Optional[List[str]] = None) -> Dict:
+    """Corre todas las escalas y retorna el documento de resultados (el que se guarda en JSON)."""
+    resultados = {}
+    for alumnos in escalas:
+        logging.info(f"Benchmark con {alumnos} alumnos")
+        resultados[str(alumnos)] = medir_escala(alumnos, anios, semilla, repeticiones, carpeta_bases, casos)
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "anios": anios, "semilla": semilla, "repeticiones": repeticiones, "generador": VERSION_GENERADOR,
+        },
+        "resultados": resultados,
+        "sin_medir": metodos_sin_medir(),
+    }
+
+def comparar(actual: Dict, base: Dict, tolerancia: float = TOLERANCIA, minimo_ms: float = MINIMO_MS) -> List[Dict]:
+    """
+    Compara las medianas con las de la línea base (solo escalas y casos presentes en ambas).
+    Retorna las regresiones: [{escala, caso, base_ms, actual_ms, razon}, ...] de la peor a la menos grave.
+    """
+    regresiones = []
+    for escala, casos in actual["resultados"].items():
+        for caso, medicion in casos.items():
+            referencia = base.get("resultados", {}).get(escala, {}).get(caso)
+            if referencia is None:
+                continue
+            antes, ahora = referencia["mediana_ms"], medicion["mediana_ms"]
+            if ahora > antes * (1 + tolerancia) and ahora - antes > minimo_ms:
+                regresiones.append({"escala": escala, "caso": caso, "base_ms": antes, "actual_ms": ahora,
+                                    "razon": ahora / antes if antes else float("inf")})
+    return sorted(regresiones, key=lambda r: r["razon"], reverse=True)
+
+def fuera_de_presupuesto(documento: Dict, presupuestos: Dict[str, float] = PRESUPUESTOS_MS_POR_ALUMNO) -> List[Dict]:
+    """Casos cuya mediana supera su presupuesto en la escala medida: [{escala, caso, presupuesto_ms, actual_ms}, ...]."""
+    excedidos = []
+    for escala, casos in documento["resultados"].items():
+        for caso, ms_por_alumno in presupuestos.items():
+            if caso in casos and casos[caso]["mediana_ms"] > ms_por_alumno * int(escala):
+                excedidos.append({"escala": escala, "caso": caso, "presupuesto_ms": ms_por_alumno * int(escala),
+                                  "actual_ms": casos[caso]["mediana_ms"]})
+    return excedidos
+
+def _imprimir(documento: Dict):
+    for escala, casos in documento["resultados"].items():
+        print(f"\n== {escala} alumnos ==")
+        for caso, m in sorted(casos.items(), key=lambda c: c[1]["mediana_ms"], reverse=True):
+            print(f"  {caso:<34} {m['mediana_ms']:>10.2f} ms   (min {m['min_ms']:.2f}, max {m['max_ms']:.2f})")
+    if documento["sin_medir"]:
+        print(f"\nMétodos públicos sin caso de benchmark: {', '.join(documento['sin_medir'])}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de SchoolDB sobre escuelas sintéticas")
+    parser.add_argument("--escalas", type=int, nargs="+", default=list(ESCALAS), help="Cantidades de alumnos (ej: 1000 10000 100000)")
+    parser.add_argument("--anios", type=int, default=3, help="Años escolares de pagos")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--casos", nargs="+", help="Medir solo estos casos")
+    parser.add_argument("--carpeta-bases", default=CARPETA_BASES, help="Donde se guardan las escuelas generadas")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    parser.add_argument("--base", help="Línea base JSON contra la cual comparar")
+    parser.add_argument("--guardar-base", help="Guardar estos resultados como línea base")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Aumento relativo tolerado (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    documento = ejecutar(args.escalas, args.anios, args.semilla, args.repeticiones, args.carpeta_bases, args.casos)
+    _imprimir(documento)
+    for ruta in filter(None, (args.salida, args.guardar_base)):
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(documento, archivo, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {ruta}")
+
+    excedidos = fuera_de_presupuesto(documento)
+    for e in excedidos:
+        print(f"\n[{e['escala']}] {e['caso']} tomó {e['actual_ms']:.2f} ms (presupuesto {e['presupuesto_ms']:.0f} ms)")
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as archivo:
+            regresiones = comparar(documento, json.load(archivo), args.tolerancia)
+        if regresiones:
+            print(f"\n{len(regresiones)} regresión(es) respecto de {args.base}:")
+            for r in regresiones:
+                print(f"  [{r['escala']}] {r['caso']:<34} {r['base_ms']:.2f} ms -> {r['actual_ms']:.2f} ms (x{r['razon']:.2f})")
+            return 1
+        print(f"\nSin regresiones respecto de {args.base}")
+    return 1 if excedidos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import os
+import random
+import unicodedata
+from typing import Dict
+
+from backend.database import SchoolDB, MESES
+
+# Cambiar si cambia la forma de generar los datos: invalida las bases guardadas por el benchmark
+VERSION_GENERADOR = 1
+ANIO_FINAL = 2025
+
+NOMBRES = (
+    "José", "María", "Sofía", "Matías", "Martín", "Agustín", "Benjamín", "Tomás", "Lucía", "Ignacio",
+    "Valentina", "Catalina", "Joaquín", "Fernanda", "Andrés", "Inés", "Ramón", "Ángela", "Óscar", "Florencia",
+    "Vicente", "Isidora", "Maximiliano", "Antonella", "Cristóbal", "Josefa", "Raúl", "Belén", "Sebastián", "Trinidad",
+    "Gonzalo", "Mónica", "Héctor", "Verónica", "Iván", "Noemí", "Julián", "Dafne", "Nicolás", "Constanza",
+)
+APELLIDOS = (
+    "González", "Muñoz", "Rodríguez", "Pérez", "Díaz", "Martínez", "Hernández", "López", "Núñez", "Ibáñez",
+    "Fernández", "Álvarez", "Sánchez", "Gómez", "Jiménez", "Peña", "Castañeda", "Araya", "Rojas", "Soto",
+    "Contreras", "Sepúlveda", "Morales", "Reyes", "Gutiérrez", "Vásquez", "Tapia", "Cárdenas", "Espinoza", "Ortúzar",
+)
+GRADOS = tuple(f"{n}° Básico" for n in range(1, 9)) + tuple(f"{n}° Medio" for n in range(1, 5))
+MENSUALIDAD = {"Básico": 45000, "Medio": 55000}
+# Hijos por apoderado y su probabilidad
+HIJOS = ((1, 0.60), (2, 0.28), (3, 0.09), (4, 0.03))
+# Perfil de pago de cada alumno: (nombre, probabilidad, probabilidad de saltarse un mes, deja de pagar a mitad de año)
+PERFILES_PAGO = (("puntual", 0.70, 0.02, False), ("irregular", 0.22, 0.20, False), ("moroso", 0.08, 0.50, True))
+PROPORCION_RETIRADOS = 0.03
+
+def _sin_tildes(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+def _elegir(rng: random.Random, opciones):
+    """Elige de [(valor, probabilidad, ...), ...] según las probabilidades."""
+    return rng.choices(opciones, weights=[o[1] for o in opciones])[0]
+
+def generar_escuela(db: SchoolDB, alumnos: int, anios: int = 3, semilla: int = 42, anio_final: int = ANIO_FINAL,
+                    inicio_clases_idx: int = 2) -> Dict[str, int]:
+    """
+    Llena la base con una escuela realista y reproducible (misma semilla = mismos datos): apoderados con uno a
+    cuatro hijos del mismo apellido, nombres con tildes, todos los grados, pagos de `anios` años escolares hasta
+    anio_final (de inicio_clases_idx a Diciembre) con meses saltados según el perfil de cada alumno, y algunos
+    alumnos retirados. Todo en una transacción, pasando por los triggers (búsqueda, resúmenes, diario).
+    Retorna la cantidad de filas generadas por tabla.
+    """
+    rng = random.Random(semilla)
+    apoderados, estudiantes, pagos = [], [], []
+    anios_escolares = range(anio_final - anios + 1, anio_final + 1)
+
+    while len(estudiantes) < alumnos:
+        id_apo = len(apoderados) + 1
+        apellido = rng.choice(APELLIDOS)
+        nombre_apo = f"{rng.choice(NOMBRES)} {apellido} {rng.choice(APELLIDOS)}"
+        telefono = f"+569{rng.randrange(10**7, 10**8)}"
+        email = f"{_sin_tildes(nombre_apo).lower().replace(' ', '.')}{id_apo}@correo.cl" if rng.random() < 0.8 else ""
+        apoderados.append((id_apo, nombre_apo, telefono, email, f"{anios_escolares[0]}-02-{rng.randint(1, 28):02d} 10:00:00"))
+
+        for _ in range(min(_elegir(rng, HIJOS)[0], alumnos - len(estudiantes))):
+            id_alu = len(estudiantes) + 1
+            grado = rng.choice(GRADOS)
+            estado = "retirado" if rng.random() < PROPORCION_RETIRADOS else "activo"
+            estudiantes.append((id_alu, f"{rng.choice(NOMBRES)} {apellido}", grado, id_apo,
+                                f"{anios_escolares[0]}-02-{rng.randint(1, 28):02d} 10:00:00", estado))
+
+            _, _, salto, abandona = _elegir(rng, PERFILES_PAGO)
+            monto = MENSUALIDAD["Medio" if "Medio" in grado else "Básico"]
+            for anio in anios_escolares:
+                ultimo_mes = rng.randint(inicio_clases_idx, 11) if abandona else 11
+                for mes_idx in range(inicio_clases_idx, ultimo_mes + 1):
+                    if rng.random() < salto:
+                        continue
+                    fecha = f"{anio}-{mes_idx + 1:02d}-{rng.randint(1, 15):02d} {rng.randint(8, 19):02d}:{rng.randint(0, 59):02d}:00"
+                    pagos.append((id_alu, monto, MESES[mes_idx], fecha, anio, mes_idx))
+
+    with db._transaccion() as cursor:
+        cursor.executemany("INSERT INTO apoderados (id, nombre, telefono, email, fecha_registro) VALUES (?, ?, ?, ?, ?)", apoderados)
+        cursor.executemany("INSERT INTO estudiantes (id, nombre, grado, apoderado_id, fecha_registro, estado) VALUES (?, ?, ?, ?, ?, ?)", estudiantes)
+        cursor.executemany("INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago, anio, mes_idx) VALUES (?, ?, ?, 1, ?, ?, ?)", pagos)
+        cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('inicio_clases_idx', ?)", (str(inicio_clases_idx),))
+        cursor.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('nombre_escuela', ?)", (f"Escuela Sintética {semilla}",))
+    return {"apoderados": len(apoderados), "estudiantes": len(estudiantes), "mensualidades": len(pagos)}
+
+def crear_escuela(ruta: str, alumnos: int, anios: int = 3, semilla: int = 42, anio_final: int = ANIO_FINAL) -> Dict[str, int]:
+    """Crea (reemplazando si existe) una base nueva en ruta con generar_escuela y la deja cerrada y compacta."""
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+    db = SchoolDB(ruta)
+    try:
+        conteo = generar_escuela(db, alumnos, anios, semilla, anio_final)
+        # Las estadísticas del planificador, como las dejaría el mantenimiento en una base en uso
+        db.ejecutar_mantenimiento("analyze")
+        db.checkpoint()
+    finally:
+        db.cerrar()
+    return conteo
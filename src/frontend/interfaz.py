@@ -1,20 +1,138 @@
 import customtkinter as ctk
 from tkinter import ttk, messagebox
 import tkinter as tk
+from concurrent.futures import Future
 from datetime import datetime
+import importlib.util
+import os
+import logging
 
-# Intentar importar matplotlib para gráficos
-try:
-    from matplotlib.figure import Figure
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    HAS_MATPLOTLIB = True
-except ImportError:
-    HAS_MATPLOTLIB = False
+# matplotlib (con el backend TkAgg) se importa recién al dibujar el primer gráfico, con la ventana ya visible;
+# al iniciar solo se verifica que esté instalada
+HAS_MATPLOTLIB = importlib.util.find_spec("matplotlib") is not None
 
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
+def ordenar_por_valor(filas, reverse=False):
+    """Ordena pares (valor mostrado, fila): como números si todos lo son (con $ y separadores de miles), si no como texto."""
+    try:
+        return sorted(filas, key=lambda t: float(t[0].replace("$", "").replace(",", "")), reverse=reverse)
+    except ValueError:
+        return sorted(filas, key=lambda t: t[0], reverse=reverse)
+
+class TablaVirtual(ctk.CTkFrame):
+    """
+    Treeview con scroll que solo materializa las filas a medida que se vuelven visibles.
+    La fuente puede ser una lista ya calculada o una función obtener_pagina(ultima_fila, limite)
+    que trae el siguiente bloque desde la base de datos (paginación por clave). Si obtener_pagina
+    retorna un Future, las filas se agregan cuando llega el resultado, sin bloquear la interfaz.
+    """
+    TAMANO_BLOQUE = 200
+    ESPERA_PAGINA = 20  # ms entre revisiones de una página pedida al hilo de la base
+
+    def __init__(self, master, columns, formatear_fila=None, **tree_kwargs):
+        super().__init__(master, fg_color="transparent")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", **tree_kwargs)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._al_desplazar)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self._formatear_fila = formatear_fila or (lambda fila: fila)
+        self._datos = []
+        self._posicion = 0
+        self._obtener_pagina = None
+        self._ultima_fila = None
+        self._agotado = True
+        self._carga_pendiente = False
+        self._version = 0  # Descarta páginas que llegan después de recargar la tabla
+
+    def cargar(self, datos=None, obtener_pagina=None):
+        """Reemplaza el contenido de la tabla y materializa solo el primer bloque."""
+        self._version += 1
+        self.tree.delete(*self.tree.get_children())
+        self._datos = list(datos) if datos is not None else []
+        self._posicion = 0
+        self._obtener_pagina = obtener_pagina
+        self._ultima_fila = None
+        self._agotado = False
+        self._cargar_bloque()
+
+    def _cargar_bloque(self):
+        self._carga_pendiente = False
+        if self._agotado:
+            return
+        if self._obtener_pagina:
+            filas = self._obtener_pagina(self._ultima_fila, self.TAMANO_BLOQUE)
+            if isinstance(filas, Future):
+                # No pedir otro bloque hasta que llegue este; se espera con after() para no tocar Tk desde otro hilo
+                self._carga_pendiente = True
+                self._recibir_pagina(filas, self._version)
+                return
+            self._agotado = len(filas) < self.TAMANO_BLOQUE
+        else:
+            filas = self._datos[self._posicion:self._posicion + self.TAMANO_BLOQUE]
+            self._posicion += len(filas)
+            self._agotado = self._posicion >= len(self._datos)
+        self._agregar_filas(filas)
+
+    def _recibir_pagina(self, futuro, version):
+        if version != self._version:
+            return
+        if not futuro.done():
+            self.after(self.ESPERA_PAGINA, self._recibir_pagina, futuro, version)
+            return
+        self._carga_pendiente = False
+        try:
+            filas = futuro.result()
+        except Exception as e:
+            logging.error(f"Error cargando página de la tabla: {e}")
+            self._agotado = True
+            return
+        self._agotado = len(filas) < self.TAMANO_BLOQUE
+        self._agregar_filas(filas)
+
+    def _agregar_filas(self, filas):
+        if filas:
+            self._ultima_fila = filas[-1]
+        for fila in filas:
+            self.tree.insert("", "end", values=self._formatear_fila(fila))
+
+    def ordenar(self, col, reverse):
+        """
+        Ordena todas las filas por la columna, no solo las materializadas. Con paginación solo se puede una vez
+        traídas todas las páginas (las siguientes llegarían en el orden de la clave): retorna False si faltan.
+        """
+        if self._obtener_pagina:
+            if not self._agotado:
+                return False
+            filas = [(self.tree.set(k, col), k) for k in self.tree.get_children('')]
+            for index, (_, k) in enumerate(ordenar_por_valor(filas, reverse)):
+                self.tree.move(k, '', index)
+            return True
+        i = list(self.tree["columns"]).index(col)
+        filas = [(str(self._formatear_fila(fila)[i]), fila) for fila in self._datos]
+        self.cargar([fila for _, fila in ordenar_por_valor(filas, reverse)])
+        return True
+
+    def _al_desplazar(self, inicio, fin):
+        self.scrollbar.set(inicio, fin)
+        # Al acercarse al final de lo materializado, traer el siguiente bloque
+        if float(fin) > 0.9 and not self._agotado and not self._carga_pendiente:
+            self._carga_pendiente = True
+            self.after_idle(self._cargar_bloque)
+
 class AppEscolar(ctk.CTk):
+    PESTANA_INICIO = "Inicio"
+    PESTANA_ALUMNOS = "Inscripción y Alumnos"
+    PESTANA_APODERADOS = "Apoderados"
+    PESTANA_PAGOS = "Mensualidades"
+    PESTANA_CONFIG = "Configuración"
+
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
@@ -26,29 +144,66 @@ class AppEscolar(ctk.CTk):
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
 
-        self.tab_view = ctk.CTkTabview(self)
+        self.tab_view = ctk.CTkTabview(self, command=self.cargar_pestana_visible)
         self.tab_view.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
 
         # Barra de estado (Footer)
         self.lbl_estado = ctk.CTkLabel(self, text="Listo", anchor="w", text_color="gray")
         self.lbl_estado.grid(row=1, column=0, sticky="ew", padx=20, pady=(0, 10))
         self._after_id_estado = None
+        # Advertencia persistente (p. ej. integridad de la base): reemplaza al "Listo" mientras esté vigente
+        self._advertencia_estado = None
 
-        self.tab_inicio = self.tab_view.add("Inicio")
-        self.tab_inscripcion = self.tab_view.add("Inscripción y Alumnos")
-        self.tab_apoderados = self.tab_view.add("Apoderados")
-        self.tab_pagos = self.tab_view.add("Mensualidades")
-        self.tab_config = self.tab_view.add("Configuración")
+        self.tab_inicio = self.tab_view.add(self.PESTANA_INICIO)
+        self.tab_inscripcion = self.tab_view.add(self.PESTANA_ALUMNOS)
+        self.tab_apoderados = self.tab_view.add(self.PESTANA_APODERADOS)
+        self.tab_pagos = self.tab_view.add(self.PESTANA_PAGOS)
+        self.tab_config = self.tab_view.add(self.PESTANA_CONFIG)
 
         self.mapa_apoderados = {}
         self.mapa_estudiantes_pago = {}
         self.ventana_morosos = None
 
-        self.setup_ui_inicio()
-        self.setup_ui_apoderados()
-        self.setup_ui_inscripcion()
-        self.setup_ui_pagos()
-        self.setup_ui_configuracion()
+        # Cada pestaña se construye la primera vez que se muestra. Sus datos se cargan al mostrarla si nunca se
+        # cargaron o si cambiaron mientras estaba oculta (el controlador la marca como desactualizada)
+        self._pendientes_construir = {
+            self.PESTANA_INICIO: self.setup_ui_inicio,
+            self.PESTANA_ALUMNOS: self.setup_ui_inscripcion,
+            self.PESTANA_APODERADOS: self.setup_ui_apoderados,
+            self.PESTANA_PAGOS: self.setup_ui_pagos,
+            self.PESTANA_CONFIG: self.setup_ui_configuracion,
+        }
+        self._desactualizadas = set(self._pendientes_construir)
+        self._construir_pestana(self.tab_view.get())
+
+    # --- Pestañas ---
+
+    def _construir_pestana(self, pestana):
+        construir = self._pendientes_construir.pop(pestana, None)
+        if construir:
+            construir()
+
+    def pestana_construida(self, pestana):
+        return pestana not in self._pendientes_construir
+
+    def pestana_visible(self, pestana):
+        return self.tab_view.get() == pestana
+
+    def marcar_desactualizada(self, pestana):
+        self._desactualizadas.add(pestana)
+
+    def cargar_pestana_visible(self):
+        """Al mostrarse una pestaña: se construye si hace falta y se recargan sus datos si están desactualizados."""
+        pestana = self.tab_view.get()
+        self._construir_pestana(pestana)
+        if pestana in self._desactualizadas:
+            self._desactualizadas.discard(pestana)
+            self.controller.refrescar_pestana(pestana)
+
+    def mostrar_pestana(self, pestana):
+        # CTkTabview.set() no llama al command de la pestaña (solo lo hace un clic del usuario)
+        self.tab_view.set(pestana)
+        self.cargar_pestana_visible()
 
     def mostrar_mensaje_estado(self, mensaje, es_error=False):
         # Cancelar el temporizador anterior si existe para evitar superposiciones
@@ -59,23 +214,36 @@ class AppEscolar(ctk.CTk):
         color = "red" if es_error else "green"
         self.lbl_estado.configure(text=mensaje, text_color=color)
         # Restaurar mensaje por defecto "Listo" después de 4 segundos (4000 ms)
-        self._after_id_estado = self.after(4000, lambda: self.lbl_estado.configure(text="Listo", text_color="gray"))
+        self._after_id_estado = self.after(4000, self._restaurar_estado)
+
+    def _restaurar_estado(self):
+        self._after_id_estado = None
+        if self._advertencia_estado:
+            self.lbl_estado.configure(text=self._advertencia_estado, text_color="#D35B58")
+        else:
+            self.lbl_estado.configure(text="Listo", text_color="gray")
+
+    def mostrar_advertencia_estado(self, mensaje):
+        """Deja una advertencia fija en la barra de estado (None la quita). Los mensajes pasajeros se muestran encima."""
+        self._advertencia_estado = mensaje
+        if not self._after_id_estado:
+            self._restaurar_estado()
 
     def ordenar_columnas(self, tree, col, reverse):
         l = [(tree.set(k, col), k) for k in tree.get_children('')]
-        
-        # Intentar ordenar como número (manejando símbolos de moneda)
-        try:
-            l.sort(key=lambda t: float(t[0].replace("$", "").replace(",", "")), reverse=reverse)
-        except ValueError:
-            l.sort(reverse=reverse)
-
-        for index, (val, k) in enumerate(l):
+        for index, (val, k) in enumerate(ordenar_por_valor(l, reverse)):
             tree.move(k, '', index)
 
         # Alternar orden para el próximo clic
         tree.heading(col, command=lambda: self.ordenar_columnas(tree, col, not reverse))
 
+    def ordenar_tabla(self, tabla, col, reverse):
+        """Como ordenar_columnas, para una TablaVirtual: ordena todas sus filas, no solo las visibles."""
+        if not tabla.ordenar(col, reverse):
+            self.mostrar_mensaje_estado("Desplácese hasta el final de la lista para poder ordenarla por columna", es_error=True)
+            return
+        tabla.tree.heading(col, command=lambda: self.ordenar_tabla(tabla, col, not reverse))
+
     def setup_ui_inicio(self):
         self.tab_inicio.grid_columnconfigure((0, 1), weight=1)
         
@@ -102,8 +270,8 @@ class AppEscolar(ctk.CTk):
         frame_acciones.grid(row=2, column=0, columnspan=2, pady=20)
         
         ctk.CTkLabel(frame_acciones, text="Accesos Rápidos:", font=("Arial", 14, "bold")).pack(side="left", padx=10)
-        ctk.CTkButton(frame_acciones, text="+ Nuevo Alumno", command=lambda: self.tab_view.set("Inscripción y Alumnos")).pack(side="left", padx=10)
-        ctk.CTkButton(frame_acciones, text="+ Registrar Pago", command=lambda: self.tab_view.set("Mensualidades")).pack(side="left", padx=10)
+        ctk.CTkButton(frame_acciones, text="+ Nuevo Alumno", command=lambda: self.mostrar_pestana(self.PESTANA_ALUMNOS)).pack(side="left", padx=10)
+        ctk.CTkButton(frame_acciones, text="+ Registrar Pago", command=lambda: self.mostrar_pestana(self.PESTANA_PAGOS)).pack(side="left", padx=10)
         
         ctk.CTkLabel(frame_acciones, text="|", text_color="gray").pack(side="left", padx=10)
         
@@ -127,9 +295,15 @@ class AppEscolar(ctk.CTk):
         self.frame_grafico.grid(row=4, column=0, columnspan=2, pady=20, sticky="nsew")
         self.tab_inicio.grid_rowconfigure(4, weight=1)
         
+        self._datos_grafico = ([], [], datetime.now().year)
         self.actualizar_grafico_alumnos()
 
-    def actualizar_grafico_alumnos(self):
+    def actualizar_grafico_alumnos(self, por_grado=None, por_mes=None, anio=None):
+        """Dibuja alumnos por grado e ingresos por mes con los datos que entrega el controlador (sin consultar la base)."""
+        if por_grado is not None:
+            self._datos_grafico = (por_grado, por_mes or [], anio or datetime.now().year)
+        datos, por_mes, anio = self._datos_grafico
+
         # Limpiar gráfico anterior si existe
         for widget in self.frame_grafico.winfo_children():
             widget.destroy()
@@ -143,19 +317,29 @@ class AppEscolar(ctk.CTk):
             ctk.CTkLabel(self.frame_grafico, text="Instale 'matplotlib' para ver gráficos estadísticos\n(pip install matplotlib)", text_color="gray").pack(expand=True)
             return
 
-        datos = self.controller.obtener_estadisticas_grado()
         if not datos:
             ctk.CTkLabel(self.frame_grafico, text="No hay datos suficientes para generar el gráfico.", text_color="gray").pack(expand=True)
             return
 
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
         grados = [d[0] for d in datos]
         cantidades = [d[1] for d in datos]
 
-        fig = Figure(figsize=(6, 4), dpi=100)
-        ax = fig.add_subplot(111)
+        fig = Figure(figsize=(10, 4), dpi=100)
+        ax = fig.add_subplot(121)
         ax.bar(grados, cantidades, color="#3B8ED0")
         ax.set_title("Distribución de Alumnos por Grado")
         ax.set_ylabel("Cantidad de Alumnos")
+
+        # Tendencia de ingresos del año (los meses sin pagos quedan en 0)
+        ingresos_mes = dict((mes_idx, total) for mes_idx, total, _ in por_mes)
+        ax_ingresos = fig.add_subplot(122)
+        ax_ingresos.plot([m[:3] for m in self.controller.meses], [ingresos_mes.get(i, 0) for i in range(12)], marker="o", color="#2CC985")
+        ax_ingresos.set_title(f"Ingresos por Mes {anio}")
+        ax_ingresos.set_ylabel("Monto")
+        fig.tight_layout()
         
         canvas = FigureCanvasTkAgg(fig, master=self.frame_grafico)
         canvas.draw()
@@ -223,6 +407,36 @@ class AppEscolar(ctk.CTk):
         frame_escuelas.pack()
         ctk.CTkButton(frame_escuelas, text="📂 Abrir Otra Escuela", command=self.controller.cargar_escuela).pack(side="left", padx=5)
         ctk.CTkButton(frame_escuelas, text="➕ Crear Nueva Escuela", fg_color="green", command=self.controller.nueva_escuela).pack(side="left", padx=5)
+        ctk.CTkButton(frame, text="📊 Reporte Consolidado de Escuelas", command=self.controller.generar_reporte_consolidado).pack(pady=(10, 0))
+
+        # Sincronización entre equipos de la misma escuela
+        ctk.CTkLabel(frame, text="Sincronización entre Equipos", font=("Arial", 16, "bold")).pack(pady=(20, 10))
+        self.entry_sync_url = ctk.CTkEntry(frame, width=300, placeholder_text="Servidor (ej: http://192.168.1.10:8765)")
+        self.entry_sync_url.pack(pady=5)
+        self.entry_sync_clave = ctk.CTkEntry(frame, width=300, placeholder_text="Clave compartida", show="*")
+        self.entry_sync_clave.pack(pady=5)
+        self.switch_sync_servidor = ctk.CTkSwitch(frame, text="Este equipo es el servidor")
+        self.switch_sync_servidor.pack(pady=5)
+        self.actualizar_ui_sync(getattr(self.controller, 'sync_url', ""), getattr(self.controller, 'sync_clave', ""),
+                                getattr(self.controller, 'sync_es_servidor', False))
+        frame_sync = ctk.CTkFrame(frame, fg_color="transparent")
+        frame_sync.pack()
+        ctk.CTkButton(frame_sync, text="Guardar", command=self.solicitar_guardar_sync).pack(side="left", padx=5)
+        ctk.CTkButton(frame_sync, text="🔄 Sincronizar Ahora", command=self.controller.sincronizar_ahora).pack(side="left", padx=5)
+
+        # Diagnóstico: medición de consultas y registro de consultas lentas
+        ctk.CTkLabel(frame, text="Diagnóstico", font=("Arial", 16, "bold")).pack(pady=(20, 10))
+        self.switch_diagnostico = ctk.CTkSwitch(frame, text="Medir consultas a la base de datos")
+        self.switch_diagnostico.pack(pady=5)
+        ctk.CTkLabel(frame, text="Registrar como lentas las consultas de más de (ms):").pack(pady=5)
+        self.entry_diagnostico_umbral = ctk.CTkEntry(frame, width=100)
+        self.entry_diagnostico_umbral.pack(pady=5)
+        self.actualizar_ui_diagnostico(getattr(self.controller, 'diagnostico_activo', False), getattr(self.controller, 'diagnostico_umbral_ms', 100))
+        frame_diagnostico = ctk.CTkFrame(frame, fg_color="transparent")
+        frame_diagnostico.pack()
+        ctk.CTkButton(frame_diagnostico, text="Guardar", command=self.solicitar_guardar_diagnostico).pack(side="left", padx=5)
+        ctk.CTkButton(frame_diagnostico, text="📈 Ver Estadísticas", command=self.controller.mostrar_diagnostico).pack(side="left", padx=5)
+        ctk.CTkButton(frame_diagnostico, text="Reiniciar", command=self.controller.reiniciar_diagnostico).pack(side="left", padx=5)
 
         # Ayuda y Documentación
         ctk.CTkLabel(frame, text="Ayuda y Documentación", font=("Arial", 16, "bold")).pack(pady=(20, 10))
@@ -231,8 +445,16 @@ class AppEscolar(ctk.CTk):
         ctk.CTkButton(frame_ayuda, text="📖 Manual de Usuario", command=lambda: self.abrir_visor_documentacion("Manual de Usuario", "MANUAL_USUARIO.md")).pack(side="left", padx=5)
         ctk.CTkButton(frame_ayuda, text="ℹ️ Acerca de (Léeme)", command=lambda: self.abrir_visor_documentacion("Acerca de", "README.md")).pack(side="left", padx=5)
 
+        # Importación Masiva
+        ctk.CTkLabel(frame, text="Importación Masiva", font=("Arial", 16, "bold")).pack(pady=(20, 10))
+        ctk.CTkButton(frame, text="📥 Importar desde CSV", command=self.abrir_ventana_importacion).pack(pady=5)
+        ctk.CTkButton(frame, text="📤 Exportar Cambios desde la Última Exportación", command=self.controller.exportar_cambios_csv).pack(pady=5)
+
         ctk.CTkLabel(frame, text="Mantenimiento", font=("Arial", 16, "bold")).pack(pady=(40, 10))
         ctk.CTkButton(frame, text="Crear Respaldo de Base de Datos (Backup)", fg_color="#E0A800", text_color="black", command=self.controller.realizar_backup).pack(pady=10)
+        ctk.CTkButton(frame, text="Restaurar Copia Automática...", command=self.abrir_ventana_restaurar).pack(pady=5)
+        ctk.CTkButton(frame, text="📦 Cerrar Año Escolar...", command=self.controller.cerrar_anio_escolar).pack(pady=5)
+        ctk.CTkButton(frame, text="🎓 Promoción de Fin de Año...", command=self.controller.abrir_promocion_anual).pack(pady=5)
 
         # Zona de Peligro
         ctk.CTkLabel(frame, text="Zona de Peligro (Borrado Masivo)", font=("Arial", 14, "bold"), text_color="#D35B58").pack(pady=(20, 10))
@@ -257,10 +479,107 @@ class AppEscolar(ctk.CTk):
         textbox.insert("0.0", contenido)
         textbox.configure(state="disabled") # Solo lectura
 
+    def abrir_ventana_importacion(self):
+        tipos = {
+            "Apoderados": ("apoderados", "Columnas: nombre, telefono, email"),
+            "Alumnos": ("estudiantes", "Columnas: nombre, grado, apoderado, telefono_apoderado\n(el apoderado se busca por teléfono o por nombre)"),
+            "Mensualidades": ("mensualidades", "Columnas: alumno, grado, mes, monto, fecha_pago (opcional)"),
+        }
+
+        top = ctk.CTkToplevel(self)
+        top.title("Importar desde CSV")
+        top.geometry("450x300")
+        top.grab_set()
+
+        ctk.CTkLabel(top, text="Tipo de datos a importar:").pack(pady=(20, 5))
+        lbl_columnas = ctk.CTkLabel(top, text=tipos["Apoderados"][1], text_color="gray")
+        combo_tipo = ctk.CTkOptionMenu(top, values=list(tipos.keys()), command=lambda t: lbl_columnas.configure(text=tipos[t][1]))
+        combo_tipo.pack(pady=5)
+        lbl_columnas.pack(pady=10)
+        ctk.CTkLabel(top, text="Las filas con errores se guardan en '<archivo>_rechazados.csv'.", text_color="gray").pack(pady=5)
+
+        ctk.CTkButton(top, text="Seleccionar Archivo e Importar", command=lambda: self.controller.importar_csv(tipos[combo_tipo.get()][0], top)).pack(pady=20)
+
+    def abrir_ventana_restaurar(self):
+        top = ctk.CTkToplevel(self)
+        top.title("Restaurar Copia de Seguridad")
+        top.geometry("700x400")
+        top.grab_set()
+
+        ctk.CTkLabel(top, text="Copias automáticas guardadas (comprimidas):").pack(pady=(15, 5))
+        columns = ("Fecha", "Base de Datos", "Tamaño")
+        tree = ttk.Treeview(top, columns=columns, show="headings", height=12)
+        for col in columns:
+            tree.heading(col, text=col)
+        tree.column("Fecha", width=160)
+        tree.column("Base de Datos", width=360)
+        tree.column("Tamaño", width=120)
+        tree.pack(fill="both", expand=True, padx=10, pady=5)
+
+        backups = {}
+        for b in self.controller.obtener_backups():
+            item = tree.insert("", "end", values=(b["fecha"].replace("T", " "), os.path.basename(b["db"]), f"{b['tamano_comprimido'] / 1024:.0f} KB"))
+            backups[item] = b["sha256"]
+
+        def restaurar():
+            seleccion = tree.selection()
+            if not seleccion:
+                messagebox.showwarning("Aviso", "Seleccione una copia de la lista")
+                return
+            self.controller.restaurar_backup(backups[seleccion[0]], top)
+
+        ctk.CTkButton(top, text="Restaurar en un Archivo Nuevo", command=restaurar).pack(pady=10)
+
+    def abrir_ventana_promocion(self, progresion, grados, anio_archivo):
+        """
+        Paso de año: para cada grado con alumnos activos se indica a qué grado pasa (vacío = sin cambio) o si egresa.
+        anio_archivo: año anterior aún no archivado, que se puede archivar en la misma operación (None si ya lo está).
+        """
+        top = ctk.CTkToplevel(self)
+        top.title("Promoción de Fin de Año")
+        top.geometry("600x550")
+        top.grab_set()
+
+        if not grados:
+            ctk.CTkLabel(top, text="No hay alumnos activos para promover.").pack(pady=20)
+            return
+        ctk.CTkLabel(top, text="Grado siguiente de cada curso (vacío = se queda en el mismo grado):").pack(pady=(15, 5))
+
+        scroll = ctk.CTkScrollableFrame(top)
+        scroll.pack(fill="both", expand=True, padx=10, pady=5)
+        filas = {}  # {grado: (entry_siguiente, check_egresa)}
+        for i, (grado, alumnos) in enumerate(grados):
+            ctk.CTkLabel(scroll, text=f"{grado} ({alumnos})", anchor="w").grid(row=i, column=0, padx=5, pady=3, sticky="w")
+            entry = ctk.CTkEntry(scroll, width=160)
+            siguiente = progresion.get(grado, "")
+            if siguiente:
+                entry.insert(0, siguiente)
+            entry.grid(row=i, column=1, padx=5, pady=3)
+            check = ctk.CTkCheckBox(scroll, text="Egresa")
+            check.configure(command=lambda e=entry, c=check: e.configure(state="disabled" if c.get() else "normal"))
+            check.grid(row=i, column=2, padx=5, pady=3)
+            if siguiente is None:
+                check.select()
+                entry.configure(state="disabled")
+            filas[grado] = (entry, check)
+
+        check_archivar = None
+        if anio_archivo:
+            check_archivar = ctk.CTkCheckBox(top, text=f"Archivar además los pagos de {anio_archivo} (Cerrar Año Escolar)")
+            check_archivar.pack(pady=5)
+
+        def promover():
+            mapa = {grado: None if check.get() else entry.get().strip() for grado, (entry, check) in filas.items()}
+            self.controller.promover_grados(mapa, bool(check_archivar and check_archivar.get()), top)
+
+        ctk.CTkButton(top, text="Vista Previa y Promover", command=promover).pack(pady=10)
+
     def cambiar_tema(self, new_mode):
         ctk.set_appearance_mode(new_mode)
 
     def actualizar_ui_configuracion(self, nombre_escuela, mostrar_grafico, admin_tel, dia_cobranza, inicio_clases_idx):
+        if not self.pestana_construida(self.PESTANA_CONFIG):
+            return  # Al construirse, la pestaña toma los valores actuales del controlador
         self.entry_nombre_escuela.delete(0, 'end')
         self.entry_nombre_escuela.insert(0, nombre_escuela)
         self.entry_admin_tel.delete(0, 'end')
@@ -276,6 +595,36 @@ class AppEscolar(ctk.CTk):
         else:
             self.switch_grafico.deselect()
 
+    def actualizar_ui_sync(self, url, clave, es_servidor):
+        if not self.pestana_construida(self.PESTANA_CONFIG):
+            return
+        self.entry_sync_url.delete(0, 'end')
+        if url:
+            self.entry_sync_url.insert(0, url)
+        self.entry_sync_clave.delete(0, 'end')
+        if clave:
+            self.entry_sync_clave.insert(0, clave)
+        if es_servidor:
+            self.switch_sync_servidor.select()
+        else:
+            self.switch_sync_servidor.deselect()
+
+    def solicitar_guardar_sync(self):
+        self.controller.guardar_config_sync(self.entry_sync_url.get(), self.entry_sync_clave.get(), self.switch_sync_servidor.get())
+
+    def actualizar_ui_diagnostico(self, activo, umbral_ms):
+        if not self.pestana_construida(self.PESTANA_CONFIG):
+            return
+        if activo:
+            self.switch_diagnostico.select()
+        else:
+            self.switch_diagnostico.deselect()
+        self.entry_diagnostico_umbral.delete(0, 'end')
+        self.entry_diagnostico_umbral.insert(0, f"{umbral_ms:g}")
+
+    def solicitar_guardar_diagnostico(self):
+        self.controller.guardar_config_diagnostico(self.switch_diagnostico.get(), self.entry_diagnostico_umbral.get())
+
     def setup_ui_apoderados(self):
         frame = self.tab_apoderados
         frame.grid_columnconfigure(1, weight=1)
@@ -300,16 +649,32 @@ class AppEscolar(ctk.CTk):
         ctk.CTkButton(panel_form, text="Guardar Apoderado", command=self.solicitar_guardar_apoderado).pack(pady=20)
         ctk.CTkButton(panel_form, text="Eliminar Seleccionado", fg_color="red", command=self.solicitar_eliminar_apoderado).pack(pady=5)
 
-        # Panel Derecho: Tabla
+        # Panel Derecho (Buscador + Tabla)
+        panel_derecho = ctk.CTkFrame(frame, fg_color="transparent")
+        panel_derecho.grid(row=0, column=1, sticky="nsew", padx=10, pady=10)
+        panel_derecho.grid_rowconfigure(1, weight=1)
+        panel_derecho.grid_columnconfigure(0, weight=1)
+
+        # Buscador
+        frame_busqueda = ctk.CTkFrame(panel_derecho, fg_color="transparent")
+        frame_busqueda.grid(row=0, column=0, sticky="ew", pady=(0, 10))
+
+        self.entry_busqueda_apoderados = ctk.CTkEntry(frame_busqueda, placeholder_text="Buscar apoderado por nombre, teléfono o email...")
+        self.entry_busqueda_apoderados.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.entry_busqueda_apoderados.bind("<Return>", lambda event: self.solicitar_busqueda_apoderados())
+
+        ctk.CTkButton(frame_busqueda, text="Buscar", width=100, command=self.solicitar_busqueda_apoderados).pack(side="right")
+
+        # Tabla
         style = ttk.Style()
         columns = ("ID", "Nombre", "Teléfono", "Email")
-        self.tree_apoderados = ttk.Treeview(frame, columns=columns, show="headings")
+        self.tree_apoderados = ttk.Treeview(panel_derecho, columns=columns, show="headings")
         for col in columns:
             self.tree_apoderados.heading(col, text=col)
             self.tree_apoderados.heading(col, command=lambda c=col: self.ordenar_columnas(self.tree_apoderados, c, False))
             self.tree_apoderados.column(col, width=120)
         
-        self.tree_apoderados.grid(row=0, column=1, sticky="nsew", padx=10, pady=10)
+        self.tree_apoderados.grid(row=1, column=0, sticky="nsew")
         self.tree_apoderados.bind("<Double-1>", self.on_double_click_apoderado)
 
     def on_double_click_apoderado(self, event):
@@ -359,6 +724,10 @@ class AppEscolar(ctk.CTk):
             id_apo = item['values'][0]
             self.controller.eliminar_apoderado(id_apo)
 
+    def solicitar_busqueda_apoderados(self):
+        termino = self.entry_busqueda_apoderados.get()
+        self.controller.buscar_apoderados(termino)
+
     def solicitar_guardar_apoderado(self):
         nombre = self.entry_apo_nombre.get()
         tel = self.entry_apo_tel.get()
@@ -418,14 +787,15 @@ class AppEscolar(ctk.CTk):
         style.theme_use("clam")
         
         columns = ("ID", "Nombre", "Grado", "Apoderado", "Contacto")
-        self.tree_alumnos = ttk.Treeview(panel_derecho, columns=columns, show="headings")
+        self.tabla_alumnos = TablaVirtual(panel_derecho, columns, formatear_fila=self._fila_alumno_ui)
+        self.tree_alumnos = self.tabla_alumnos.tree
         
         for col in columns:
             self.tree_alumnos.heading(col, text=col)
-            self.tree_alumnos.heading(col, command=lambda c=col: self.ordenar_columnas(self.tree_alumnos, c, False))
+            self.tree_alumnos.heading(col, command=lambda c=col: self.ordenar_tabla(self.tabla_alumnos, c, False))
             self.tree_alumnos.column(col, width=100)
         
-        self.tree_alumnos.grid(row=1, column=0, sticky="nsew")
+        self.tabla_alumnos.grid(row=1, column=0, sticky="nsew")
         self.tree_alumnos.bind("<Double-1>", self.on_double_click_alumno)
         
         self.crear_menu_alumnos()
@@ -441,6 +811,7 @@ class AppEscolar(ctk.CTk):
     def crear_menu_alumnos(self):
         self.menu_alumnos = tk.Menu(self, tearoff=0)
         self.menu_alumnos.add_command(label="📱 Enviar Recordatorio WhatsApp", command=self.accion_whatsapp_alumno)
+        self.menu_alumnos.add_command(label="🚪 Marcar como Retirado", command=self.accion_retirar_alumno)
 
     def mostrar_menu_alumnos(self, event):
         try:
@@ -455,6 +826,11 @@ class AppEscolar(ctk.CTk):
             id_alumno = item['values'][0]
             self.controller.enviar_recordatorio_pago(id_alumno)
 
+    def accion_retirar_alumno(self):
+        selected = self.tree_alumnos.selection()
+        if selected:
+            self.controller.marcar_alumno_retirado(self.tree_alumnos.item(selected[0])['values'][0])
+
     def abrir_ventana_edicion_alumno(self, datos_alumno):
         # datos_alumno viene de la DB: (id, nombre, grado, apoderado_id, fecha_registro)
         id_alu, nombre, grado, apo_id, *_ = datos_alumno
@@ -527,16 +903,16 @@ class AppEscolar(ctk.CTk):
         else:
             messagebox.showwarning("Aviso", "Seleccione un alumno para generar la ficha.")
 
-    def actualizar_tabla_alumnos(self, datos):
-        for item in self.tree_alumnos.get_children():
-            self.tree_alumnos.delete(item)
-        for fila in datos:
-            # Reemplazar None con cadena vacía para visualización
-            fila = [x if x is not None else "" for x in fila]
-            # fila viene como: (id, nombre, grado, fecha_reg, apo_nombre, apo_tel, apo_email)
-            # UI espera: (ID, Nombre, Grado, Apoderado, Contacto)
-            fila_ui = (fila[0], fila[1], fila[2], fila[4], fila[5])
-            self.tree_alumnos.insert("", "end", values=fila_ui)
+    def actualizar_tabla_alumnos(self, datos=None, obtener_pagina=None):
+        self.tabla_alumnos.cargar(datos, obtener_pagina)
+
+    @staticmethod
+    def _fila_alumno_ui(fila):
+        # Reemplazar None con cadena vacía para visualización
+        fila = [x if x is not None else "" for x in fila]
+        # fila viene como: (id, nombre, grado, fecha_reg, apo_nombre, apo_tel, apo_email)
+        # UI espera: (ID, Nombre, Grado, Apoderado, Contacto)
+        return (fila[0], fila[1], fila[2], fila[4], fila[5])
 
     def solicitar_eliminacion(self):
         selected = self.tree_alumnos.selection()
@@ -575,7 +951,8 @@ class AppEscolar(ctk.CTk):
         self.entry_pago_monto = ctk.CTkEntry(panel_pago)
         self.entry_pago_monto.pack()
         
-        ctk.CTkButton(panel_pago, text="Registrar Pago", command=self.solicitar_pago).pack(pady=20)
+        ctk.CTkButton(panel_pago, text="Registrar Pago", command=self.solicitar_pago).pack(pady=(20, 5))
+        ctk.CTkButton(panel_pago, text="📋 Registro por Lote", fg_color="gray", command=self.abrir_ventana_pagos_lote).pack(pady=(0, 10))
         
         # Sección de Administración
         ctk.CTkLabel(panel_pago, text="--- Administración ---", text_color="gray").pack(pady=(10, 5))
@@ -612,13 +989,14 @@ class AppEscolar(ctk.CTk):
 
         style = ttk.Style()
         columns = ("ID", "Alumno", "Monto", "Mes", "Estado", "Fecha")
-        self.tree_pagos = ttk.Treeview(panel_derecho, columns=columns, show="headings")
+        self.tabla_pagos = TablaVirtual(panel_derecho, columns, formatear_fila=self._fila_pago_ui)
+        self.tree_pagos = self.tabla_pagos.tree
         for col in columns:
             self.tree_pagos.heading(col, text=col)
-            self.tree_pagos.heading(col, command=lambda c=col: self.ordenar_columnas(self.tree_pagos, c, False))
+            self.tree_pagos.heading(col, command=lambda c=col: self.ordenar_tabla(self.tabla_pagos, c, False))
             width = 140 if col == "Fecha" else 90
             self.tree_pagos.column(col, width=width)
-        self.tree_pagos.grid(row=1, column=0, sticky="nsew")
+        self.tabla_pagos.grid(row=1, column=0, sticky="nsew")
         self.tree_pagos.bind("<Double-1>", self.on_double_click_pago)
 
     def actualizar_combo_estudiantes_pago(self, lista_estudiantes):
@@ -630,20 +1008,21 @@ class AppEscolar(ctk.CTk):
         else:
             self.combo_alu_pago.set("")
 
-    def actualizar_tabla_pagos(self, datos):
-        for item in self.tree_pagos.get_children():
-            self.tree_pagos.delete(item)
-        for fila in datos:
-            # fila viene como: (id, nombre, grado, monto, mes, pagado, fecha_pago)
-            # UI espera: (ID, Alumno, Monto, Mes, Estado, Fecha)
-            # Saltamos el grado (índice 2) para la vista de tabla, pero lo mantenemos en CSV
-            fila_ui = [fila[0], fila[1], fila[3], fila[4], fila[5], fila[6]]
-            
-            # Convertir el booleano 1/0 a texto
-            fila_ui[4] = "Pagado" if fila_ui[4] else "Pendiente"
-            # Manejar registros antiguos sin fecha
-            if fila_ui[5] is None: fila_ui[5] = ""
-            self.tree_pagos.insert("", "end", values=fila_ui)
+    def actualizar_tabla_pagos(self, datos=None, obtener_pagina=None):
+        self.tabla_pagos.cargar(datos, obtener_pagina)
+
+    @staticmethod
+    def _fila_pago_ui(fila):
+        # fila viene como: (id, nombre, grado, monto, mes, pagado, fecha_pago)
+        # UI espera: (ID, Alumno, Monto, Mes, Estado, Fecha)
+        # Saltamos el grado (índice 2) para la vista de tabla, pero lo mantenemos en CSV
+        fila_ui = [fila[0], fila[1], fila[3], fila[4], fila[5], fila[6]]
+        
+        # Convertir el booleano 1/0 a texto
+        fila_ui[4] = "Pagado" if fila_ui[4] else "Pendiente"
+        # Manejar registros antiguos sin fecha
+        if fila_ui[5] is None: fila_ui[5] = ""
+        return fila_ui
 
     def solicitar_pago(self):
         alu_str = self.combo_alu_pago.get()
@@ -652,6 +1031,67 @@ class AppEscolar(ctk.CTk):
         mes = self.combo_mes.get()
         self.controller.registrar_pago(alu_id, monto, mes)
 
+    def abrir_ventana_pagos_lote(self):
+        top = ctk.CTkToplevel(self)
+        top.title("Registro de Pagos por Lote")
+        top.geometry("700x550")
+        top.grab_set()
+
+        filas = {}  # {item_treeview: (id_alumno, monto, mes)}
+
+        # Fila de captura: se mantiene el mes y el monto para agilizar el ingreso consecutivo
+        frame_form = ctk.CTkFrame(top, fg_color="transparent")
+        frame_form.pack(fill="x", padx=10, pady=10)
+        combo_alu = ctk.CTkComboBox(frame_form, values=list(self.mapa_estudiantes_pago.keys()), width=220)
+        combo_alu.set("")
+        combo_alu.pack(side="left", padx=5)
+        combo_mes = ctk.CTkComboBox(frame_form, values=self.controller.meses, width=120)
+        combo_mes.set(self.combo_mes.get())
+        combo_mes.pack(side="left", padx=5)
+        entry_monto = ctk.CTkEntry(frame_form, placeholder_text="Monto", width=100)
+        entry_monto.pack(side="left", padx=5)
+
+        columns = ("Alumno", "Mes", "Monto")
+        tree = ttk.Treeview(top, columns=columns, show="headings")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=200 if col == "Alumno" else 100)
+        tree.pack(expand=True, fill="both", padx=10, pady=5)
+
+        lbl_resumen = ctk.CTkLabel(top, text="0 pagos en el lote", text_color="gray")
+        lbl_resumen.pack(pady=5)
+
+        def actualizar_resumen():
+            lbl_resumen.configure(text=f"{len(filas)} pagos en el lote")
+
+        def agregar(event=None):
+            alu_str = combo_alu.get()
+            alu_id = self.mapa_estudiantes_pago.get(alu_str)
+            monto = entry_monto.get().strip()
+            if not alu_id or not monto:
+                messagebox.showwarning("Aviso", "Seleccione un alumno e ingrese el monto.", parent=top)
+                return
+            item = tree.insert("", "end", values=(alu_str, combo_mes.get(), monto))
+            filas[item] = (alu_id, monto, combo_mes.get())
+            tree.see(item)
+            combo_alu.set("")
+            combo_alu.focus_set()
+            actualizar_resumen()
+
+        def quitar():
+            for item in tree.selection():
+                filas.pop(item, None)
+                tree.delete(item)
+            actualizar_resumen()
+
+        entry_monto.bind("<Return>", agregar)
+        ctk.CTkButton(frame_form, text="Agregar", width=80, command=agregar).pack(side="left", padx=5)
+
+        frame_btns = ctk.CTkFrame(top, fg_color="transparent")
+        frame_btns.pack(pady=10)
+        ctk.CTkButton(frame_btns, text="Quitar Seleccionado", fg_color="red", command=quitar).pack(side="left", padx=10)
+        ctk.CTkButton(frame_btns, text="Registrar Lote", command=lambda: self.controller.registrar_pagos_lote([filas[i] for i in tree.get_children()], top)).pack(side="left", padx=10)
+
     def solicitar_exportar_pagos(self):
         self.controller.exportar_pagos_csv()
 
@@ -727,7 +1167,8 @@ class AppEscolar(ctk.CTk):
         
         style = ttk.Style()
         columns = ("ID", "Alumno", "Grado", "Apoderado", "Teléfono", "Meses Adeudados")
-        tree = ttk.Treeview(top, columns=columns, show="headings")
+        tabla = TablaVirtual(top, columns)
+        tree = tabla.tree
         
         for col in columns:
             tree.heading(col, text=col)
@@ -736,10 +1177,47 @@ class AppEscolar(ctk.CTk):
             else:
                 tree.column(col, width=100)
             
-        tree.pack(expand=True, fill="both", padx=10, pady=10)
-        
-        for fila in datos:
-            tree.insert("", "end", values=fila)
+        tabla.pack(expand=True, fill="both", padx=10, pady=10)
+        tabla.cargar(datos)
+
+    def mostrar_ventana_consolidado(self, por_escuela, totales, titulo):
+        top = ctk.CTkToplevel(self)
+        top.title(titulo)
+        top.geometry("900x450")
+
+        filas = [(f["escuela"], f["alumnos"], f"${f['ingresos_mes']:,.0f}", f"${f['ingresos_anio']:,.0f}", f["morosos"], f["meses_adeudados"])
+                 for f in por_escuela]
+        filas.append(("TOTAL", totales["alumnos"], f"${totales['ingresos_mes']:,.0f}", f"${totales['ingresos_anio']:,.0f}",
+                      totales["morosos"], totales["meses_adeudados"]))
+
+        ctk.CTkLabel(top, text=titulo, font=("Arial", 16, "bold")).pack(pady=10)
+        ctk.CTkButton(top, text="Exportar a CSV", fg_color="green", command=lambda: self.controller.exportar_consolidado_csv(filas, titulo)).pack(pady=5)
+
+        columns = ("Escuela", "Alumnos", "Ingresos del Mes", "Ingresos del Año", "Alumnos Morosos", "Meses Adeudados")
+        tabla = TablaVirtual(top, columns)
+        for col in columns:
+            tabla.tree.heading(col, text=col)
+            tabla.tree.column(col, width=250 if col == "Escuela" else 120)
+        tabla.pack(expand=True, fill="both", padx=10, pady=10)
+        tabla.cargar(filas)
+
+    def mostrar_ventana_diagnostico(self, estadisticas, ruta_log):
+        top = ctk.CTkToplevel(self)
+        top.title("Diagnóstico de Consultas")
+        top.geometry("1100x500")
+
+        ctk.CTkLabel(top, text="Consultas medidas (de mayor a menor tiempo total)", font=("Arial", 16, "bold")).pack(pady=10)
+        if ruta_log:
+            ctk.CTkLabel(top, text=f"Consultas lentas y sus planes: {ruta_log}", text_color="gray").pack(pady=(0, 5))
+
+        columns = ("Consulta", "Llamadas", "Total (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Filas")
+        tabla = TablaVirtual(top, columns)
+        for col in columns:
+            tabla.tree.heading(col, text=col)
+            tabla.tree.column(col, width=500 if col == "Consulta" else 90)
+        tabla.pack(expand=True, fill="both", padx=10, pady=10)
+        tabla.cargar([(e["sql"], e["llamadas"], f"{e['total_ms']:.1f}", f"{e['p50_ms']:.2f}", f"{e['p95_ms']:.2f}", f"{e['p99_ms']:.2f}", e["filas"])
+                      for e in estadisticas])
 
     def mostrar_ventana_edicion_mensaje(self, telefono, mensaje_inicial, callback_enviar):
         top = ctk.CTkToplevel(self)
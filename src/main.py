@@ -1,26 +1,37 @@
+import time
+# Referencia de --profile-startup: lo que sigue incluye importar la interfaz y los servicios
+_INICIO_ARRANQUE = time.perf_counter()
+
 from backend.database import SchoolDB
 from backend.services import ReportService
 from backend.whatsapp_service import WhatsAppService
+from backend.backup_service import BackupService
+from backend.ejecutor_db import EjecutorDB
+from backend.reporte_consolidado import ReporteConsolidado
+from backend.sync_service import ServidorSync, ClienteSync
+from backend.mantenimiento_service import ProgramadorMantenimiento
+from backend.perfil_arranque import PerfilArranque
+from backend.validaciones import Validador
 from frontend.interfaz import AppEscolar
 from tkinter import messagebox, filedialog, simpledialog
-import time
-import re
 from datetime import datetime
 import threading
-import shutil
-from typing import List, Optional, Any
+import queue
+from typing import Dict, List, Optional, Any, Tuple
 import sys
 import os
 import json
 import logging
 import locale
 import calendar
+import multiprocessing
 
 class SchoolController:
     CONFIG_FILE = "config.json"
     BACKUP_DIR = "backups"
 
-    def __init__(self):
+    def __init__(self, perfil: Optional[PerfilArranque] = None):
+        self.perfil = perfil or PerfilArranque()
         # Configurar logging básico
         logging.basicConfig(filename='app_escolar.log', level=logging.INFO, 
                             format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,10 +43,21 @@ class SchoolController:
             self.db = SchoolDB(last_db)
         else:
             self.db = SchoolDB() # Usa la por defecto si no hay config
+        self.db.verificar_nodo()
+        self.perfil.marcar("base de datos")
             
-        # 2. Guardar la ruta actual y crear backup automático de seguridad
+        # 2. Guardar la ruta actual (el backup automático se hace en segundo plano, con la UI ya creada)
         self._guardar_config_app(self.db.db_path)
-        self._crear_backup_automatico()
+
+        # Las consultas de la UI pasan por un único hilo dueño de la base; los resultados vuelven
+        # al hilo de Tkinter por una cola que se revisa con after() (Tk no se toca desde otros hilos)
+        self.ejecutor = EjecutorDB()
+        self._cola_ui = queue.Queue()
+        # optimize, analyze, vaciado e integridad en su propio hilo, cuando la interfaz no está usando la base
+        self.mantenimiento = ProgramadorMantenimiento(
+            lambda: self.db,
+            al_advertir=lambda mensaje: self._en_hilo_ui(lambda: self.view.mostrar_advertencia_estado(mensaje)),
+        )
 
         # Configurar meses dinámicamente
         self._configurar_locale()
@@ -45,23 +67,50 @@ class SchoolController:
             self.meses = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
 
         # Cargar configuración
-        self.nombre_escuela = self.db.obtener_configuracion("nombre_escuela") or "Escuela Modelo"
-        self.mostrar_grafico = (self.db.obtener_configuracion("mostrar_grafico") or "1") == "1"
-        self.admin_telefono = self.db.obtener_configuracion("admin_telefono") or "+56959920613"
-        self.dia_cobranza = int(self.db.obtener_configuracion("dia_cobranza") or "5")
-        
-        # Cargar inicio de clases desde DB (default: 2 -> Marzo)
-        self.inicio_clases_idx = int(self.db.obtener_configuracion("inicio_clases_idx") or "2")
+        self.servidor_sync = None
+        self._cargar_config(nombre_defecto="Escuela Modelo", telefono_defecto="+56959920613")
+        self.perfil.marcar("configuración")
         
         # Pasamos 'self' (el controlador) a la vista
         self.view = AppEscolar(controller=self)
         self.view.title(f"Sistema de Gestión Escolar - {self.nombre_escuela}")
+        self._procesar_cola_ui()
+        self.perfil.marcar("interfaz")
         
-        # Cargar datos iniciales
-        self.actualizar_apoderados()
-        self.actualizar_alumnos()
-        self.actualizar_pagos_ui()
-        self.actualizar_dashboard()
+        # Los datos se cargan con la ventana ya dibujada (la primera vez que Tk queda libre)
+        self.view.after_idle(self._cargas_iniciales)
+        self.view.after(self.INTERVALO_SYNC, self._sincronizacion_periodica)
+        self.mantenimiento.iniciar()
+
+    def _cargas_iniciales(self):
+        self.perfil.marcar("primer dibujo")
+        # Solo la pestaña visible: las demás se cargan la primera vez que se muestran
+        self.view.cargar_pestana_visible()
+        self._iniciar_sincronizacion()
+        # El hilo de la base atiende en orden: esto termina después de las cargas de arriba
+        self._en_db(lambda db: None, al_terminar=lambda _: self._arranque_completo())
+
+    def _arranque_completo(self):
+        self.perfil.marcar("datos iniciales")
+        self.perfil.emitir()
+        # El backup lee la base completa: se deja para cuando la ventana ya tiene sus datos
+        self._crear_backup_automatico()
+
+    # Configuración de la escuela que se lee al abrirla, en una sola consulta
+    CLAVES_CONFIG = ("nombre_escuela", "mostrar_grafico", "admin_telefono", "dia_cobranza", "inicio_clases_idx",
+                     "sync_url", "sync_clave", "sync_servidor", "diagnostico_activo", "diagnostico_umbral_ms")
+
+    def _cargar_config(self, nombre_defecto: str, telefono_defecto: str, config: Optional[Dict[str, str]] = None):
+        if config is None:
+            config = self.db.obtener_configuraciones(self.CLAVES_CONFIG)
+        self.nombre_escuela = config.get("nombre_escuela") or nombre_defecto
+        self.mostrar_grafico = (config.get("mostrar_grafico") or "1") == "1"
+        self.admin_telefono = config.get("admin_telefono") or telefono_defecto
+        self.dia_cobranza = int(config.get("dia_cobranza") or "5")
+        # Inicio de clases (default: 2 -> Marzo)
+        self.inicio_clases_idx = int(config.get("inicio_clases_idx") or "2")
+        self._cargar_config_sync(config)
+        self._cargar_config_diagnostico(config)
         
     def _configurar_locale(self):
         """Intenta configurar el locale a español para obtener nombres de meses."""
@@ -76,18 +125,97 @@ class SchoolController:
     def iniciar(self):
         """Inicia el bucle principal de la interfaz gráfica."""
         self.view.mainloop()
+        if self.servidor_sync:
+            self.servidor_sync.detener()
+        self.mantenimiento.detener()
+        self.ejecutor.cerrar()
+        self.db.cerrar()
+
+    # --- Acceso Asíncrono a la Base de Datos ---
+
+    INTERVALO_COLA_UI = 30  # ms
+
+    def _procesar_cola_ui(self):
+        """Ejecuta en el hilo de Tkinter las funciones que dejaron el hilo de la base y los hilos de trabajo."""
+        try:
+            while True:
+                funcion = self._cola_ui.get_nowait()
+                try:
+                    funcion()
+                except Exception as e:
+                    logging.error(f"Error actualizando la interfaz: {e}")
+        except queue.Empty:
+            pass
+        self.view.after(self.INTERVALO_COLA_UI, self._procesar_cola_ui)
+
+    def _en_hilo_ui(self, funcion):
+        """Seguro desde cualquier hilo: funcion() se ejecutará en el hilo de la interfaz."""
+        self._cola_ui.put(funcion)
+
+    def _en_db(self, operacion, al_terminar=None, error: str = "Error de base de datos"):
+        """
+        Encola operacion(db) en el hilo de la base y retorna el Future. Al completarse,
+        al_terminar(resultado) se aplica en el hilo de la interfaz; si falla, se muestra el error.
+        """
+        self.mantenimiento.registrar_actividad()
+        futuro = self.ejecutor.enviar(lambda: operacion(self.db))
+        def _listo(f):
+            self._en_hilo_ui(lambda: self._aplicar_resultado(f, al_terminar, error))
+        futuro.add_done_callback(_listo)
+        return futuro
+
+    def _aplicar_resultado(self, futuro, al_terminar, error: str):
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            logging.error(f"{error}: {e}")
+            messagebox.showerror("Error", f"{error}: {e}")
+            return
+        if al_terminar:
+            al_terminar(resultado)
+
+    # --- Pestañas ---
+
+    def _pestana_a_la_vista(self, pestana: str) -> bool:
+        """True si la pestaña se está mostrando; si no, queda marcada para recargarse cuando se muestre."""
+        if self.view.pestana_visible(pestana):
+            return True
+        self.view.marcar_desactualizada(pestana)
+        return False
+
+    def refrescar_pestana(self, pestana: str):
+        """La vista la llama al mostrar una pestaña que nunca se cargó o cuyos datos cambiaron mientras estaba oculta."""
+        if pestana == AppEscolar.PESTANA_INICIO:
+            self.actualizar_dashboard()
+        elif pestana == AppEscolar.PESTANA_ALUMNOS:
+            self.actualizar_alumnos()
+            self._actualizar_combo_apoderados()
+        elif pestana == AppEscolar.PESTANA_APODERADOS:
+            self.actualizar_apoderados()
+        elif pestana == AppEscolar.PESTANA_PAGOS:
+            self.actualizar_pagos_ui()
 
     def actualizar_dashboard(self, mes_seleccionado: Optional[str] = None):
+        if not self._pestana_a_la_vista(AppEscolar.PESTANA_INICIO):
+            return
         if mes_seleccionado:
             mes_actual = mes_seleccionado
         else:
             mes_actual = self.meses[datetime.now().month - 1]
         
-        total_alumnos, ingresos = self.db.obtener_estadisticas_dashboard(mes_actual)
+        anio = datetime.now().year
+        # Tarjetas y gráficos salen de los resúmenes precalculados en un solo viaje al hilo de la base
+        self._en_db(lambda db: (db.obtener_estadisticas_dashboard(mes_actual, anio),
+                                db.obtener_alumnos_por_grado(),
+                                db.obtener_ingresos_por_mes(anio)),
+                    al_terminar=lambda res: self._aplicar_dashboard(res, mes_actual, anio))
+
+    def _aplicar_dashboard(self, resultado, mes_actual: str, anio: int):
+        (total_alumnos, ingresos), por_grado, por_mes = resultado
         self.view.actualizar_tarjetas_dashboard(total_alumnos, ingresos, mes_actual)
         # Actualizar gráfico si existe
         if hasattr(self.view, 'actualizar_grafico_alumnos'):
-            self.view.actualizar_grafico_alumnos()
+            self.view.actualizar_grafico_alumnos(por_grado, por_mes, anio)
 
     def guardar_ajustes(self, nombre_escuela, mostrar_grafico, admin_tel, dia_cobranza, inicio_clases_str):
         if not nombre_escuela:
@@ -107,23 +235,23 @@ class SchoolController:
             messagebox.showerror("Error", "Mes de inicio inválido")
             return
 
-        self.db.guardar_configuracion("nombre_escuela", nombre_escuela)
-        self.db.guardar_configuracion("mostrar_grafico", "1" if mostrar_grafico else "0")
-        self.db.guardar_configuracion("admin_telefono", admin_tel)
-        self.db.guardar_configuracion("dia_cobranza", str(dia))
-        self.db.guardar_configuracion("inicio_clases_idx", str(inicio_clases_idx))
-        
-        self.nombre_escuela = nombre_escuela
-        self.mostrar_grafico = mostrar_grafico
-        self.admin_telefono = admin_tel
-        self.dia_cobranza = dia
-        self.inicio_clases_idx = inicio_clases_idx
-        
-        self.view.mostrar_mensaje_estado("Configuración guardada correctamente")
-        self.actualizar_dashboard()
-
-    def obtener_estadisticas_grado(self):
-        return self.db.obtener_alumnos_por_grado()
+        valores = {
+            "nombre_escuela": nombre_escuela,
+            "mostrar_grafico": "1" if mostrar_grafico else "0",
+            "admin_telefono": admin_tel,
+            "dia_cobranza": str(dia),
+            "inicio_clases_idx": str(inicio_clases_idx),
+        }
+        def _guardada(_):
+            self.nombre_escuela = nombre_escuela
+            self.mostrar_grafico = mostrar_grafico
+            self.admin_telefono = admin_tel
+            self.dia_cobranza = dia
+            self.inicio_clases_idx = inicio_clases_idx
+
+            self.view.mostrar_mensaje_estado("Configuración guardada correctamente")
+            self.actualizar_dashboard()
+        self._en_db(lambda db: db.guardar_configuraciones(valores), al_terminar=_guardada, error="No se pudo guardar la configuración")
 
     def cargar_escuela(self):
         file_path = filedialog.askopenfilename(
@@ -143,24 +271,38 @@ class SchoolController:
             self.cambiar_db(file_path)
 
     def cambiar_db(self, db_path: str):
+        # Abrir (y migrar) la nueva base puede tardar: se hace en el hilo de la base, junto con su configuración
+        def abrir(_):
+            nueva_db = SchoolDB(db_path)
+            nueva_db.verificar_nodo()
+            return nueva_db, nueva_db.obtener_configuraciones(self.CLAVES_CONFIG)
+        self.view.mostrar_mensaje_estado("Abriendo escuela...")
+        self._en_db(abrir, al_terminar=self._escuela_abierta, error="No se pudo cambiar de escuela")
+
+    def _escuela_abierta(self, resultado: Tuple[SchoolDB, Dict[str, str]]):
+        nueva_db, config = resultado
         try:
-            # 1. Conectar a la nueva DB
-            self.db = SchoolDB(db_path)
+            # 1. Usar la nueva DB y liberar las conexiones de la anterior
+            anterior, self.db = self.db, nueva_db
+            # Se cierra en el hilo de la base, después de las operaciones que ya estaban encoladas
+            self.ejecutor.enviar(anterior.cerrar)
             
             # Guardar preferencia y asegurar copia
             self._guardar_config_app(self.db.db_path)
             self._crear_backup_automatico()
 
             # 2. Recargar configuración
-            self.nombre_escuela = self.db.obtener_configuracion("nombre_escuela") or "Nueva Escuela"
-            self.mostrar_grafico = (self.db.obtener_configuracion("mostrar_grafico") or "1") == "1"
-            self.admin_telefono = self.db.obtener_configuracion("admin_telefono") or ""
-            self.dia_cobranza = int(self.db.obtener_configuracion("dia_cobranza") or "5")
-            self.inicio_clases_idx = int(self.db.obtener_configuracion("inicio_clases_idx") or "2")
+            self._cargar_config(nombre_defecto="Nueva Escuela", telefono_defecto="", config=config)
             
             # 3. Actualizar UI (Título y Configuración)
             self.view.title(f"Sistema de Gestión Escolar - {self.nombre_escuela}")
             self.view.actualizar_ui_configuracion(self.nombre_escuela, self.mostrar_grafico, self.admin_telefono, self.dia_cobranza, self.inicio_clases_idx)
+            # La sincronización se configura por escuela
+            self.view.actualizar_ui_sync(self.sync_url, self.sync_clave, self.sync_es_servidor)
+            self._iniciar_sincronizacion()
+            self.view.actualizar_ui_diagnostico(self.diagnostico_activo, self.diagnostico_umbral_ms)
+            # Las advertencias de integridad eran de la base anterior
+            self.view.mostrar_advertencia_estado(None)
 
             # 4. Refrescar datos de las tablas y dashboard
             self.actualizar_apoderados()
@@ -171,6 +313,127 @@ class SchoolController:
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo cambiar de escuela: {e}")
 
+    # --- Sincronización entre Equipos ---
+
+    INTERVALO_SYNC = 5 * 60 * 1000  # ms
+
+    def _cargar_config_sync(self, config: Dict[str, str]):
+        self.sync_url = config.get("sync_url") or ""
+        self.sync_clave = config.get("sync_clave") or ""
+        self.sync_es_servidor = (config.get("sync_servidor") or "0") == "1"
+
+    def _iniciar_sincronizacion(self):
+        """Levanta (o detiene) el servidor local según la configuración de la escuela abierta."""
+        if self.servidor_sync:
+            self.servidor_sync.detener()
+            self.servidor_sync = None
+        if not self.sync_es_servidor:
+            return
+        try:
+            self.servidor_sync = ServidorSync(lambda: self.db, clave=self.sync_clave, ejecutar=self.ejecutor.ejecutar)
+            _, puerto = self.servidor_sync.iniciar()
+            self.view.mostrar_mensaje_estado(f"Servidor de sincronización activo (puerto {puerto})")
+        except (OSError, ValueError) as e:
+            self.servidor_sync = None
+            logging.error(f"No se pudo iniciar el servidor de sincronización: {e}")
+            self.view.mostrar_mensaje_estado(f"No se pudo iniciar el servidor de sincronización: {e}", es_error=True)
+
+    def guardar_config_sync(self, url: str, clave: str, es_servidor: bool):
+        url = url.strip()
+        if url and not url.startswith(("http://", "https://")):
+            url = "http://" + url
+        if es_servidor and not clave.strip():
+            messagebox.showerror("Sincronización", "Para activar el servidor de sincronización ingrese una clave compartida.")
+            return
+        valores = {"sync_url": url, "sync_clave": clave, "sync_servidor": "1" if es_servidor else "0"}
+        def _guardada(_):
+            self._cargar_config_sync(valores)
+            self._iniciar_sincronizacion()
+            if url:
+                self.sincronizar_ahora()
+            else:
+                self.view.mostrar_mensaje_estado("Configuración de sincronización guardada")
+        self._en_db(lambda db: db.guardar_configuraciones(valores), al_terminar=_guardada, error="No se pudo guardar la configuración de sincronización")
+
+    def _sincronizacion_periodica(self):
+        if self.sync_url:
+            self.sincronizar_ahora(silencioso=True)
+        self.view.after(self.INTERVALO_SYNC, self._sincronizacion_periodica)
+
+    def sincronizar_ahora(self, silencioso: bool = False):
+        if not self.sync_url:
+            if not silencioso:
+                messagebox.showwarning("Sincronización", "Configure primero la dirección del servidor de sincronización.")
+            return
+        if getattr(self, "_sincronizando", False):
+            return
+        self._sincronizando = True
+        self.view.mostrar_mensaje_estado("Sincronizando con el servidor...")
+        cliente = ClienteSync(self.db, self.sync_url, clave=self.sync_clave, ejecutar=self.ejecutor.ejecutar)
+
+        def worker():
+            try:
+                enviados, recibidos = cliente.sincronizar()
+                self._en_hilo_ui(lambda: self._finalizar_sincronizacion(enviados, recibidos))
+            except Exception as e:
+                logging.error(f"Error de sincronización con {self.sync_url}: {e}")
+                self._en_hilo_ui(lambda msg=f"No se pudo sincronizar: {e}": self._finalizar_sincronizacion(error=msg, silencioso=silencioso))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _finalizar_sincronizacion(self, enviados: int = 0, recibidos: int = 0, error: Optional[str] = None, silencioso: bool = False):
+        self._sincronizando = False
+        if error:
+            # La sincronización automática solo avisa en la barra de estado; se reintenta en el próximo ciclo
+            if silencioso:
+                self.view.mostrar_mensaje_estado(error, es_error=True)
+            else:
+                messagebox.showerror("Sincronización", error)
+            return
+        self.view.mostrar_mensaje_estado(f"Sincronizado: {enviados} cambios enviados, {recibidos} recibidos")
+        if recibidos:
+            self.actualizar_apoderados()
+            self.actualizar_alumnos()
+            self.actualizar_pagos_ui()
+            self.actualizar_dashboard()
+
+    # --- Diagnóstico de Consultas ---
+
+    def _cargar_config_diagnostico(self, config: Dict[str, str]):
+        self.diagnostico_activo = (config.get("diagnostico_activo") or "0") == "1"
+        self.diagnostico_umbral_ms = float(config.get("diagnostico_umbral_ms") or "100")
+        if self.diagnostico_activo:
+            self.db.activar_instrumentacion(self.diagnostico_umbral_ms)
+        else:
+            self.db.desactivar_instrumentacion()
+
+    def guardar_config_diagnostico(self, activo: bool, umbral: str):
+        try:
+            umbral_ms = float(umbral.replace(",", "."))
+            if umbral_ms < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "El umbral debe ser un número de milisegundos (0 o más)")
+            return
+        valores = {"diagnostico_activo": "1" if activo else "0", "diagnostico_umbral_ms": str(umbral_ms)}
+        def _guardada(_):
+            self._cargar_config_diagnostico(valores)
+            self.view.mostrar_mensaje_estado("Medición de consultas activada" if activo else "Medición de consultas desactivada")
+        self._en_db(lambda db: db.guardar_configuraciones(valores), al_terminar=_guardada, error="No se pudo guardar la configuración de diagnóstico")
+
+    def mostrar_diagnostico(self):
+        # La instantánea se arma en memoria, sin consultar la base
+        estadisticas = self.db.estadisticas_consultas()
+        if not estadisticas:
+            messagebox.showinfo("Diagnóstico", "Aún no hay consultas medidas. Active la medición y use la aplicación un momento.")
+            return
+        ruta_log = self.db.instrumentacion.ruta_log if self.db.instrumentacion else ""
+        self.view.mostrar_ventana_diagnostico(estadisticas, ruta_log)
+
+    def reiniciar_diagnostico(self):
+        self.db.reiniciar_estadisticas_consultas()
+        self.view.mostrar_mensaje_estado("Estadísticas de consultas reiniciadas")
+
     def realizar_backup(self):
         file_path = filedialog.asksaveasfilename(
             defaultextension=".db",
@@ -178,45 +441,162 @@ class SchoolController:
             initialfile=f"backup_escolares_{datetime.now().strftime('%Y%m%d')}.db",
             title="Guardar Copia de Seguridad"
         )
-        if file_path:
+        if not file_path:
+            return
+
+        db_path = self.db.db_path
+        def worker():
+            try:
+                BackupService.copiar(db_path, file_path, progreso=self._progreso_backup)
+                self._en_hilo_ui(lambda: self.view.mostrar_mensaje_estado("Copia de seguridad creada con éxito"))
+            except Exception as e:
+                self._en_hilo_ui(lambda msg=f"No se pudo crear el backup: {e}": messagebox.showerror("Error", msg))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def cerrar_anio_escolar(self):
+        """Mueve los pagos de un año anterior (y los alumnos retirados o egresados) a la base de archivo de ese año."""
+        anio = simpledialog.askinteger("Cerrar Año Escolar", "Año a cerrar y archivar:", initialvalue=datetime.now().year - 1,
+                                       minvalue=2000, maxvalue=datetime.now().year - 1)
+        if not anio:
+            return
+        if not messagebox.askyesno("Confirmar", f"Se moverán los pagos de {anio} y los alumnos retirados o egresados al archivo del año.\n"
+                                                f"Después no se podrán registrar pagos en {anio}. ¿Continuar?"):
+            return
+        def _cerrado(resultado):
+            messagebox.showinfo("Año Cerrado", f"Año {anio} archivado en:\n{resultado['ruta']}\n\n"
+                                               f"Pagos movidos: {resultado['pagos']} (${resultado['total']:,.0f})\nAlumnos movidos: {resultado['alumnos']}")
+            self.actualizar_alumnos()
+            self.actualizar_pagos_ui()
+            self.actualizar_dashboard()
+        self.view.mostrar_mensaje_estado(f"Archivando el año {anio}...")
+        self._en_db(lambda db: db.cerrar_anio(anio), al_terminar=_cerrado, error=f"No se pudo cerrar el año {anio}")
+
+    def abrir_promocion_anual(self):
+        """Abre la ventana del paso de año con el mapa de progresión guardado (o sugerido) y los alumnos por grado."""
+        anio = datetime.now().year - 1
+        def _cargar(db):
+            return db.obtener_progresion_grados(), db.obtener_grados_activos(), anio not in db.anios_archivados()
+        self._en_db(_cargar, al_terminar=lambda r: self.view.abrir_ventana_promocion(r[0], r[1], anio if r[2] else None),
+                    error="No se pudieron cargar los grados")
+
+    def promover_grados(self, progresion: Dict[str, Optional[str]], archivar: bool, window: Any):
+        """
+        Guarda el mapa de progresión, muestra la vista previa y, si se confirma, promueve a todos los alumnos
+        (y opcionalmente archiva el año anterior) en una sola operación.
+        """
+        anio = datetime.now().year - 1 if archivar else None
+
+        def _previa(previa):
+            detalle = "\n".join(f"  {grado} → {siguiente or 'Egresa'}: {n}" for grado, siguiente, n in previa["por_grado"])
+            texto = (f"Promovidos: {previa['promovidos']}\nEgresados: {previa['egresados']}\n"
+                     f"Sin cambio de grado: {previa['sin_cambio']}\n\n{detalle}")
+            if anio:
+                texto += f"\n\nAdemás se archivarán los pagos de {anio}."
+            if not messagebox.askyesno("Confirmar Promoción", f"{texto}\n\n¿Aplicar el paso de año?", parent=window):
+                return
+            self.view.mostrar_mensaje_estado("Promoviendo alumnos...")
+            self._en_db(lambda db: db.promover_grados(progresion, anio_archivo=anio, esperados=previa),
+                        al_terminar=_promovido, error="No se pudo aplicar la promoción")
+
+        def _promovido(resultado):
+            window.destroy()
+            texto = f"Alumnos promovidos: {resultado['promovidos']}\nEgresados: {resultado['egresados']}"
+            if resultado["archivo"]:
+                texto += f"\n\nPagos de {anio} archivados: {resultado['archivo']['pagos']} (${resultado['archivo']['total']:,.0f})"
+            if resultado["error_archivo"]:
+                texto += (f"\n\nNo se pudo archivar el año {anio}: {resultado['error_archivo']}\n"
+                          "Ciérrelo más tarde con \"Cerrar Año Escolar...\" (no repita la promoción).")
+                messagebox.showwarning("Paso de Año", texto)
+            else:
+                messagebox.showinfo("Paso de Año", texto)
+            self.actualizar_alumnos()
+            self.actualizar_pagos_ui()
+            self.actualizar_dashboard()
+
+        def _guardar_y_previa(db):
+            db.guardar_progresion_grados(progresion)
+            return db.vista_previa_promocion(progresion)
+        self._en_db(_guardar_y_previa, al_terminar=_previa, error="No se pudo calcular la vista previa")
+
+    def _progreso_backup(self, porcentaje: int):
+        """Llamado desde el hilo del backup: la barra de estado se actualiza en el hilo de la UI."""
+        self._en_hilo_ui(lambda: self.view.mostrar_mensaje_estado(f"Copia de seguridad en curso... {porcentaje}%"))
+
+    def obtener_backups(self) -> List[dict]:
+        return BackupService.listar_backups(self.BACKUP_DIR)
+
+    def restaurar_backup(self, sha256: str, window: Any):
+        """Descomprime un backup del almacén en un .db nuevo elegido por el usuario y ofrece abrirlo."""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".db",
+            filetypes=[("SQLite DB", "*.db")],
+            initialfile=f"restaurado_{sha256[:8]}.db",
+            title="Guardar Base Restaurada"
+        )
+        if not file_path:
+            return
+        if os.path.abspath(file_path) == os.path.abspath(self.db.db_path):
+            messagebox.showerror("Error", "No se puede restaurar sobre la base de datos abierta. Elija un archivo nuevo.")
+            return
+        window.destroy()
+
+        def worker():
             try:
-                shutil.copy(self.db.db_path, file_path)
-                self.view.mostrar_mensaje_estado("Copia de seguridad creada con éxito")
+                BackupService.restaurar(self.BACKUP_DIR, sha256, file_path, progreso=self._progreso_backup)
+                self._en_hilo_ui(lambda: self._finalizar_restauracion(file_path))
             except Exception as e:
-                messagebox.showerror("Error", f"No se pudo crear el backup: {e}")
+                self._en_hilo_ui(lambda msg=f"No se pudo restaurar el backup: {e}": messagebox.showerror("Error", msg))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _finalizar_restauracion(self, file_path: str):
+        self.view.mostrar_mensaje_estado("Backup restaurado correctamente")
+        if messagebox.askyesno("Restaurar", f"Backup restaurado en:\n{file_path}\n\n¿Desea abrir esta base de datos ahora?"):
+            self.cambiar_db(file_path)
 
     def actualizar_apoderados(self):
-        # Actualizar combo en inscripción (lista simple)
-        apoderados_simple = self.db.obtener_apoderados()
-        self.view.actualizar_combo_apoderados(apoderados_simple)
-        
-        # Actualizar tabla en pestaña apoderados (lista completa)
-        apoderados_completo = self.db.obtener_apoderados_completo()
-        self.view.actualizar_tabla_apoderados(apoderados_completo)
+        if self._pestana_a_la_vista(AppEscolar.PESTANA_APODERADOS):
+            self._en_db(lambda db: db.obtener_apoderados_completo(), al_terminar=self.view.actualizar_tabla_apoderados)
+        # El combo de la pestaña de inscripción también lista a los apoderados
+        if self._pestana_a_la_vista(AppEscolar.PESTANA_ALUMNOS):
+            self._actualizar_combo_apoderados()
+
+    def _actualizar_combo_apoderados(self):
+        self._en_db(lambda db: db.obtener_apoderados(), al_terminar=self.view.actualizar_combo_apoderados)
+
+    def buscar_apoderados(self, termino: str):
+        if not termino:
+            self.actualizar_apoderados()
+            return
+        self._en_db(lambda db: db.buscar_apoderados_texto(termino), al_terminar=self.view.actualizar_tabla_apoderados)
 
     def actualizar_alumnos(self):
-        datos = self.db.obtener_estudiantes_completo()
-        self.view.actualizar_tabla_alumnos(datos)
+        if not self._pestana_a_la_vista(AppEscolar.PESTANA_ALUMNOS):
+            return
+        # La tabla pide las páginas a medida que el usuario se desplaza (clave: grado, nombre, id); cada página es un Future
+        self.view.actualizar_tabla_alumnos(obtener_pagina=lambda ultima, limite: self.ejecutor.enviar(
+            lambda: self.db.obtener_estudiantes_pagina(limite, (ultima[2], ultima[1], ultima[0]) if ultima else None)))
 
     def buscar_alumnos(self, termino: str):
         if not termino:
             self.actualizar_alumnos()
             return
-        datos = self.db.buscar_estudiantes(termino)
-        self.view.actualizar_tabla_alumnos(datos)
+        self._en_db(lambda db: db.buscar_estudiantes_texto(termino), al_terminar=lambda datos: self.view.actualizar_tabla_alumnos(datos))
 
     def actualizar_pagos_ui(self):
-        estudiantes = self.db.obtener_estudiantes_simple()
-        self.view.actualizar_combo_estudiantes_pago(estudiantes)
-        pagos = self.db.obtener_historial_pagos()
-        self.view.actualizar_tabla_pagos(pagos)
+        if not self._pestana_a_la_vista(AppEscolar.PESTANA_PAGOS):
+            return
+        self._en_db(lambda db: db.obtener_estudiantes_simple(), al_terminar=self.view.actualizar_combo_estudiantes_pago)
+        # La tabla pide las páginas a medida que el usuario se desplaza (clave: fecha_pago, id); cada página es un Future
+        self.view.actualizar_tabla_pagos(obtener_pagina=lambda ultima, limite: self.ejecutor.enviar(
+            lambda: self.db.obtener_historial_pagos_pagina(limite, (ultima[6], ultima[0]) if ultima else None)))
 
     def buscar_pagos(self, termino: str):
         if not termino:
             self.actualizar_pagos_ui()
             return
-        pagos = self.db.buscar_pagos(termino)
-        self.view.actualizar_tabla_pagos(pagos)
+        self._en_db(lambda db: db.buscar_pagos_texto(termino), al_terminar=lambda pagos: self.view.actualizar_tabla_pagos(pagos))
 
     def guardar_apoderado(self, nombre: str, tel: str, email: str):
         datos = self._validar_datos_apoderado(nombre, tel, email)
@@ -224,10 +604,11 @@ class SchoolController:
             return
         
         nombre, tel, email = datos
-        self.db.agregar_apoderado(nombre, tel, email)
-        self.view.mostrar_mensaje_estado("Apoderado guardado correctamente")
-        self.view.limpiar_form_apoderado()
-        self.actualizar_apoderados() # Actualizar lista en pestaña inscripción
+        def _guardado(_):
+            self.view.mostrar_mensaje_estado("Apoderado guardado correctamente")
+            self.view.limpiar_form_apoderado()
+            self.actualizar_apoderados() # Actualizar lista en pestaña inscripción
+        self._en_db(lambda db: db.agregar_apoderado(nombre, tel, email), al_terminar=_guardado, error="No se pudo guardar el apoderado")
 
     def editar_apoderado(self, id: int, nombre: str, tel: str, email: str, window: Any):
         datos = self._validar_datos_apoderado(nombre, tel, email)
@@ -235,19 +616,23 @@ class SchoolController:
             return
             
         nombre, tel, email = datos
-        self.db.actualizar_apoderado(id, nombre, tel, email)
-        self.view.mostrar_mensaje_estado("Apoderado actualizado correctamente")
-        window.destroy()
-        self.actualizar_apoderados()
+        def _actualizado(_):
+            self.view.mostrar_mensaje_estado("Apoderado actualizado correctamente")
+            window.destroy()
+            self.actualizar_apoderados()
+        self._en_db(lambda db: db.actualizar_apoderado(id, nombre, tel, email), al_terminar=_actualizado, error="No se pudo actualizar el apoderado")
 
     def eliminar_apoderado(self, id_apoderado: int):
-        if self.db.verificar_dependencia_apoderado(id_apoderado):
+        self._en_db(lambda db: db.verificar_dependencia_apoderado(id_apoderado),
+                    al_terminar=lambda tiene_alumnos: self._confirmar_eliminar_apoderado(id_apoderado, tiene_alumnos))
+
+    def _confirmar_eliminar_apoderado(self, id_apoderado: int, tiene_alumnos: bool):
+        if tiene_alumnos:
             messagebox.showerror("Error", "No se puede eliminar el apoderado porque tiene alumnos inscritos. Elimine o reasigne a los alumnos primero.")
             return
 
         if messagebox.askyesno("Confirmar", "¿Está seguro de eliminar este apoderado?"):
-            self.db.eliminar_apoderado(id_apoderado)
-            self.actualizar_apoderados()
+            self._en_db(lambda db: db.eliminar_apoderado(id_apoderado), al_terminar=lambda _: self.actualizar_apoderados())
 
     def inscribir_alumno(self, nombre: str, grado: str, apo_id: int):
         nombre = nombre.strip() if nombre else ""
@@ -261,21 +646,29 @@ class SchoolController:
             messagebox.showerror("Error", "Debe seleccionar un apoderado para inscribir al alumno")
             return
 
-        if self.db.verificar_estudiante_existente(nombre, grado):
-            messagebox.showerror("Error", f"El alumno '{nombre}' ya está inscrito en el grado '{grado}'.")
-            return
-            
-        self.db.agregar_estudiante(nombre, grado, apo_id)
-        self.view.mostrar_mensaje_estado("Alumno inscrito correctamente")
-        self.view.limpiar_form_inscripcion()
-        self.actualizar_alumnos()
-        self.actualizar_pagos_ui() # Actualizar lista en pagos también
-        self.actualizar_dashboard()
+        def inscribir(db):
+            # Verificación e inserción en la misma operación del hilo de la base
+            if db.verificar_estudiante_existente(nombre, grado):
+                return False
+            db.agregar_estudiante(nombre, grado, apo_id)
+            return True
+
+        def _inscrito(inscrito):
+            if not inscrito:
+                messagebox.showerror("Error", f"El alumno '{nombre}' ya está inscrito en el grado '{grado}'.")
+                return
+            self.view.mostrar_mensaje_estado("Alumno inscrito correctamente")
+            self.view.limpiar_form_inscripcion()
+            self.actualizar_alumnos()
+            self.actualizar_pagos_ui() # Actualizar lista en pagos también
+            self.actualizar_dashboard()
+        self._en_db(inscribir, al_terminar=_inscrito, error="No se pudo inscribir al alumno")
 
     def preparar_edicion_alumno(self, id_alumno: int):
-        estudiante = self.db.obtener_estudiante_por_id(id_alumno)
-        if estudiante:
-            self.view.abrir_ventana_edicion_alumno(estudiante[0])
+        def _abrir(estudiante):
+            if estudiante:
+                self.view.abrir_ventana_edicion_alumno(estudiante[0])
+        self._en_db(lambda db: db.obtener_estudiante_por_id(id_alumno), al_terminar=_abrir, error="No se pudo leer el alumno")
 
     def editar_alumno(self, id: int, nombre: str, grado: str, apo_id: int, window: Any):
         nombre = nombre.strip() if nombre else ""
@@ -284,17 +677,29 @@ class SchoolController:
         if not nombre or not apo_id:
             messagebox.showerror("Error", "Faltan datos o apoderado inválido")
             return
-        self.db.actualizar_estudiante(id, nombre, grado, apo_id)
-        self.view.mostrar_mensaje_estado("Alumno actualizado correctamente")
-        window.destroy()
-        self.actualizar_alumnos()
+        def _actualizado(_):
+            self.view.mostrar_mensaje_estado("Alumno actualizado correctamente")
+            window.destroy()
+            self.actualizar_alumnos()
+        self._en_db(lambda db: db.actualizar_estudiante(id, nombre, grado, apo_id), al_terminar=_actualizado, error="No se pudo actualizar el alumno")
 
     def eliminar_alumno(self, id_alumno: int):
         if messagebox.askyesno("Confirmar", "¿Está seguro de eliminar este alumno?"):
-            self.db.eliminar_estudiante(id_alumno)
-            self.actualizar_alumnos()
-            self.actualizar_pagos_ui()
-            self.actualizar_dashboard()
+            def _eliminado(_):
+                self.actualizar_alumnos()
+                self.actualizar_pagos_ui()
+                self.actualizar_dashboard()
+            self._en_db(lambda db: db.eliminar_estudiante(id_alumno), al_terminar=_eliminado, error="No se pudo eliminar el alumno")
+
+    def marcar_alumno_retirado(self, id_alumno: int):
+        if messagebox.askyesno("Confirmar", "¿Marcar este alumno como retirado?\nSus datos se conservan y pasarán al archivo al cerrar el año escolar."):
+            def _marcado(_):
+                self.view.mostrar_mensaje_estado("Alumno marcado como retirado")
+                # Sale de la morosidad, del combo de pagos y del conteo del dashboard
+                self.actualizar_alumnos()
+                self.actualizar_pagos_ui()
+                self.actualizar_dashboard()
+            self._en_db(lambda db: db.cambiar_estado_estudiante(id_alumno, "retirado"), al_terminar=_marcado, error="No se pudo cambiar el estado del alumno")
 
     def registrar_pago(self, estudiante_id: int, monto: str, mes: str):
         if not estudiante_id or not monto or not mes:
@@ -307,24 +712,56 @@ class SchoolController:
                 messagebox.showerror("Error", "El monto debe ser un número positivo mayor a 0")
                 return
             
-            if self.db.verificar_pago_existente(estudiante_id, mes):
+        except ValueError:
+            messagebox.showerror("Error", "El monto debe ser un número válido")
+            return
+
+        def _registrado(registrado):
+            if not registrado:
                 messagebox.showwarning("Aviso", f"El pago de {mes} ya está registrado para este alumno.")
                 return
-
-            self.db.registrar_pago(estudiante_id, monto_float, mes)
             self.view.mostrar_mensaje_estado("Pago registrado correctamente")
             self.actualizar_pagos_ui()
             self.actualizar_dashboard()
-        except ValueError:
-            messagebox.showerror("Error", "El monto debe ser un número válido")
+        self._en_db(lambda db: db.registrar_pago(estudiante_id, monto_float, mes), al_terminar=_registrado, error="No se pudo registrar el pago")
 
-    def eliminar_pago(self, id_pago: int):
-        if messagebox.askyesno("Confirmar", "¿Está seguro de eliminar este registro de pago?"):
-            self.db.eliminar_pago(id_pago)
-            self.view.mostrar_mensaje_estado("Pago eliminado correctamente")
+    def registrar_pagos_lote(self, filas: List[tuple], window: Any):
+        """Registra todas las filas (id_alumno, monto, mes) de la ventana de lote y refresca la UI una sola vez."""
+        if not filas:
+            messagebox.showwarning("Aviso", "No hay pagos en el lote.")
+            return
+
+        pagos = []
+        for estudiante_id, monto, mes in filas:
+            try:
+                monto_float = float(monto)
+            except ValueError:
+                messagebox.showerror("Error", f"Monto inválido en el lote: {monto}")
+                return
+            if monto_float <= 0 or not estudiante_id or mes not in self.meses:
+                messagebox.showerror("Error", "Todas las filas del lote deben tener alumno, mes y un monto mayor a 0")
+                return
+            pagos.append((estudiante_id, monto_float, mes))
+
+        def _registrado(resultado):
+            registrados, duplicados = resultado
+            window.destroy()
             self.actualizar_pagos_ui()
             self.actualizar_dashboard()
 
+            self.view.mostrar_mensaje_estado(f"Lote registrado: {registrados} pagos")
+            if duplicados:
+                messagebox.showwarning("Aviso", f"Se registraron {registrados} pagos.\n{len(duplicados)} pagos se omitieron porque ya estaban registrados para ese alumno y mes.")
+        self._en_db(lambda db: db.registrar_pagos_lote(pagos), al_terminar=_registrado, error="No se pudo registrar el lote")
+
+    def eliminar_pago(self, id_pago: int):
+        if messagebox.askyesno("Confirmar", "¿Está seguro de eliminar este registro de pago?"):
+            def _eliminado(_):
+                self.view.mostrar_mensaje_estado("Pago eliminado correctamente")
+                self.actualizar_pagos_ui()
+                self.actualizar_dashboard()
+            self._en_db(lambda db: db.eliminar_pago(id_pago), al_terminar=_eliminado, error="No se pudo eliminar el pago")
+
     def modificar_pago(self, id_pago: int, monto: str, mes: str, window: Any):
         try:
             monto_float = float(monto)
@@ -332,13 +769,19 @@ class SchoolController:
                 messagebox.showerror("Error", "El monto debe ser positivo")
                 return
             
-            self.db.actualizar_pago(id_pago, monto_float, mes)
+        except ValueError:
+            messagebox.showerror("Error", "Monto inválido")
+            return
+
+        def _actualizado(actualizado):
+            if not actualizado:
+                messagebox.showwarning("Aviso", f"El alumno ya tiene un pago registrado para {mes}.")
+                return
             self.view.mostrar_mensaje_estado("Pago actualizado correctamente")
             window.destroy()
             self.actualizar_pagos_ui()
             self.actualizar_dashboard()
-        except ValueError:
-            messagebox.showerror("Error", "Monto inválido")
+        self._en_db(lambda db: db.actualizar_pago(id_pago, monto_float, mes), al_terminar=_actualizado, error="No se pudo actualizar el pago")
 
     def mostrar_reporte_morosos(self, mes_corte: str):
         # Lógica de ciclo escolar: Marzo (índice 2) a Diciembre
@@ -352,38 +795,19 @@ class SchoolController:
             messagebox.showinfo("Aviso", f"El ciclo escolar comienza en {mes_inicio}. No hay reporte de morosidad disponible para meses anteriores.")
             return
 
-        # Lista de meses que DEBERÍAN estar pagados a la fecha (ej: Marzo, Abril, Mayo...)
-        meses_requeridos = self.meses[self.inicio_clases_idx : mes_actual_idx + 1]
-        
-        estudiantes = self.db.obtener_estudiantes_completo()
-        pagos_raw = self.db.obtener_pagos_todos()
-        
-        # Crear mapa de pagos: { id_estudiante: {'Marzo', 'Abril'} }
-        pagos_map = {}
-        for pid, mes in pagos_raw:
-            if pid not in pagos_map:
-                pagos_map[pid] = set()
-            pagos_map[pid].add(mes)
-            
-        lista_morosos = []
-        for est in estudiantes:
-            # Se ajusta el desempaquetado para los 7 valores que retorna la consulta (ignoramos fecha y email)
-            eid, nombre, grado, _, apo, tel, _ = est
-            pagados = pagos_map.get(eid, set())
-            
-            # Calcular meses faltantes
-            deuda = [m for m in meses_requeridos if m not in pagados]
-            
-            if deuda:
-                deuda_str = ", ".join(deuda)
-                # Agregamos la columna de meses adeudados al final
-                lista_morosos.append((eid, nombre, grado, apo, tel, deuda_str))
-
-        titulo = f"Morosidad Acumulada ({self.meses[self.inicio_clases_idx]} - {mes_corte})"
-        self.view.mostrar_ventana_morosos(lista_morosos, titulo)
+        # Meses que DEBERÍAN estar pagados a la fecha (ej: Marzo, Abril, Mayo...), calculado en la DB
+        anio = datetime.now().year
+        titulo = f"Morosidad Acumulada ({self.meses[self.inicio_clases_idx]} - {mes_corte} {anio})"
+        inicio = self.inicio_clases_idx
+        self._en_db(lambda db: db.obtener_morosos(inicio, mes_actual_idx, anio=anio),
+                    al_terminar=lambda lista_morosos: self.view.mostrar_ventana_morosos(lista_morosos, titulo),
+                    error="No se pudo calcular la morosidad")
 
     def generar_recibo_pago(self, id_pago: int):
-        datos = self.db.obtener_pago_detalle(id_pago)
+        self._en_db(lambda db: db.obtener_pago_detalle(id_pago), al_terminar=lambda datos: self._guardar_recibo_pago(id_pago, datos),
+                    error="No se pudo leer el pago")
+
+    def _guardar_recibo_pago(self, id_pago: int, datos: List[Tuple]):
         if not datos:
             messagebox.showerror("Error", "No se encontraron detalles del pago")
             return
@@ -397,12 +821,16 @@ class SchoolController:
         threading.Thread(target=lambda: self._worker_recibo(file_path, datos_pago), daemon=True).start()
 
     def exportar_alumnos_csv(self):
-        datos = self.db.obtener_estudiantes_completo()
         headers = ["ID", "Nombre Alumno", "Grado", "Fecha Registro", "Nombre Apoderado", "Teléfono", "Email Apoderado"]
-        self._exportar_csv(datos, headers, "Lista_Alumnos.csv", "Guardar lista de alumnos")
+        self._en_db(lambda db: db.obtener_estudiantes_completo(),
+                    al_terminar=lambda datos: self._exportar_csv(datos, headers, "Lista_Alumnos.csv", "Guardar lista de alumnos"),
+                    error="No se pudo leer la lista de alumnos")
 
     def generar_ficha_alumno_pdf(self, id_alumno: int):
-        datos = self.db.obtener_estudiante_detalle(id_alumno)
+        self._en_db(lambda db: db.obtener_estudiante_detalle(id_alumno), al_terminar=lambda datos: self._guardar_ficha_alumno(id_alumno, datos),
+                    error="No se pudo leer el alumno")
+
+    def _guardar_ficha_alumno(self, id_alumno: int, datos: List[Tuple]):
         if not datos:
             messagebox.showerror("Error", "No se encontraron datos del alumno")
             return
@@ -416,25 +844,27 @@ class SchoolController:
         self.view.configure(cursor="watch") # Cambiar cursor a espera
         def worker():
             try:
-                pagos = self.db.obtener_pagos_alumno(id_alumno)
+                pagos = self.ejecutor.ejecutar(lambda: self.db.obtener_pagos_alumno(id_alumno))
                 ReportService.generar_ficha_alumno_pdf(file_path, datos_alumno, pagos, self.nombre_escuela)
-                self.view.after(0, lambda: self._finalizar_tarea_visual("Ficha PDF generada correctamente"))
+                self._en_hilo_ui(lambda: self._finalizar_tarea_visual("Ficha PDF generada correctamente"))
             except Exception as e:
-                self.view.after(0, lambda: self._finalizar_tarea_visual(f"Error: {e}", es_error=True))
+                self._en_hilo_ui(lambda msg=f"Error: {e}": self._finalizar_tarea_visual(msg, es_error=True))
 
         threading.Thread(target=worker, daemon=True).start()
 
     def enviar_recordatorio_pago(self, id_alumno: int):
-        # 1. Obtener datos de contacto
-        datos = self.db.obtener_datos_cobranza(id_alumno)
+        # 1. Datos de contacto y 2. deuda, en el hilo de la base
+        inicio = self.inicio_clases_idx
+        self._en_db(lambda db: (db.obtener_datos_cobranza(id_alumno), self._calcular_deuda_alumno(db, id_alumno, inicio)),
+                    al_terminar=self._preparar_recordatorio_pago, error="No se pudo calcular la deuda del alumno")
+
+    def _preparar_recordatorio_pago(self, resultado: Tuple[List[Tuple], List[str]]):
+        datos, deuda = resultado
         if not datos:
             messagebox.showerror("Error", "No se encontraron datos para este alumno.")
             return
         
         nombre_apo, telefono, nombre_alu = datos[0]
-
-        # 2. Calcular Deuda
-        deuda = self._calcular_deuda_alumno(id_alumno)
         
         if not deuda:
             messagebox.showinfo("Información", f"El alumno {nombre_alu} está al día en sus pagos.")
@@ -470,16 +900,17 @@ class SchoolController:
 
     def enviar_recordatorio_morosos_masivo(self):
         """Busca todos los alumnos con deuda y envía recordatorios a sus apoderados."""
-        estudiantes = self.db.obtener_estudiantes_completo()
-        morosos = []
-        
-        # Filtrar quiénes tienen deuda
-        for est in estudiantes:
-            # est: id, nombre, grado, fecha, nombre_apo, tel, email
-            id_alu, nombre_alu, _, _, nombre_apo, tel, _ = est
-            deuda = self._calcular_deuda_alumno(id_alu)
-            if deuda and tel:
-                morosos.append((nombre_apo, tel, nombre_alu, deuda))
+        # Todos los alumnos con deuda a la fecha en una sola consulta
+        mes_actual_idx = datetime.now().month - 1
+        inicio = self.inicio_clases_idx
+        self._en_db(lambda db: db.obtener_morosos(inicio, mes_actual_idx), al_terminar=self._confirmar_cobranza_masiva,
+                    error="No se pudo calcular la morosidad")
+
+    def _confirmar_cobranza_masiva(self, lista_morosos: List[Tuple]):
+        # Solo interesan los que tienen teléfono
+        morosos = [(nombre_apo, tel, nombre_alu, deuda_str)
+                   for _, nombre_alu, _, nombre_apo, tel, deuda_str in lista_morosos
+                   if tel]
         
         if not morosos:
             messagebox.showinfo("Info", "No se encontraron alumnos con deuda y teléfono registrado.")
@@ -494,8 +925,8 @@ class SchoolController:
             total = len(morosos)
             enviados = 0
             errores = 0
-            for i, (nombre_apo, tel, nombre_alu, deuda) in enumerate(morosos, 1):
-                self.view.after(0, lambda idx=i, nom=nombre_alu: self.view.mostrar_mensaje_estado(f"Procesando {idx}/{total}: {nom}..."))
+            for i, (nombre_apo, tel, nombre_alu, deuda_str) in enumerate(morosos, 1):
+                self._en_hilo_ui(lambda idx=i, nom=nombre_alu: self.view.mostrar_mensaje_estado(f"Procesando {idx}/{total}: {nom}..."))
 
                 # Limpieza profunda del teléfono usando helper
                 tel = self._limpiar_telefono(tel)
@@ -503,7 +934,6 @@ class SchoolController:
                     errores += 1
                     continue
                 
-                deuda_str = ", ".join(deuda)
                 mensaje = (f"Estimado/a {nombre_apo}, le recordamos que el alumno {nombre_alu} "
                            f"tiene pendientes: {deuda_str}. Favor regularizar. Atte, {self.nombre_escuela}")
                 
@@ -514,14 +944,17 @@ class SchoolController:
 
                 time.sleep(12)
             
-            self.view.after(0, lambda: messagebox.showinfo("Reporte Cobranza", f"Proceso finalizado.\nEnviados: {enviados}\nFallidos: {errores}"))
-            self.view.after(0, lambda: self.view.mostrar_mensaje_estado("Cobranza masiva finalizada."))
+            self._en_hilo_ui(lambda: messagebox.showinfo("Reporte Cobranza", f"Proceso finalizado.\nEnviados: {enviados}\nFallidos: {errores}"))
+            self._en_hilo_ui(lambda: self.view.mostrar_mensaje_estado("Cobranza masiva finalizada."))
 
         threading.Thread(target=worker, daemon=True).start()
 
     def enviar_anuncio_general(self):
         """Envía un mensaje a todos los apoderados registrados."""
-        apoderados = self.db.obtener_telefonos_apoderados()
+        self._en_db(lambda db: db.obtener_telefonos_apoderados(), al_terminar=self._confirmar_anuncio_general,
+                    error="No se pudieron leer los apoderados")
+
+    def _confirmar_anuncio_general(self, apoderados: List[Tuple]):
         if not apoderados:
             messagebox.showinfo("Info", "No hay apoderados con teléfono registrado.")
             return
@@ -540,7 +973,7 @@ class SchoolController:
             errores = 0
             for i, (nombre, tel) in enumerate(apoderados, 1):
                 # Actualizar progreso en la UI
-                self.view.after(0, lambda idx=i: self.view.mostrar_mensaje_estado(f"Procesando {idx}/{total}: {nombre}..."))
+                self._en_hilo_ui(lambda idx=i: self.view.mostrar_mensaje_estado(f"Procesando {idx}/{total}: {nombre}..."))
                 
                 # Limpieza profunda del teléfono usando helper
                 tel = self._limpiar_telefono(tel)
@@ -557,8 +990,8 @@ class SchoolController:
                 # Espera de seguridad entre mensajes para dar tiempo al navegador
                 time.sleep(12) 
             
-            self.view.after(0, lambda: messagebox.showinfo("Reporte", f"Envío finalizado.\nEnviados: {enviados}\nFallidos/Sin formato: {errores}"))
-            self.view.after(0, lambda: self.view.mostrar_mensaje_estado("Envío masivo finalizado."))
+            self._en_hilo_ui(lambda: messagebox.showinfo("Reporte", f"Envío finalizado.\nEnviados: {enviados}\nFallidos/Sin formato: {errores}"))
+            self._en_hilo_ui(lambda: self.view.mostrar_mensaje_estado("Envío masivo finalizado."))
 
         threading.Thread(target=worker, daemon=True).start()
 
@@ -579,14 +1012,62 @@ class SchoolController:
     def _worker_recibo(self, file_path, datos_pago):
         try:
             ReportService.generar_recibo_pago_pdf(file_path, datos_pago, self.nombre_escuela)
-            self.view.after(0, lambda: self._finalizar_tarea_visual("Recibo generado correctamente"))
+            self._en_hilo_ui(lambda: self._finalizar_tarea_visual("Recibo generado correctamente"))
         except Exception as e:
-            self.view.after(0, lambda: self._finalizar_tarea_visual(f"Error: {e}", es_error=True))
+            self._en_hilo_ui(lambda msg=f"Error: {e}": self._finalizar_tarea_visual(msg, es_error=True))
 
     def exportar_pagos_csv(self):
-        datos = self.db.obtener_historial_pagos()
         headers = ["ID Pago", "Alumno", "Grado", "Monto", "Mes", "Pagado (1=Sí, 0=No)", "Fecha Pago"]
-        self._exportar_csv(datos, headers, "Historial_Pagos.csv", "Guardar historial de pagos")
+        def _exportar(datos):
+            self._exportar_csv(datos, headers, "Historial_Pagos.csv", "Guardar historial de pagos")
+        def _elegir(archivados):
+            # Los años cerrados están en sus archivos: se incluyen solo si el usuario lo pide
+            desde_anio = None
+            if archivados and messagebox.askyesno("Años Archivados", f"¿Incluir los pagos de los años archivados ({', '.join(map(str, archivados))})?"):
+                desde_anio = archivados[0]
+            self._en_db(lambda db: db.obtener_historial_pagos(desde_anio), al_terminar=_exportar, error="No se pudo leer el historial de pagos")
+        self._en_db(lambda db: db.anios_archivados(), al_terminar=_elegir)
+
+    def exportar_cambios_csv(self):
+        """Exportación incremental: solo los cambios registrados desde la exportación anterior."""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")],
+            initialfile=f"Cambios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            title="Guardar cambios desde la última exportación"
+        )
+        if not file_path:
+            return
+
+        def leer_cambios(db):
+            desde = int(db.obtener_configuracion("cambios_exportados_hasta") or 0)
+            cambios = []
+            while True:
+                tramo = db.obtener_cambios(desde, limite=5000)
+                if not tramo:
+                    return cambios
+                cambios += tramo
+                desde = tramo[-1][0]
+
+        self.view.configure(cursor="watch")
+        def worker():
+            try:
+                cambios = self.ejecutor.ejecutar(leer_cambios, self.db)
+                if not cambios:
+                    self._en_hilo_ui(lambda: self._finalizar_tarea_visual("No hay cambios desde la última exportación"))
+                    return
+                headers = ["Secuencia", "Tabla", "ID", "Operación (I/U/D)", "Fecha", "Datos (JSON)"]
+                filas = [(seq, tabla, fila_id, operacion, fecha, json.dumps(datos, ensure_ascii=False) if datos else None)
+                         for seq, tabla, fila_id, operacion, datos, fecha in cambios]
+                ReportService.exportar_csv(file_path, headers, filas)
+                # El cursor avanza solo cuando el archivo quedó escrito
+                self.ejecutor.ejecutar(self.db.guardar_configuracion, "cambios_exportados_hasta", str(cambios[-1][0]))
+                self._en_hilo_ui(lambda: self._finalizar_tarea_visual(f"{len(cambios)} cambios exportados"))
+            except Exception as e:
+                logging.error(f"Error exportando cambios: {e}")
+                self._en_hilo_ui(lambda msg=f"Error al exportar cambios: {e}": self._finalizar_tarea_visual(msg, es_error=True))
+
+        threading.Thread(target=worker, daemon=True).start()
 
     def exportar_morosos_csv(self, datos: List[Any], titulo_reporte: str):
         headers = ["ID Alumno", "Nombre", "Grado", "Apoderado", "Teléfono", "Meses Adeudados"]
@@ -594,31 +1075,104 @@ class SchoolController:
         nombre_archivo = f"Reporte_{titulo_reporte.replace(' ', '_').replace('(', '').replace(')', '')}.csv"
         self._exportar_csv(datos, headers, nombre_archivo, "Guardar reporte de morosos")
 
+    # --- Reporte Consolidado (varias escuelas) ---
+
+    def generar_reporte_consolidado(self):
+        rutas = filedialog.askopenfilenames(
+            filetypes=[("SQLite DB", "*.db")],
+            title="Seleccionar Escuelas a Consolidar (la escuela actual se incluye siempre)"
+        )
+        if not rutas:
+            return
+        rutas = [self.db.db_path] + [r for r in rutas if os.path.abspath(r) != os.path.abspath(self.db.db_path)]
+        hoy = datetime.now()
+        mes_idx = hoy.month - 1
+        titulo = f"Reporte Consolidado - {self.meses[mes_idx]} {hoy.year} ({len(rutas)} escuelas)"
+
+        self.view.configure(cursor="watch")
+        self.view.mostrar_mensaje_estado("Generando reporte consolidado...")
+        def worker():
+            try:
+                por_escuela, totales, desactualizadas = ReporteConsolidado.generar(rutas, hoy.year, mes_idx, mes_idx)
+                self._en_hilo_ui(lambda: self._finalizar_reporte_consolidado(por_escuela, totales, titulo, desactualizadas))
+            except Exception as e:
+                logging.error(f"Error en reporte consolidado: {e}")
+                self._en_hilo_ui(lambda msg=f"Error en el reporte consolidado: {e}": self._finalizar_tarea_visual(msg, es_error=True))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _finalizar_reporte_consolidado(self, por_escuela: List[dict], totales: dict, titulo: str, desactualizadas: List[str]):
+        self._finalizar_tarea_visual("Reporte consolidado generado")
+        if desactualizadas:
+            messagebox.showwarning("Reporte Consolidado", "Estas bases son de una versión anterior del sistema y no se incluyeron "
+                                   "(ábralas una vez con el sistema para actualizarlas):\n\n" + "\n".join(desactualizadas))
+        if por_escuela:
+            self.view.mostrar_ventana_consolidado(por_escuela, totales, titulo)
+
+    def exportar_consolidado_csv(self, filas: List[tuple], titulo_reporte: str):
+        headers = ["Escuela", "Alumnos", "Ingresos del Mes", "Ingresos del Año", "Alumnos Morosos", "Meses Adeudados"]
+        nombre_archivo = f"{titulo_reporte.split(' (')[0].replace(' ', '_')}.csv"
+        self._exportar_csv(filas, headers, nombre_archivo, "Guardar reporte consolidado")
+
+    # --- Importación Masiva ---
+
+    def importar_csv(self, tipo: str, window: Any):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("CSV files", "*.csv"), ("Todos los archivos", "*.*")],
+            title="Seleccionar archivo CSV a importar"
+        )
+        if not file_path:
+            return
+        window.destroy()
+
+        self.view.configure(cursor="watch")
+        self.view.mostrar_mensaje_estado("Importando datos, por favor espere...")
+        def worker():
+            try:
+                resultado = self.ejecutor.ejecutar(lambda: self.db.importar_csv(file_path, tipo))
+                self._en_hilo_ui(lambda: self._finalizar_importacion(*resultado))
+            except Exception as e:
+                logging.error(f"Error importando {file_path}: {e}")
+                self._en_hilo_ui(lambda msg=f"Error al importar: {e}": self._finalizar_tarea_visual(msg, es_error=True))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _finalizar_importacion(self, importados: int, rechazados: int, ruta_rechazados: Optional[str]):
+        self._finalizar_tarea_visual(f"Importación finalizada: {importados} registros importados")
+        self.actualizar_apoderados()
+        self.actualizar_alumnos()
+        self.actualizar_pagos_ui()
+        self.actualizar_dashboard()
+        if rechazados:
+            messagebox.showwarning("Importación", f"Importados: {importados}\nRechazados: {rechazados}\n\nEl detalle de las filas rechazadas se guardó en:\n{ruta_rechazados}")
+        else:
+            messagebox.showinfo("Importación", f"Se importaron {importados} registros correctamente.")
+
     # --- Métodos de Borrado Masivo ---
 
     def eliminar_todos_pagos(self):
         if messagebox.askyesno("Confirmar Eliminación", "ADVERTENCIA: ¿Está seguro de que desea eliminar TODOS los registros de pagos?\nEsta acción no se puede deshacer."):
-            self.db.eliminar_todos_pagos()
-            self.view.mostrar_mensaje_estado("Todos los pagos han sido eliminados.")
-            self.actualizar_pagos_ui()
-            self.actualizar_dashboard()
+            def _eliminados(_):
+                self.view.mostrar_mensaje_estado("Todos los pagos han sido eliminados.")
+                self.actualizar_pagos_ui()
+                self.actualizar_dashboard()
+            self._en_db(lambda db: db.eliminar_todos_pagos(), al_terminar=_eliminados, error="No se pudieron eliminar los pagos")
 
     def eliminar_todos_alumnos(self):
         if messagebox.askyesno("Confirmar Eliminación", "ADVERTENCIA: ¿Está seguro de que desea eliminar TODOS los alumnos?\nEsto también eliminará todos los historiales de pago asociados.\nEsta acción no se puede deshacer."):
-            self.db.eliminar_todos_estudiantes()
-            self.view.mostrar_mensaje_estado("Todos los alumnos y sus pagos han sido eliminados.")
-            self.actualizar_alumnos()
-            self.actualizar_pagos_ui()
-            self.actualizar_dashboard()
+            def _eliminados(_):
+                self.view.mostrar_mensaje_estado("Todos los alumnos y sus pagos han sido eliminados.")
+                self.actualizar_alumnos()
+                self.actualizar_pagos_ui()
+                self.actualizar_dashboard()
+            self._en_db(lambda db: db.eliminar_todos_estudiantes(), al_terminar=_eliminados, error="No se pudieron eliminar los alumnos")
 
     def eliminar_todos_apoderados(self):
         if messagebox.askyesno("Confirmar Eliminación", "ADVERTENCIA: ¿Está seguro de que desea eliminar TODOS los apoderados?\nEsta acción no se puede deshacer."):
-            try:
-                self.db.eliminar_todos_apoderados()
+            def _eliminados(_):
                 self.view.mostrar_mensaje_estado("Todos los apoderados han sido eliminados.")
                 self.actualizar_apoderados()
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            self._en_db(lambda db: db.eliminar_todos_apoderados(), al_terminar=_eliminados, error="No se pudieron eliminar los apoderados")
 
     # --- Métodos de Persistencia y Backup Automático ---
 
@@ -642,35 +1196,17 @@ class SchoolController:
             logging.error(f"Error guardando config: {e}")
 
     def _crear_backup_automatico(self):
-        """Crea una copia de seguridad y mantiene solo las últimas 10."""
-        try:
-            if not os.path.exists(self.db.db_path): return
-            
-            # Crear carpeta backups si no existe
-            if not os.path.exists(self.BACKUP_DIR):
-                os.makedirs(self.BACKUP_DIR)
-            
-            # Nombre: original_auto_YYYYMMDD_HHMMSS.db
-            nombre_base = os.path.basename(self.db.db_path)
-            nombre_sin_ext = os.path.splitext(nombre_base)[0]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"{nombre_sin_ext}_auto_{timestamp}.db"
-            backup_path = os.path.join(self.BACKUP_DIR, backup_name)
-            
-            shutil.copy(self.db.db_path, backup_path)
+        """Backup comprimido en segundo plano en el almacén de backups; se omite si la base no cambió."""
+        db_path = self.db.db_path
+        def worker():
+            try:
+                sha256 = BackupService.backup_automatico(db_path, self.BACKUP_DIR, progreso=self._progreso_backup)
+                if sha256:
+                    self._en_hilo_ui(lambda: self.view.mostrar_mensaje_estado("Copia de seguridad automática creada"))
+            except Exception as e:
+                logging.error(f"Error creando backup automático: {e}")
 
-            # Limpieza: Mantener solo los 10 archivos más recientes
-            archivos = [os.path.join(self.BACKUP_DIR, f) for f in os.listdir(self.BACKUP_DIR) if f.endswith(".db")]
-            # Ordenar por fecha de modificación (el más viejo primero)
-            archivos.sort(key=os.path.getmtime)
-            
-            while len(archivos) > 10:
-                archivo_a_borrar = archivos.pop(0)
-                os.remove(archivo_a_borrar) # Borrar el más viejo
-                logging.info(f"Backup antiguo eliminado: {archivo_a_borrar}")
-                
-        except Exception as e:
-            logging.error(f"Error creando backup automático: {e}")
+        threading.Thread(target=worker, daemon=True).start()
 
     def _ejecutar_envio_whatsapp(self, telefono, mensaje):
         if not WhatsAppService.hay_internet():
@@ -689,9 +1225,9 @@ class SchoolController:
                 exito = False
 
             if exito is True:
-                self.view.after(0, lambda: self.view.mostrar_mensaje_estado("Mensaje enviado (verifique su navegador)."))
+                self._en_hilo_ui(lambda: self.view.mostrar_mensaje_estado("Mensaje enviado (verifique su navegador)."))
             else:
-                self.view.after(0, lambda: messagebox.showerror("Error", "Fallo al enviar mensaje."))
+                self._en_hilo_ui(lambda: messagebox.showerror("Error", "Fallo al enviar mensaje."))
 
         threading.Thread(target=worker, daemon=True).start()
 
@@ -699,40 +1235,20 @@ class SchoolController:
 
     def _limpiar_telefono(self, telefono: str) -> Optional[str]:
         """Limpia el formato del teléfono y valida que empiece con +."""
-        if not telefono:
-            return None
-        # Quitar espacios, guiones, paréntesis
-        limpio = telefono.replace(" ", "").replace("-", "").replace("(", "").replace(")", "").strip()
-        if limpio.startswith("+"):
-            return limpio
-        return None
+        return Validador.limpiar_telefono(telefono)
 
     def _validar_datos_apoderado(self, nombre: str, tel: str, email: str) -> Optional[tuple]:
-        nombre = nombre.strip() if nombre else ""
-        tel = tel.strip() if tel else ""
-        email = email.strip() if email else ""
-
-        if not nombre:
-            messagebox.showerror("Error", "El nombre es obligatorio")
+        datos, error, aviso = Validador.validar_apoderado(nombre, tel, email)
+        if error:
+            messagebox.showerror("Error", error)
             return None
-        
-        if tel:
-            # 1. Validar caracteres permitidos (dígitos, espacios, guiones, paréntesis)
-            if not re.match(r"^\+?[\d\s\(\)-]+$", tel):
-                messagebox.showerror("Error", "El teléfono contiene caracteres inválidos")
-                return None
-            
-            # 2. Advertencia de formato internacional
-            if not re.match(r"^\+[\d\s\(\)-]+$", tel):
-                messagebox.showwarning("Aviso", "Se recomienda usar el formato internacional (+52...) para las funciones de WhatsApp.")
-
-        if not self._validar_email(email):
-            messagebox.showerror("Error", "El formato del email es inválido (ej: correo@dominio.com)")
-            return None
-            
-        return nombre, tel, email
+        if aviso:
+            messagebox.showwarning("Aviso", aviso)
+        return datos
 
-    def _calcular_deuda_alumno(self, id_alumno: int) -> List[str]:
+    @staticmethod
+    def _calcular_deuda_alumno(db: SchoolDB, id_alumno: int, inicio_clases_idx: int) -> List[str]:
+        """Meses adeudados por el alumno a la fecha. Corre en el hilo de la base."""
         now = datetime.now()
         mes_actual_idx = now.month - 1
         
@@ -741,23 +1257,14 @@ class SchoolController:
         # if now.day < self.dia_cobranza:
         #     mes_actual_idx -= 1
             
-        if mes_actual_idx < self.inicio_clases_idx:
+        if mes_actual_idx < inicio_clases_idx:
             return []
 
-        meses_requeridos = self.meses[self.inicio_clases_idx : mes_actual_idx + 1]
-        pagos = self.db.obtener_pagos_alumno(id_alumno)
-        meses_pagados = {p[0] for p in pagos}
-        
-        return [m for m in meses_requeridos if m not in meses_pagados]
+        morosidad = db.obtener_morosos(inicio_clases_idx, mes_actual_idx, estudiante_id=id_alumno)
+        return morosidad[0][5].split(", ") if morosidad else []
 
     def _validar_email(self, email: str) -> bool:
-        # Regex mejorado para validación de email
-        if not email:
-            # Si el email es opcional y está vacío, se considera válido.
-            return True
-        if email and not re.match(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$", email):
-            return False
-        return True
+        return Validador.validar_email(email)
 
     def leer_documentacion(self, nombre_archivo: str) -> str:
         """Lee un archivo de texto/markdown buscando en la ruta correcta (exe o script)."""
@@ -794,9 +1301,9 @@ class SchoolController:
         def worker():
             try:
                 ReportService.exportar_csv(file_path, headers, datos)
-                self.view.after(0, lambda: self._finalizar_tarea_visual("Archivo exportado correctamente"))
+                self._en_hilo_ui(lambda: self._finalizar_tarea_visual("Archivo exportado correctamente"))
             except Exception as e:
-                self.view.after(0, lambda: self._finalizar_tarea_visual(f"Error: {e}", es_error=True))
+                self._en_hilo_ui(lambda msg=f"Error: {e}": self._finalizar_tarea_visual(msg, es_error=True))
 
         threading.Thread(target=worker, daemon=True).start()
 
@@ -809,5 +1316,10 @@ class SchoolController:
             self.view.mostrar_mensaje_estado(mensaje)
 
 if __name__ == "__main__":
-    controller = SchoolController()
+    # El reporte consolidado usa un pool de procesos: necesario en el ejecutable de PyInstaller (Windows)
+    multiprocessing.freeze_support()
+    # --profile-startup: tiempo de cada fase del arranque, en la consola y en app_escolar.log
+    perfil = PerfilArranque("--profile-startup" in sys.argv, inicio=_INICIO_ARRANQUE)
+    perfil.marcar("importaciones")
+    controller = SchoolController(perfil)
     controller.iniciar()
\ No newline at end of file
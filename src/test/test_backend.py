@@ -1,12 +1,28 @@
 import unittest
 import os
 import sys
+import threading
+import time
+import tempfile
+import shutil
+import sqlite3
+import urllib.error
+from unittest import mock
+from datetime import datetime, timedelta
 
 # Asegurar que podemos importar los módulos de src
 # Esto agrega la carpeta 'src' al path de Python
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend.database import SchoolDB
+from backend.database import SchoolDB, MESES, limite_attach
+from backend.backup_service import BackupService
+from backend.ejecutor_db import EjecutorDB
+from backend.reporte_consolidado import ReporteConsolidado, _consolidar_lote
+from backend.sync_service import ServidorSync, ClienteSync
+from backend.mantenimiento_service import ProgramadorMantenimiento
+from backend.perfil_arranque import PerfilArranque
+from bench.generador import crear_escuela
+from bench import benchmark
 
 class TestSchoolDB(unittest.TestCase):
     def setUp(self):
@@ -22,12 +38,15 @@ class TestSchoolDB(unittest.TestCase):
 
     def tearDown(self):
         """Se ejecuta después de cada prueba: Borra la DB temporal."""
-        if os.path.exists(self.db.db_path):
-            try:
-                # Cerramos conexión forzosamente si quedó abierta (aunque SchoolDB cierra en cada query)
-                os.remove(self.db.db_path)
-            except PermissionError:
-                pass # Windows a veces retiene el archivo unos milisegundos
+        # Cerramos las conexiones persistentes antes de borrar el archivo
+        self.db.cerrar()
+        for sufijo in ("", "-wal", "-shm"):
+            ruta = self.db.db_path + sufijo
+            if os.path.exists(ruta):
+                try:
+                    os.remove(ruta)
+                except PermissionError:
+                    pass # Windows a veces retiene el archivo unos milisegundos
 
     def test_flujo_apoderado(self):
         """Prueba crear, leer y actualizar un apoderado."""
@@ -75,5 +94,881 @@ class TestSchoolDB(unittest.TestCase):
         self.assertTrue(self.db.verificar_estudiante_existente("Duplicado", "1A"))
         self.assertFalse(self.db.verificar_estudiante_existente("Otro", "1A"))
 
+    def test_conexion_persistente_por_hilo(self):
+        """Verifica que cada hilo reutilice su conexión y que el perfil se aplique una vez."""
+        conn = self.db._conectar()
+        self.assertIs(conn, self.db._conectar())
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+
+        conexiones_hilo = []
+        hilo = threading.Thread(target=lambda: conexiones_hilo.append(self.db._conectar()))
+        hilo.start()
+        hilo.join()
+        self.assertIsNot(conexiones_hilo[0], conn)
+
+        # Al cerrar, la siguiente consulta abre una conexión nueva
+        self.db.cerrar()
+        self.assertIsNot(self.db._conectar(), conn)
+        self.assertEqual(self.db.obtener_apoderados(), [])
+
+    def test_transaccion_rollback(self):
+        """Un error dentro de una transacción no deja cambios a medias."""
+        with self.assertRaises(ValueError):
+            with self.db._transaccion() as cursor:
+                cursor.execute("INSERT INTO apoderados (nombre) VALUES ('Temporal')")
+                raise ValueError("fallo simulado")
+        self.assertEqual(self.db.obtener_apoderados(), [])
+
+    def test_importacion_csv(self):
+        """Importa apoderados, alumnos y pagos desde CSV y reporta las filas rechazadas."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+
+        def escribir(nombre, contenido):
+            ruta = os.path.join(carpeta, nombre)
+            with open(ruta, "w", encoding="utf-8") as f:
+                f.write(contenido)
+            return ruta
+
+        ruta = escribir("apoderados.csv", "Nombre;Teléfono;Email\nAna Díaz;+56 9 1111 1111;ana@test.com\n;+569;x@x.com\nLuis Soto;+56922222222;correo-malo\n")
+        importados, rechazados, ruta_rechazados = self.db.importar_csv(ruta, "apoderados")
+        self.assertEqual((importados, rechazados), (1, 2))
+        with open(ruta_rechazados, encoding="utf-8-sig") as f:
+            self.assertIn("El nombre es obligatorio", f.read())
+
+        ruta = escribir("alumnos.csv", "nombre,grado,apoderado,telefono_apoderado\nJosé,1A,,+56 9 1111-1111\nMaría,2B,ana diaz,\nPedro,1A,Nadie,\n")
+        self.assertEqual(self.db.importar_csv(ruta, "estudiantes")[:2], (2, 1))
+
+        ruta = escribir("pagos.csv", "alumno,grado,mes,monto\nJosé,1A,marzo,50000\nJosé,1A,Marzo,50000\nMaría,2B,Abril,abc\n")
+        self.assertEqual(self.db.importar_csv(ruta, "mensualidades")[:2], (1, 2))
+        self.assertEqual(len(self.db.obtener_historial_pagos()), 1)
+
+        ruta = escribir("pagos_fecha.csv", "alumno,grado,mes,monto,fecha\nJosé,1A,Abril,50000,10/04/2025\nJosé,1A,Mayo,50000,2025-5-2\nJosé,1A,Junio,50000,ayer\n")
+        importados, rechazados, ruta_rechazados = self.db.importar_csv(ruta, "mensualidades")
+        self.assertEqual((importados, rechazados), (2, 1))
+        with open(ruta_rechazados, encoding="utf-8-sig") as f:
+            self.assertIn("Fecha de pago inválida", f.read())
+        self.assertEqual(self.db.obtener_datos("SELECT fecha_pago FROM mensualidades WHERE mes IN ('Abril','Mayo') ORDER BY mes_idx"),
+                         [("2025-04-10 00:00:00",), ("2025-05-02 00:00:00",)])
+
+    def test_registro_pagos_lote(self):
+        """Registra un lote en una transacción omitiendo los duplicados."""
+        self.db.agregar_apoderado("Apo Lote", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        self.db.agregar_estudiante("Uno", "1A", id_apo)
+        self.db.agregar_estudiante("Dos", "1A", id_apo)
+        id_uno, id_dos = [e[0] for e in self.db.obtener_estudiantes_simple()]
+        self.db.registrar_pago(id_uno, 1000, "Marzo")
+
+        registrados, duplicados = self.db.registrar_pagos_lote([
+            (id_uno, 1000, "Marzo"),   # ya existía
+            (id_uno, 1000, "Abril"),
+            (id_dos, 1000, "Marzo"),
+            (id_dos, 1000, "Marzo"),   # repetido dentro del lote
+        ])
+        self.assertEqual(registrados, 2)
+        self.assertEqual(sorted(duplicados), [(id_dos, "Marzo"), (id_uno, "Marzo")])
+        self.assertEqual(len(self.db.obtener_historial_pagos()), 3)
+
+        # Un mes desconocido rechaza el lote completo: sin mes_idx el índice único no detectaría el duplicado
+        with self.assertRaises(ValueError):
+            self.db.registrar_pagos_lote([(id_dos, 1000, "Mayo"), (id_dos, 1000, "Marzzo")])
+        with self.assertRaises(ValueError):
+            self.db.registrar_pago(id_dos, 1000, "Marzzo")
+        self.assertEqual(len(self.db.obtener_historial_pagos()), 3)
+
+    def test_busqueda_sin_tildes_y_por_prefijo(self):
+        """La búsqueda indexada ignora tildes/mayúsculas, acepta prefijos y sigue los cambios de la tabla."""
+        self.db.agregar_apoderado("Ramón Núñez", "+56911111111", "ramon@test.com")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        self.db.agregar_estudiante("José Pérez", "1A", id_apo)
+        id_alu = self.db.obtener_estudiantes_simple()[0][0]
+        self.db.registrar_pago(id_alu, 1000, "Marzo")
+
+        self.assertEqual([r[1] for r in self.db.buscar_estudiantes_texto("jose")], ["José Pérez"])
+        self.assertEqual(len(self.db.buscar_estudiantes_texto("PER")), 1)
+        self.assertEqual(len(self.db.buscar_pagos_texto("Jose Per")), 1)
+        self.assertEqual([r[1] for r in self.db.buscar_apoderados_texto("nunez")], ["Ramón Núñez"])
+        self.assertEqual(self.db.buscar_estudiantes_texto("maria"), [])
+
+        self.db.actualizar_estudiante(id_alu, "María Soto", "1A", id_apo)
+        self.assertEqual(self.db.buscar_estudiantes_texto("jose"), [])
+        self.assertEqual(len(self.db.buscar_estudiantes_texto("maria")), 1)
+
+    def test_migraciones_version(self):
+        """Una base al día queda en la última versión y no vuelve a migrar al abrirse."""
+        version = self.db._conectar().execute("PRAGMA user_version").fetchone()[0]
+        self.assertEqual(version, len(self.db._migraciones()))
+
+        reabierta = SchoolDB(self.db_name)
+        reabierta._transaccion = lambda: self.fail("No debería aplicar migraciones")
+        reabierta.init_db()
+        reabierta.cerrar()
+
+    def test_migracion_base_antigua(self):
+        """Una base creada por versiones antiguas (sin user_version ni columnas nuevas) se actualiza."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        ruta = os.path.join(carpeta, "antigua.db")
+        conn = sqlite3.connect(ruta)
+        conn.executescript('''
+            CREATE TABLE apoderados (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, telefono TEXT, email TEXT);
+            CREATE TABLE estudiantes (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, grado TEXT, apoderado_id INTEGER);
+            CREATE TABLE mensualidades (id INTEGER PRIMARY KEY AUTOINCREMENT, estudiante_id INTEGER, monto REAL, mes TEXT, pagado BOOLEAN DEFAULT 0);
+            INSERT INTO apoderados (nombre) VALUES ('Antiguo');
+            INSERT INTO estudiantes (nombre, grado, apoderado_id) VALUES ('Alumno Antiguo', '3A', 1);
+        ''')
+        conn.close()
+
+        db = SchoolDB(ruta)
+        self.addCleanup(db.cerrar)
+        self.assertEqual(db.obtener_estudiante_detalle(1)[0][:3], ("Alumno Antiguo", "3A", None))
+        self.assertEqual(len(db.buscar_estudiantes_texto("antiguo")), 1)
+
+    def test_periodos_varios_anios(self):
+        """Pagos con año y mes tipados: el mismo mes de otro año no choca y cada año se consulta por separado."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        ruta = os.path.join(carpeta, "antigua.db")
+        conn = sqlite3.connect(ruta)
+        conn.executescript('''
+            CREATE TABLE apoderados (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, telefono TEXT, email TEXT);
+            CREATE TABLE estudiantes (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, grado TEXT, apoderado_id INTEGER);
+            CREATE TABLE mensualidades (id INTEGER PRIMARY KEY AUTOINCREMENT, estudiante_id INTEGER, monto REAL, mes TEXT, pagado BOOLEAN DEFAULT 0, fecha_pago TEXT);
+            INSERT INTO apoderados (nombre) VALUES ('Apo');
+            INSERT INTO estudiantes (nombre, grado, apoderado_id) VALUES ('Alumno', '1A', 1);
+            INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago) VALUES (1, 500, 'marzo', 1, '2024-03-05 10:00:00');
+            INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago) VALUES (1, 500, 'Abril', 1, '10/04/2024');
+        ''')
+        conn.close()
+
+        db = SchoolDB(ruta)
+        self.addCleanup(db.cerrar)
+        self.assertEqual(db.obtener_datos("SELECT anio, mes_idx FROM mensualidades ORDER BY id"), [(2024, 2), (2024, 3)])
+        self.assertTrue(db.registrar_pago(1, 700, "Marzo", anio=2025))
+        self.assertFalse(db.registrar_pago(1, 700, "Marzo", anio=2025))
+        db.ejecutar_query("INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago) VALUES (1, 700, 'Mayo', 1, '2025-05-02')")
+
+        self.assertEqual(db.obtener_morosos(2, 4, anio=2024)[0][5], "Mayo")
+        self.assertEqual(db.obtener_morosos(2, 4, anio=2025)[0][5], "Abril")
+        self.assertEqual(db.obtener_estadisticas_dashboard("Marzo", 2024), (1, 500))
+        self.assertEqual(db.obtener_estadisticas_dashboard("Marzo", 2025), (1, 700))
+        db.activar_estado_cuenta()
+        self.assertEqual(db.obtener_morosos(2, 4, anio=2025)[0][5], "Abril")
+
+    def test_cache_lecturas(self):
+        """Repetir una lectura sin escrituras no ejecuta SQL; escrituras propias o de otro proceso la invalidan."""
+        self.db.agregar_apoderado("Apo", "+1", "")
+        self.assertEqual(len(self.db.obtener_apoderados_completo()), 1)
+
+        sentencias = []
+        self.db._conectar().set_trace_callback(sentencias.append)
+        self.db.obtener_apoderados_completo()
+        self.assertEqual(sentencias, ["PRAGMA data_version"])
+
+        self.db.agregar_apoderado("Otro", "+2", "")
+        self.assertEqual(len(self.db.obtener_apoderados_completo()), 2)
+        # Escribir en una tabla no invalida las lecturas de otra
+        self.db.obtener_apoderados_completo()
+        self.db.agregar_estudiante("Alumno", "1A", self.db.obtener_apoderados()[0][0])
+        sentencias.clear()
+        self.db.obtener_apoderados_completo()
+        self.assertEqual(sentencias, ["PRAGMA data_version"])
+
+        externa = sqlite3.connect(self.db.db_path)
+        externa.execute("INSERT INTO apoderados (nombre) VALUES ('Externo')")
+        externa.commit()
+        externa.close()
+        self.assertEqual(len(self.db.obtener_apoderados_completo()), 3)
+
+        for i in range(SchoolDB.TAMANO_CACHE_LECTURAS + 10):
+            self.db.obtener_datos("SELECT ? FROM configuracion", (i,))
+        self.assertEqual(len(self.db._cache_lecturas), SchoolDB.TAMANO_CACHE_LECTURAS)
+
+    def test_backup_en_linea(self):
+        """Copia en línea con progreso usando la API de backup de SQLite."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        self.db.agregar_apoderado("Apo", "+1", "")
+
+        progreso = []
+        ruta = os.path.join(carpeta, "copia.db")
+        BackupService.copiar(self.db.db_path, ruta, progreso=progreso.append)
+        self.assertEqual(progreso[-1], 100)
+        copia = sqlite3.connect(ruta)
+        self.assertEqual(copia.execute("SELECT nombre FROM apoderados").fetchall(), [("Apo",)])
+        self.assertEqual(copia.execute("PRAGMA integrity_check").fetchone()[0], "ok")
+        copia.close()
+
+    def test_almacen_backups(self):
+        """Backups comprimidos: se omiten sin cambios, se deduplican por hash y se restauran en un .db nuevo."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        self.db.agregar_apoderado("Apo", "+1", "")
+
+        sha = BackupService.backup_automatico(self.db.db_path, carpeta)
+        self.assertIsNotNone(sha)
+        self.assertIsNone(BackupService.backup_automatico(self.db.db_path, carpeta))
+        # Cambia la huella del archivo pero no el contenido: mismo objeto, no se duplica
+        self.db.checkpoint()
+        os.utime(self.db.db_path, ns=(0, os.stat(self.db.db_path).st_mtime_ns + 1000))
+        self.assertEqual(BackupService.backup_automatico(self.db.db_path, carpeta), sha)
+        self.assertEqual(len(os.listdir(os.path.join(carpeta, BackupService.CARPETA_OBJETOS))), 1)
+        # Los dos quedan en la misma hora: la retención conserva solo el más reciente
+        self.assertEqual(len(BackupService.listar_backups(carpeta, self.db.db_path)), 1)
+
+        self.db.agregar_apoderado("Otro", "+2", "")
+        sha_nuevo = BackupService.backup_automatico(self.db.db_path, carpeta)
+        self.assertNotEqual(sha_nuevo, sha)
+
+        # El recién guardado nunca lo quita la retención, aunque comparta el segundo con el anterior
+        self.assertEqual(BackupService.listar_backups(carpeta, self.db.db_path)[0]["sha256"], sha_nuevo)
+
+        ruta = os.path.join(carpeta, "restaurada.db")
+        BackupService.restaurar(carpeta, sha_nuevo, ruta)
+        copia = sqlite3.connect(ruta)
+        self.assertEqual(copia.execute("SELECT nombre FROM apoderados ORDER BY id").fetchall(), [("Apo",), ("Otro",)])
+        copia.close()
+
+    def test_retencion_backups(self):
+        """Se conserva el más reciente de cada hora/día/semana/año dentro de los límites de cada nivel."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        os.makedirs(os.path.join(carpeta, BackupService.CARPETA_OBJETOS))
+        fechas = ["2024-12-20T10:00:00", "2025-06-01T09:00:00", "2025-06-01T09:30:00", "2025-06-02T08:00:00", "2025-06-02T08:10:00"]
+        indice = {"backups": [{"sha256": str(i), "db": "a.db", "fecha": f} for i, f in enumerate(fechas)], "huellas": {}}
+        for i in range(len(fechas)):
+            open(BackupService._ruta_objeto(carpeta, str(i)), "w").close()
+
+        BackupService._aplicar_retencion(carpeta, indice, {"hora": 1, "dia": 2, "semana": 1, "anio": None})
+        self.assertEqual(sorted(e["fecha"] for e in indice["backups"]), [fechas[0], fechas[2], fechas[4]])
+        self.assertEqual(sorted(os.listdir(os.path.join(carpeta, BackupService.CARPETA_OBJETOS))), ["0.db.xz", "2.db.xz", "4.db.xz"])
+
+        # Dos backups en el mismo segundo: se conserva el último agregado (el que acaba de escribirse)
+        open(BackupService._ruta_objeto(carpeta, "5"), "w").close()
+        indice["backups"].append({"sha256": "5", "db": "a.db", "fecha": fechas[4]})
+        BackupService._aplicar_retencion(carpeta, indice, {"hora": 1, "dia": 2, "semana": 1, "anio": None})
+        self.assertEqual([e["sha256"] for e in indice["backups"]], ["0", "2", "5"])
+
+    def test_ejecutor_db(self):
+        """Las operaciones corren en un único hilo, en orden de llegada, y retornan Futures."""
+        ejecutor = EjecutorDB()
+        self.addCleanup(ejecutor.cerrar)
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+
+        hilos = set()
+        def inscribir(nombre):
+            hilos.add(threading.current_thread())
+            self.db.agregar_estudiante(nombre, "1A", id_apo)
+        escrituras = [ejecutor.enviar(inscribir, f"Alumno {i}") for i in range(5)]
+        lectura = ejecutor.enviar(self.db.obtener_estudiantes_simple)
+        self.assertEqual([e[1] for e in lectura.result(timeout=5)], [f"Alumno {i}" for i in range(5)])
+        self.assertTrue(all(f.done() for f in escrituras))
+        self.assertEqual(len(hilos), 1)
+        self.assertIsNot(hilos.pop(), threading.current_thread())
+
+        # Desde un hilo de trabajo se espera el resultado; anidado en el propio hilo no se bloquea
+        self.assertEqual(ejecutor.ejecutar(lambda: ejecutor.ejecutar(lambda: 42)), 42)
+        with self.assertRaises(sqlite3.OperationalError):
+            ejecutor.enviar(self.db.ejecutar_query, "SELECT * FROM tabla_inexistente").result(timeout=5)
+
+    def test_reporte_consolidado(self):
+        """Métricas de varias escuelas en una consulta sobre bases adjuntas, con totales."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        anio = datetime.now().year
+        rutas = []
+        for nombre, alumnos in (("Escuela Norte", 2), ("Escuela Sur", 1)):
+            db = SchoolDB(os.path.join(carpeta, nombre.replace(" ", "_") + ".db"))
+            db.guardar_configuracion("nombre_escuela", nombre)
+            db.agregar_apoderado("Apo", "+1", "")
+            id_apo = db.obtener_apoderados()[0][0]
+            for i in range(alumnos):
+                db.agregar_estudiante(f"Alumno {i}", "1A", id_apo)
+            # El primer alumno de cada escuela paga Marzo y Abril; el resto no paga
+            db.registrar_pagos_lote([(db.obtener_estudiantes_simple()[0][0], 1000, mes) for mes in ("Marzo", "Abril")], anio=anio)
+            rutas.append(db.db_path)
+            db.cerrar()
+
+        # Una base de una versión anterior se informa y no se toca (el reporte no la migra)
+        antigua = os.path.join(carpeta, "antigua.db")
+        with sqlite3.connect(antigua) as conn:
+            conn.execute("CREATE TABLE estudiantes (id INTEGER PRIMARY KEY, nombre TEXT)")
+            conn.execute("PRAGMA user_version = 3")
+        conn.close()
+        contenido_antes = {ruta: open(ruta, "rb").read() for ruta in rutas + [antigua]}
+
+        por_escuela, totales, desactualizadas = ReporteConsolidado.generar(rutas + [rutas[0], antigua], anio, 3, 4)
+        self.assertEqual(desactualizadas, [antigua])
+        self.assertEqual({ruta: open(ruta, "rb").read() for ruta in rutas + [antigua]}, contenido_antes)
+        self.assertFalse(os.path.exists(antigua + "-wal"))
+        self.assertEqual([f["escuela"] for f in por_escuela], ["Escuela Norte", "Escuela Sur"])
+        self.assertEqual([(f["alumnos"], f["ingresos_mes"], f["ingresos_anio"], f["morosos"], f["meses_adeudados"]) for f in por_escuela],
+                         [(2, 1000, 2000, 2, 4), (1, 1000, 2000, 1, 1)])
+        self.assertEqual(totales, {"alumnos": 3, "ingresos_mes": 2000, "ingresos_anio": 4000, "morosos": 3, "meses_adeudados": 5})
+        # Un lote por escuela da lo mismo que la consulta conjunta (camino del pool de procesos)
+        self.assertEqual([fila for ruta in rutas for fila in _consolidar_lote([ruta], anio, 3, 4)[0]], por_escuela)
+        with self.assertRaises(FileNotFoundError):
+            ReporteConsolidado.generar([os.path.join(carpeta, "no_existe.db")], anio, 3, 4)
+
+    def test_sincronizacion_equipos(self):
+        """Dos equipos y un servidor local (loopback): solo viajan deltas, gana la última escritura y se retoma tras un corte."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        bases = {nombre: SchoolDB(os.path.join(carpeta, f"{nombre}.db")) for nombre in ("hub", "a", "b")}
+        for db in bases.values():
+            self.addCleanup(db.cerrar)
+        servidor = ServidorSync(lambda: bases["hub"], host="127.0.0.1", puerto=0, clave="secreta")
+        _, puerto = servidor.iniciar()
+        self.addCleanup(servidor.detener)
+        url = f"http://127.0.0.1:{puerto}"
+        cliente = {n: ClienteSync(bases[n], url, clave="secreta") for n in ("a", "b")}
+        # Sin la clave (o con otra) el servidor no atiende, y no se puede levantar sin clave
+        for clave in (None, "otra"):
+            with self.assertRaises(urllib.error.HTTPError) as rechazo:
+                ClienteSync(bases["a"], url, clave=clave).sincronizar()
+            self.assertEqual(rechazo.exception.code, 403)
+        with self.assertRaises(ValueError):
+            ServidorSync(lambda: bases["hub"], clave="")
+
+        def contenido(db):
+            return (
+                set(db.obtener_datos("SELECT uid, nombre, telefono FROM apoderados")),
+                set(db.obtener_datos("SELECT e.uid, e.nombre, e.grado, a.uid FROM estudiantes e LEFT JOIN apoderados a ON a.id = e.apoderado_id")),
+                set(db.obtener_datos("SELECT m.uid, e.uid, m.monto, m.anio, m.mes_idx FROM mensualidades m JOIN estudiantes e ON e.id = m.estudiante_id")),
+            )
+
+        bases["hub"].agregar_apoderado("Apo Hub", "+1", "")
+        a = bases["a"]
+        a.agregar_apoderado("Apo A", "+2", "")
+        a.agregar_estudiante("Ana", "1A", a.obtener_apoderados()[0][0])
+        id_ana = a.obtener_estudiantes_simple()[0][0]
+        a.registrar_pago(id_ana, 1000, "Marzo", anio=2025)
+        # Al servidor viajan las 3 filas de A; de vuelta solo la del servidor (no se devuelven las propias)
+        self.assertEqual(cliente["a"].sincronizar(), (3, 1))
+        self.assertEqual(cliente["b"].sincronizar(), (0, 4))
+        self.assertEqual(cliente["a"].sincronizar(), (0, 0))
+
+        # Conflictos: los dos equipos editan el mismo alumno y registran el mismo mes con distinto monto
+        b = bases["b"]
+        id_ana_b = b.obtener_estudiantes_simple()[0][0]
+        a.actualizar_estudiante(id_ana, "Ana A", "1A", a.obtener_apoderados()[0][0])
+        b.actualizar_estudiante(id_ana_b, "Ana B", "2A", b.obtener_datos("SELECT apoderado_id FROM estudiantes WHERE id = ?", (id_ana_b,))[0][0])
+        a.registrar_pago(id_ana, 2000, "Abril", anio=2025)
+        b.registrar_pago(id_ana_b, 3000, "Abril", anio=2025)
+        b.eliminar_pago(b.obtener_datos("SELECT id FROM mensualidades WHERE mes = 'Marzo'")[0][0])
+        for n in ("a", "b", "a"):
+            cliente[n].sincronizar()
+        self.assertEqual(contenido(bases["hub"]), contenido(a))
+        self.assertEqual(contenido(a), contenido(b))
+        alumnos, pagos = contenido(a)[1], contenido(a)[2]
+        self.assertEqual(len(alumnos), 1)
+        self.assertEqual([(p[3], p[4]) for p in pagos], [(2025, 3)])
+
+        # Corte a mitad del envío: el cursor quedó en el último lote confirmado y se continúa desde ahí
+        cliente["a"].enviar()
+        for i in range(5):
+            a.agregar_apoderado(f"Lote {i}", f"+9{i}", "")
+        intermitente = ClienteSync(a, url, clave="secreta")
+        intermitente.TAMANO_LOTE = 2
+        envios = []
+        def post_con_corte(ruta, datos, _post=intermitente._post):
+            if len(envios) == 1:
+                raise OSError("Conexión interrumpida")
+            envios.append(len(datos["cambios"]))
+            return _post(ruta, datos)
+        intermitente._post = post_con_corte
+        with self.assertRaises(OSError):
+            intermitente.enviar()
+        self.assertEqual(envios, [2])
+        self.assertEqual(cliente["a"].enviar(), 3)
+        self.assertEqual(cliente["b"].recibir(), 5)
+        self.assertEqual(contenido(b), contenido(a))
+
+        with self.assertRaises(urllib.error.HTTPError):
+            ClienteSync(b, url, clave="otra").recibir()
+
+    def test_copia_de_base_cambia_nodo(self):
+        """Una copia del archivo en otra ruta recibe su propio nodo_id y vuelve a enviar sus cambios."""
+        self.db.verificar_nodo()
+        nodo = self.db.nodo_id
+        self.db.agregar_apoderado("Apo", "+1", "")
+        self.db.guardar_configuracion("sync_enviado_hasta|http://x", "99")
+        self.db.verificar_nodo()
+        self.assertEqual(self.db.nodo_id, nodo)
+
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        self.db.checkpoint()
+        shutil.copy(self.db.db_path, os.path.join(carpeta, "copia.db"))
+        copia = SchoolDB(os.path.join(carpeta, "copia.db"))
+        self.addCleanup(copia.cerrar)
+        copia.verificar_nodo()
+        self.assertNotEqual(copia.nodo_id, nodo)
+        self.assertEqual(copia.obtener_datos("SELECT origen FROM apoderados"), [(copia.nodo_id,)])
+        self.assertIsNone(copia.obtener_configuracion("sync_enviado_hasta|http://x"))
+
+    def test_pago_unico_por_mes(self):
+        """registrar_pago y actualizar_pago respetan el índice único (alumno, mes)."""
+        self.db.agregar_apoderado("Apo", "+1", "")
+        self.db.agregar_estudiante("Alumno", "1A", self.db.obtener_apoderados()[0][0])
+        id_alu = self.db.obtener_estudiantes_simple()[0][0]
+
+        self.assertTrue(self.db.registrar_pago(id_alu, 1000, "Marzo"))
+        self.assertFalse(self.db.registrar_pago(id_alu, 1000, "Marzo"))
+        self.assertTrue(self.db.registrar_pago(id_alu, 1000, "Abril"))
+        id_abril = [p[0] for p in self.db.obtener_historial_pagos() if p[4] == "Abril"][0]
+        self.assertFalse(self.db.actualizar_pago(id_abril, 1000, "Marzo"))
+        self.assertTrue(self.db.actualizar_pago(id_abril, 2000, "Mayo"))
+
+    def test_consultas_frecuentes_usan_indices(self):
+        """EXPLAIN QUERY PLAN: las consultas de los caminos calientes no recorren la tabla completa."""
+        consultas = [
+            ("SELECT COUNT(*) FROM mensualidades WHERE estudiante_id = ? AND anio = ? AND mes_idx = ?", (1, 2026, 2)),
+            ("SELECT mes, monto, fecha_pago FROM mensualidades WHERE estudiante_id = ? ORDER BY id DESC", (1,)),
+            ("SELECT SUM(monto) FROM mensualidades WHERE anio = ? AND mes_idx = ?", (2026, 2)),
+            ("SELECT mes_idx FROM mensualidades WHERE estudiante_id = ? AND anio = ? AND mes_idx BETWEEN ? AND ?", (1, 2026, 2, 4)),
+            ("SELECT COUNT(*) FROM estudiantes WHERE apoderado_id = ?", (1,)),
+            ("SELECT COUNT(*) FROM estudiantes WHERE nombre = ? AND grado = ?", ("Alumno", "1A")),
+        ]
+        for query, params in consultas:
+            plan = " | ".join(fila[3] for fila in self.db.obtener_datos("EXPLAIN QUERY PLAN " + query, params))
+            self.assertRegex(plan, r"USING (COVERING )?INDEX", query)
+            self.assertNotRegex(plan, r"^SCAN|\| SCAN", query)
+
+    def test_paginacion_por_clave(self):
+        """Recorrer las páginas entrega exactamente las mismas filas y en el mismo orden que la consulta completa."""
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        for i in range(7):
+            self.db.agregar_estudiante(f"Alumno {i % 3}", None if i == 0 else f"{i % 2}A", id_apo)
+        ids = [e[0] for e in self.db.obtener_estudiantes_simple()]
+        for i, id_alu in enumerate(ids):
+            for mes in ("Marzo", "Abril"):
+                fecha = None if i == 0 else f"2026-0{3 + i % 3}-01 10:00:00"
+                self.db.ejecutar_query("INSERT INTO mensualidades (estudiante_id, monto, mes, pagado, fecha_pago) VALUES (?, 1000, ?, 1, ?)", (id_alu, mes, fecha))
+
+        pagos, ultima = [], None
+        while True:
+            pagina = self.db.obtener_historial_pagos_pagina(3, (ultima[6], ultima[0]) if ultima else None)
+            pagos += pagina
+            if len(pagina) < 3:
+                break
+            ultima = pagina[-1]
+        self.assertEqual(pagos, self.db.obtener_historial_pagos())
+
+        alumnos, ultima = [], None
+        while True:
+            pagina = self.db.obtener_estudiantes_pagina(2, (ultima[2], ultima[1], ultima[0]) if ultima else None)
+            alumnos += pagina
+            if len(pagina) < 2:
+                break
+            ultima = pagina[-1]
+        self.assertEqual([a[0] for a in alumnos], [a[0] for a in sorted(self.db.obtener_estudiantes_completo(), key=lambda a: (a[2] is not None, a[2] or "", a[1], a[0]))])
+
+    def test_motor_morosidad(self):
+        """El cálculo en SQL coincide con los meses faltantes esperados, en orden de calendario."""
+        self.db.agregar_apoderado("Apo", "+56900000000", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        for nombre in ("Al Día", "Debe Abril", "Sin Pagos"):
+            self.db.agregar_estudiante(nombre, "1A", id_apo)
+        ids = {nombre: id_alu for id_alu, nombre in self.db.obtener_estudiantes_simple()}
+        self.db.registrar_pagos_lote([(ids["Al Día"], 1000, m) for m in ("Marzo", "Abril", "Mayo")] +
+                                     [(ids["Debe Abril"], 1000, m) for m in ("Marzo", "Mayo")])
+
+        morosos = self.db.obtener_morosos(2, 4)
+        self.assertEqual([(m[1], m[5]) for m in morosos], [("Debe Abril", "Abril"), ("Sin Pagos", "Marzo, Abril, Mayo")])
+        self.assertEqual(morosos[0][3:5], ("Apo", "+56900000000"))
+        self.assertEqual(self.db.obtener_morosos(2, 4, estudiante_id=ids["Al Día"]), [])
+        self.assertEqual(self.db.obtener_morosos(5, 2), [])
+
+    def test_resumenes_dashboard(self):
+        """Los triggers mantienen los resúmenes igual que un recálculo desde cero, incluso al cambiar de grado."""
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        for nombre, grado in (("Ana", "1A"), ("Beto", "1A"), ("Caro", "2B"), ("Dani", None)):
+            self.db.agregar_estudiante(nombre, grado, id_apo)
+        ids = {nombre: id_alu for id_alu, nombre in self.db.obtener_estudiantes_simple()}
+        self.db.registrar_pagos_lote([(ids["Ana"], 1000, "Marzo"), (ids["Beto"], 1500, "Marzo"), (ids["Caro"], 2000, "Abril")], anio=2025)
+        self.db.registrar_pago(ids["Ana"], 1000, "Abril", anio=2025)
+        # Inserción sin período: el trigger de mensualidades_periodo completa anio/mes_idx y el resumen lo recibe
+        self.db.ejecutar_query("INSERT INTO mensualidades (estudiante_id, monto, mes, fecha_pago) VALUES (?, 300, 'Mayo', '2025-05-02')", (ids["Dani"],))
+
+        self.assertEqual(self.db.obtener_estadisticas_dashboard("Marzo", 2025), (4, 2500))
+        self.assertEqual(self.db.obtener_alumnos_por_grado(), [(None, 1), ("1A", 2), ("2B", 1)])
+        self.assertEqual(self.db.obtener_ingresos_por_mes(2025), [(2, 2500, 2), (3, 3000, 2), (4, 300, 1)])
+
+        id_abril = self.db.obtener_datos("SELECT id FROM mensualidades WHERE estudiante_id = ? AND mes = 'Abril'", (ids["Ana"],))[0][0]
+        self.db.actualizar_pago(id_abril, 1200, "Junio")
+        self.db.actualizar_estudiante(ids["Beto"], "Beto", "2B", id_apo)
+        self.db.eliminar_estudiante(ids["Caro"])
+
+        resumen = lambda: (self.db.obtener_datos("SELECT * FROM resumen_ingresos ORDER BY 1, 2, 3"),
+                           self.db.obtener_datos("SELECT * FROM resumen_grados ORDER BY 1"))
+        incremental = resumen()
+        self.db.reconstruir_resumenes()
+        self.assertEqual(incremental, resumen())
+        self.assertEqual(incremental[1], [("", 1), ("1A", 1), ("2B", 1)])
+        self.assertEqual(self.db.obtener_ingresos_por_mes(2025), [(2, 2500, 2), (4, 300, 1), (5, 1200, 1)])
+
+    def test_diario_cambios(self):
+        """Los triggers registran altas, modificaciones y bajas en orden; se leen por tramos desde un cursor."""
+        inicio = self.db.ultimo_cambio()
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        self.db.agregar_estudiante("Ana", "1A", id_apo)
+        id_alu = self.db.obtener_estudiantes_simple()[0][0]
+        self.db.actualizar_estudiante(id_alu, "Ana María", "1A", id_apo)
+        self.db.registrar_pago(id_alu, 1000, "Marzo", anio=2025)
+        self.db.eliminar_estudiante(id_alu)
+
+        cambios = self.db.obtener_cambios(inicio)
+        self.assertEqual([(c[1], c[3]) for c in cambios], [("apoderados", "I"), ("estudiantes", "I"), ("estudiantes", "U"),
+                                                             ("mensualidades", "I"), ("mensualidades", "D"), ("estudiantes", "D")])
+        self.assertEqual(cambios[2][4]["nombre"], "Ana María")
+        self.assertEqual((cambios[3][4]["anio"], cambios[3][4]["mes_idx"], cambios[3][4]["monto"]), (2025, 2, 1000))
+        self.assertIsNone(cambios[5][4])
+        self.assertEqual(self.db.ultimo_cambio(), cambios[-1][0])
+
+        # Por tramos con el último seq recibido como cursor; la purga no reutiliza números
+        self.assertEqual(self.db.obtener_cambios(inicio, limite=2) + self.db.obtener_cambios(cambios[1][0]), cambios)
+        self.db.purgar_cambios(cambios[-1][0])
+        self.assertEqual(self.db.obtener_cambios(), [])
+        self.db.agregar_apoderado("Otro", "+2", "")
+        self.assertEqual(self.db.obtener_cambios()[0][0], cambios[-1][0] + 1)
+
+    def test_cierre_anio_archivo(self):
+        """Cerrar un año mueve sus pagos y los alumnos retirados al archivo del año, verificado y sin perder el resumen."""
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.db.ruta_archivo(2024)), True)
+        # Python < 3.11 no tiene Connection.getlimit: se usa el límite por defecto de SQLite
+        self.assertEqual(limite_attach(object()), 10)
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        for nombre in ("Activo", "Retirado", "Egresado"):
+            self.db.agregar_estudiante(nombre, "1A", id_apo)
+        ids = {nombre: id_alu for id_alu, nombre in self.db.obtener_estudiantes_simple()}
+        self.db.cambiar_estado_estudiante(ids["Retirado"], "retirado")
+        self.db.cambiar_estado_estudiante(ids["Egresado"], "egresado")
+        self.db.registrar_pagos_lote([(ids["Activo"], 1000, "Marzo"), (ids["Retirado"], 1500, "Marzo"), (ids["Egresado"], 800, "Abril")], anio=2024)
+        self.db.registrar_pagos_lote([(ids["Activo"], 1200, "Marzo"), (ids["Egresado"], 900, "Marzo")], anio=2025)
+        ingresos_2024 = self.db.obtener_ingresos_por_mes(2024)
+        morosos_2024 = self.db.obtener_morosos(2, 3, anio=2024)
+        seq = self.db.ultimo_cambio()
+        diario = self.db.obtener_datos("SELECT * FROM cambios")
+
+        # Corte después de confirmar la copia y antes de borrar: no se pierde nada y repetir el cierre lo completa
+        transaccion = self.db._transaccion
+        llamadas = []
+        def cortar_al_borrar(*args, **kwargs):
+            llamadas.append(args)
+            if len(llamadas) == 2:
+                raise OSError("Corte de energía")
+            return transaccion(*args, **kwargs)
+        with mock.patch.object(self.db, "_transaccion", cortar_al_borrar):
+            with self.assertRaises(OSError):
+                self.db.cerrar_anio(2024)
+        self.assertEqual(self.db.obtener_datos("SELECT COUNT(*) FROM mensualidades WHERE anio = 2024")[0][0], 3)
+        with sqlite3.connect(self.db.ruta_archivo(2024)) as archivo:
+            self.assertEqual(archivo.execute("SELECT COUNT(*) FROM mensualidades").fetchone()[0], 3)
+        archivo.close()
+        self.assertEqual(self.db.anios_archivados(), [])
+
+        resultado = self.db.cerrar_anio(2024)
+        self.assertEqual((resultado["pagos"], resultado["total"], resultado["alumnos"]), (3, 3300, 1))
+        # El egresado tiene pagos de 2025: sigue en la base principal
+        self.assertEqual({fila[0] for fila in self.db.obtener_datos("SELECT nombre FROM estudiantes")}, {"Activo", "Egresado"})
+        self.assertEqual(self.db.obtener_datos("SELECT COUNT(*) FROM mensualidades WHERE anio = 2024")[0][0], 0)
+        with sqlite3.connect(resultado["ruta"]) as archivo:
+            self.assertEqual(archivo.execute("SELECT COUNT(*), SUM(monto) FROM mensualidades").fetchone(), (3, 3300))
+            self.assertEqual(archivo.execute("SELECT nombre FROM estudiantes").fetchall(), [("Retirado",)])
+        archivo.close()
+        self.assertEqual(self.db.anios_archivados(), [2024])
+        # El archivo no se anota como bajas y el diario (solo de agregado) queda intacto
+        self.assertEqual(self.db.ultimo_cambio(), seq)
+        self.assertEqual(self.db.obtener_datos("SELECT * FROM cambios"), diario)
+        self.assertEqual(self.db.obtener_datos("SELECT COUNT(*) FROM sync_bajas")[0][0], 0)
+        self.assertIsNone(self.db.obtener_configuracion(SchoolDB.CLAVE_DIARIO_EN_PAUSA))
+
+        # Dashboard, historial y morosidad del año cerrado se siguen viendo
+        self.assertEqual(self.db.obtener_ingresos_por_mes(2024), ingresos_2024)
+        self.db.reconstruir_resumenes()
+        self.assertEqual(self.db.obtener_ingresos_por_mes(2024), ingresos_2024)
+        self.assertEqual(len(self.db.obtener_historial_pagos()), 2)
+        self.assertEqual(len(self.db.obtener_historial_pagos(desde_anio=2024)), 5)
+        self.assertEqual(len(self.db.buscar_pagos("Retirado", desde_anio=2024)), 1)
+        self.assertEqual(self.db.obtener_morosos(2, 3, anio=2024), morosos_2024)
+
+        with self.assertRaises(ValueError):
+            self.db.registrar_pago(ids["Activo"], 1000, "Mayo", anio=2024)
+        # La importación tampoco escribe en el año cerrado: esas filas van a los rechazados
+        ruta_csv = os.path.join(os.path.dirname(self.db.ruta_archivo(2024)), "pagos.csv")
+        with open(ruta_csv, "w", encoding="utf-8") as f:
+            f.write("alumno,mes,monto,fecha_pago\nActivo,Mayo,1000,2024-05-10\nActivo,Mayo,1000,2025-05-10\n")
+        importados, rechazados, ruta_rechazados = self.db.importar_csv(ruta_csv, "mensualidades")
+        self.assertEqual((importados, rechazados), (1, 1))
+        with open(ruta_rechazados, encoding="utf-8-sig") as f:
+            self.assertIn("2024 está cerrado", f.read())
+        self.assertEqual(self.db.obtener_datos("SELECT COUNT(*) FROM mensualidades WHERE anio = 2024")[0][0], 0)
+        with self.assertRaises(ValueError):
+            self.db.cerrar_anio(datetime.now().year)
+        # Repetirlo es inofensivo
+        self.assertEqual(self.db.cerrar_anio(2024)["pagos"], 0)
+        self.assertEqual(self.db.obtener_archivos_anuales()[0][:4], (2024, 3, 3300, 1))
+
+    def test_alumno_retirado_fuera_de_cobranza(self):
+        """Un retirado deja de aparecer en la morosidad, los recordatorios, el dashboard y el combo de pagos."""
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        for nombre in ("Ana", "Beto"):
+            self.db.agregar_estudiante(nombre, "1A", id_apo)
+        ids = {nombre: id_alu for id_alu, nombre in self.db.obtener_estudiantes_simple()}
+        anio = datetime.now().year
+
+        self.db.cambiar_estado_estudiante(ids["Beto"], "retirado")
+        self.assertEqual([fila[1] for fila in self.db.obtener_morosos(2, 3, anio=anio)], ["Ana"])
+        self.assertEqual(self.db.obtener_morosos(2, 3, estudiante_id=ids["Beto"], anio=anio), [])
+        self.assertEqual(self.db.obtener_estadisticas_dashboard("Marzo", anio)[0], 1)
+        self.assertEqual(self.db.obtener_alumnos_por_grado(), [("1A", 1)])
+        self.assertEqual(self.db.obtener_estudiantes_simple(), [(ids["Ana"], "Ana")])
+        self.db.reconstruir_resumenes()
+        self.assertEqual(self.db.obtener_alumnos_por_grado(), [("1A", 1)])
+        # También con el estado de cuenta materializado
+        self.db.activar_estado_cuenta()
+        self.assertEqual([fila[0] for fila in self.db.obtener_deudores_estado_cuenta(anio, 2, 3)], [ids["Ana"]])
+        self.assertEqual([fila[1] for fila in self.db.obtener_morosos(2, 3, anio=anio)], ["Ana"])
+
+        # Si vuelve, cuenta de nuevo
+        self.db.cambiar_estado_estudiante(ids["Beto"], "activo")
+        self.assertEqual(len(self.db.obtener_morosos(2, 3, anio=anio)), 2)
+        self.assertEqual(len(self.db.obtener_deudores_estado_cuenta(anio, 2, 3)), 2)
+        self.assertEqual(self.db.obtener_alumnos_por_grado(), [("1A", 2)])
+
+    def test_promocion_fin_de_anio(self):
+        """El paso de año avanza un grado a los activos, egresa al último grado y puede archivar el año anterior."""
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.db.ruta_archivo(2024)), True)
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        for nombre, grado in (("Ana", "1° Básico"), ("Beto", "2° Básico"), ("Caro", "3° Básico"), ("Dani", "1° Básico"), ("Eva", "Kinder")):
+            self.db.agregar_estudiante(nombre, grado, id_apo)
+        ids = {nombre: id_alu for id_alu, nombre in self.db.obtener_estudiantes_simple()}
+        self.db.cambiar_estado_estudiante(ids["Dani"], "retirado")
+        self.db.registrar_pagos_lote([(ids["Ana"], 1000, "Marzo"), (ids["Caro"], 2000, "Marzo")], anio=2024)
+        self.db.registrar_pagos_lote([(ids["Ana"], 1100, "Marzo"), (ids["Dani"], 500, "Marzo")], anio=2025)
+
+        # Sugerencia: número siguiente si el grado existe, egreso para el último y sin cambio si no hay regla
+        progresion = self.db.obtener_progresion_grados()
+        self.assertEqual(progresion, {"1° Básico": "2° Básico", "2° Básico": "3° Básico", "3° Básico": None, "Kinder": ""})
+        progresion["Kinder"] = "1° Básico"
+        previa = self.db.vista_previa_promocion(progresion)
+        self.assertEqual((previa["promovidos"], previa["egresados"], previa["sin_cambio"]), (3, 1, 0))
+        self.db.guardar_progresion_grados(progresion)
+        self.assertEqual(self.db.obtener_progresion_grados(), progresion)
+
+        # Si los alumnos cambiaron desde la vista previa no se aplica nada
+        self.db.agregar_estudiante("Fede", "2° Básico", id_apo)
+        with self.assertRaises(RuntimeError):
+            self.db.promover_grados(progresion, esperados=previa)
+        self.assertEqual(self.db.obtener_datos("SELECT grado FROM estudiantes WHERE nombre = 'Ana'")[0][0], "1° Básico")
+        previa = self.db.vista_previa_promocion(progresion)
+        ingresos_2024 = self.db.obtener_ingresos_por_mes(2024)
+
+        resultado = self.db.promover_grados(progresion, anio_archivo=2024, esperados=previa)
+        self.assertEqual((resultado["promovidos"], resultado["egresados"]), (4, 1))
+        alumnos = {nombre: (grado, estado) for nombre, grado, estado in self.db.obtener_datos("SELECT nombre, grado, estado FROM estudiantes")}
+        # Cada alumno avanza un solo grado aunque el siguiente también esté en el mapa; el retirado no se toca
+        self.assertEqual(alumnos, {"Ana": ("2° Básico", "activo"), "Beto": ("3° Básico", "activo"), "Eva": ("1° Básico", "activo"),
+                                   "Fede": ("3° Básico", "activo"), "Dani": ("1° Básico", "retirado")})
+        # La egresada sin pagos de otros años se fue al archivo junto con los pagos de 2024
+        self.assertEqual(resultado["archivo"]["alumnos"], 1)
+        self.assertEqual(self.db.anios_archivados(), [2024])
+        # El año archivado conserva el resumen con los grados de ese año; el resto sigue al día
+        self.assertEqual(self.db.obtener_ingresos_por_mes(2024), ingresos_2024)
+        alumnos_por_grado = self.db.obtener_alumnos_por_grado()
+        ingresos_2025 = self.db.obtener_datos("SELECT grado, total FROM resumen_ingresos WHERE anio = 2025")
+        self.db.reconstruir_resumenes()
+        self.assertEqual(self.db.obtener_alumnos_por_grado(), alumnos_por_grado)
+        self.assertEqual(self.db.obtener_datos("SELECT grado, total FROM resumen_ingresos WHERE anio = 2025"), ingresos_2025)
+        self.assertEqual(sorted(ingresos_2025), [("1° Básico", 500), ("2° Básico", 1100)])
+        self.assertIsNone(self.db.obtener_configuracion(SchoolDB.CLAVE_RESUMENES_EN_PAUSA))
+        # Morosidad, dashboard y combo de pagos solo ven a los activos
+        self.assertEqual({fila[1] for fila in self.db.obtener_morosos(2, 3, anio=2025)}, {"Ana", "Beto", "Eva", "Fede"})
+        self.assertEqual(self.db.obtener_estadisticas_dashboard("Marzo", 2025), (4, 1600))
+        self.assertEqual(alumnos_por_grado, [("1° Básico", 1), ("2° Básico", 1), ("3° Básico", 2)])
+        self.assertEqual([nombre for _, nombre in self.db.obtener_estudiantes_simple()], ["Ana", "Beto", "Eva", "Fede"])
+
+        # Escuela completa: 2.000 alumnos con tres años de pagos (el tiempo lo controla el benchmark)
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        ruta = os.path.join(carpeta, "escuela.db")
+        crear_escuela(ruta, 2000, anios=3)
+        db = SchoolDB(ruta)
+        try:
+            progresion = db.obtener_progresion_grados()
+            resultado = db.promover_grados(progresion, esperados=db.vista_previa_promocion(progresion))
+            self.assertGreater(resultado["promovidos"], 1500)
+            self.assertGreater(resultado["egresados"], 0)
+            # Los egresados quedan en la base pero fuera de la cobranza y del conteo del dashboard
+            egresados = {fila[0] for fila in db.obtener_datos("SELECT id FROM estudiantes WHERE estado = 'egresado'")}
+            self.assertEqual(len(egresados), resultado["egresados"])
+            morosos = {fila[0] for fila in db.obtener_morosos(0, 11)}
+            self.assertTrue(morosos)
+            self.assertFalse(morosos & egresados)
+            activos = db.obtener_datos("SELECT COUNT(*) FROM estudiantes WHERE estado = 'activo'")[0][0]
+            self.assertEqual(db.obtener_estadisticas_dashboard("Marzo")[0], activos)
+            self.assertEqual(sum(alumnos for _, alumnos in db.obtener_alumnos_por_grado()), activos)
+        finally:
+            db.cerrar()
+
+    def test_mantenimiento_programado(self):
+        """El mantenimiento convierte la base a vaciado incremental, devuelve el espacio libre y registra cada tarea."""
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        self.db.agregar_estudiante("Ana", "1A", id_apo)
+        id_alu = self.db.obtener_estudiantes_simple()[0][0]
+        self.db.registrar_pagos_lote([(id_alu, 1000, mes) for mes in MESES], anio=2020)
+        self.db.ejecutar_query("UPDATE mensualidades SET mes = mes || ?", ("x" * 20000,))
+        self.db.eliminar_todos_pagos()
+        conn = self.db._conectar()
+        paginas_antes = conn.execute("PRAGMA page_count").fetchone()[0]
+
+        advertencias = []
+        programador = ProgramadorMantenimiento(lambda: self.db, al_advertir=advertencias.append, inactividad=3600)
+        self.assertEqual(programador.ejecutar_pendientes(), {})  # La interfaz acaba de usar la base
+        resultados = programador.ejecutar_pendientes(forzar=True)
+        self.assertEqual(set(resultados), set(self.db.TAREAS_MANTENIMIENTO))
+        self.assertEqual((resultados["quick_check"], resultados["incremental_vacuum"]), ([], 0))
+        self.assertEqual(conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        self.assertLess(conn.execute("PRAGMA page_count").fetchone()[0], paginas_antes)
+        self.assertEqual(advertencias, [])
+        self.assertEqual(set(self.db.ultimo_mantenimiento()), set(self.db.TAREAS_MANTENIMIENTO))
+        self.assertEqual(programador.tareas_pendientes(self.db), [])
+
+        # Ya convertida, los borrados se devuelven al disco por tramos sin VACUUM completo
+        self.db.registrar_pagos_lote([(id_alu, 1000, mes) for mes in MESES], anio=2021)
+        self.db.ejecutar_query("UPDATE mensualidades SET mes = mes || ?", ("x" * 20000,))
+        self.db.eliminar_todos_pagos()
+        self.assertGreater(conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+        self.assertEqual(self.db.ejecutar_mantenimiento("incremental_vacuum"), 0)
+        self.assertEqual(programador.tareas_pendientes(self.db, ahora=datetime.now() + timedelta(days=2)),
+                         ["optimize", "quick_check", "incremental_vacuum"])
+
+    def test_instrumentacion_consultas(self):
+        """Con la instrumentación activa se agrupan las sentencias por SQL normalizado y se registran las lentas con su plan."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        ruta_log = os.path.join(carpeta, "lentas.log")
+        self.assertFalse(self.db.instrumentacion_activa)
+        self.db.activar_instrumentacion(umbral_lento_ms=0, ruta_log=ruta_log)
+        self.db.agregar_apoderado("Apo", "+1", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        for nombre in ("Ana", "Beto", "Carla"):
+            self.db.agregar_estudiante(nombre, "1A", id_apo)
+        ids = [id_alu for id_alu, _ in self.db.obtener_estudiantes_simple()]
+        self.db.registrar_pagos_lote([(id_alu, 1000, "Marzo") for id_alu in ids], anio=2025)
+        for id_alu in ids:
+            self.db.obtener_datos(f"SELECT mes FROM mensualidades WHERE estudiante_id = {id_alu} AND anio = 2025")
+
+        estadisticas = {e["sql"]: e for e in self.db.estadisticas_consultas()}
+        lectura = estadisticas["SELECT mes FROM mensualidades WHERE estudiante_id = ? AND anio = ?"]
+        self.assertEqual((lectura["llamadas"], lectura["filas"]), (3, 3))
+        self.assertLessEqual(lectura["p50_ms"], lectura["p95_ms"])
+        self.assertLessEqual(lectura["p95_ms"], lectura["p99_ms"])
+        with open(ruta_log, encoding="utf-8") as archivo:
+            registro = archivo.read()
+        self.assertIn("plan: SEARCH mensualidades USING", registro)
+
+        # Desactivada, no se mide nada más
+        self.db.desactivar_instrumentacion()
+        self.db.obtener_datos("SELECT COUNT(*) FROM apoderados")
+        self.assertNotIn("SELECT COUNT(*) FROM apoderados", {e["sql"] for e in self.db.estadisticas_consultas()})
+        self.db.reiniciar_estadisticas_consultas()
+        self.assertEqual(self.db.estadisticas_consultas(), [])
+
+    def test_configuracion_y_perfil_arranque(self):
+        """La configuración de la escuela se lee en una consulta y el perfil de arranque mide cada fase."""
+        self.db.guardar_configuracion("nombre_escuela", "Escuela Ñuñoa")
+        self.db.guardar_configuracion("dia_cobranza", "10")
+        self.assertEqual(self.db.obtener_configuraciones(("nombre_escuela", "dia_cobranza", "no_existe")),
+                         {"nombre_escuela": "Escuela Ñuñoa", "dia_cobranza": "10"})
+
+        inactivo = PerfilArranque()
+        inactivo.marcar("fase")
+        self.assertEqual(inactivo.fases, [])
+        perfil = PerfilArranque(activo=True, inicio=time.perf_counter())
+        for fase in ("importaciones", "base de datos", "interfaz"):
+            perfil.marcar(fase)
+        self.assertEqual([fase for fase, _ in perfil.fases], ["importaciones", "base de datos", "interfaz"])
+        self.assertAlmostEqual(sum(segundos for _, segundos in perfil.fases), perfil.total())
+        reporte = perfil.reporte()
+        self.assertTrue(reporte.startswith("Arranque: "))
+        self.assertIn("base de datos", reporte)
+
+    def test_generador_y_benchmark(self):
+        """La escuela sintética es reproducible y el benchmark mide todos los métodos públicos y detecta regresiones."""
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        contenido = []
+        for nombre in ("a.db", "b.db"):
+            ruta = os.path.join(carpeta, nombre)
+            conteo = crear_escuela(ruta, 150, anios=2, semilla=7)
+            db = SchoolDB(ruta)
+            contenido.append(db.obtener_datos("SELECT e.nombre, e.grado, e.estado, a.nombre, a.telefono FROM estudiantes e JOIN apoderados a ON a.id = e.apoderado_id ORDER BY e.id")
+                             + db.obtener_datos("SELECT estudiante_id, anio, mes_idx, monto FROM mensualidades ORDER BY estudiante_id, anio, mes_idx"))
+            hermanos = db.obtener_datos("SELECT COUNT(*) FROM (SELECT apoderado_id FROM estudiantes GROUP BY apoderado_id HAVING COUNT(*) > 1)")[0][0]
+            db.cerrar()
+        self.assertEqual(contenido[0], contenido[1])
+        self.assertEqual(conteo["estudiantes"], 150)
+        self.assertLess(conteo["apoderados"], 150)
+        self.assertGreater(hermanos, 0)
+        # Hay meses sin pagar (no todos tienen los 10 meses de los 2 años) y nombres con tildes
+        self.assertLess(conteo["mensualidades"], 150 * 10 * 2)
+        self.assertTrue(any(c in "áéíóúñÁÉÍÓÚÑ" for fila in contenido[0] for c in str(fila[0])))
+
+        self.assertEqual(benchmark.metodos_sin_medir(), [])
+        resultados = benchmark.medir_escala(150, anios=2, semilla=7, repeticiones=1, carpeta_bases=carpeta)
+        self.assertEqual(set(resultados), {nombre for nombre, _, _ in benchmark.CASOS})
+        actual = {"resultados": {"150": resultados}}
+        base = {"resultados": {"150": {caso: dict(m) for caso, m in resultados.items()}}}
+        self.assertEqual(benchmark.comparar(actual, base), [])
+        base["resultados"]["150"]["obtener_morosos"]["mediana_ms"] = resultados["obtener_morosos"]["mediana_ms"] / 10
+        self.assertEqual([r["caso"] for r in benchmark.comparar(actual, base, minimo_ms=0)], ["obtener_morosos"])
+        self.assertEqual(benchmark.fuera_de_presupuesto(actual, {"promover_grados": 1000.0}), [])
+        self.assertEqual([e["caso"] for e in benchmark.fuera_de_presupuesto(actual, {"promover_grados": 0.0, "no_medido": 0.0})],
+                         ["promover_grados"])
+
+    def test_estado_cuenta_materializado(self):
+        """Los triggers mantienen la máscara de meses pagados y la reconstrucción detecta desajustes."""
+        self.db.agregar_apoderado("Apo", "+56900000000", "")
+        id_apo = self.db.obtener_apoderados()[0][0]
+        self.db.agregar_estudiante("Previo", "1A", id_apo)
+        self.db.registrar_pago(self.db.obtener_estudiantes_simple()[0][0], 1000, "Marzo")
+        self.db.activar_estado_cuenta()
+        self.assertTrue(self.db.estado_cuenta_activo)
+
+        self.db.agregar_estudiante("Nuevo", "1A", id_apo)
+        ids = {nombre: id_alu for id_alu, nombre in self.db.obtener_estudiantes_simple()}
+        self.db.registrar_pagos_lote([(ids["Nuevo"], 1000, "Marzo"), (ids["Nuevo"], 1000, "Abril")])
+        id_pago_abril = self.db.obtener_datos("SELECT id FROM mensualidades WHERE estudiante_id = ? AND mes = 'Abril'", (ids["Nuevo"],))[0][0]
+        self.db.actualizar_pago(id_pago_abril, 1000, "Mayo")
+        anio = datetime.now().year
+        mascara = lambda id_alu: self.db.obtener_datos("SELECT meses_pagados FROM estado_cuenta WHERE estudiante_id = ? AND anio = ?", (id_alu, anio))[0][0]
+        self.assertEqual(mascara(ids["Nuevo"]), (1 << 2) | (1 << 4))
+        self.assertEqual(dict(self.db.obtener_deudores_estado_cuenta(anio, 2, 4)), {ids["Previo"]: (1 << 3) | (1 << 4), ids["Nuevo"]: 1 << 3})
+
+        self.db.eliminar_pago(id_pago_abril)
+        self.assertEqual(mascara(ids["Nuevo"]), 1 << 2)
+        self.assertEqual(self.db.reconstruir_estado_cuenta(), 0)
+
+        self.db.ejecutar_query("UPDATE estado_cuenta SET meses_pagados = 0 WHERE estudiante_id = ?", (ids["Previo"],))
+        self.assertEqual(self.db.reconstruir_estado_cuenta(), 1)
+        self.assertEqual(mascara(ids["Previo"]), 1 << 2)
+
+        self.db.eliminar_estudiante(ids["Nuevo"])
+        self.assertEqual(self.db.obtener_datos("SELECT COUNT(*) FROM estado_cuenta WHERE estudiante_id = ?", (ids["Nuevo"],))[0][0], 0)
+        self.db.desactivar_estado_cuenta()
+        self.assertFalse(self.db.estado_cuenta_activo)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file